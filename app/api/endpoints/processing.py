@@ -11,6 +11,7 @@ from app.schemas.processing import (
 )
 from app.services import processing_config, processing
 from app.services import task_queue
+from app.services import hyperliquid_client, rate_limiter
 
 router = APIRouter(dependencies=[Depends(get_current_user)])
 
@@ -52,3 +53,12 @@ def run_processing_batch(payload: ProcessingRunBatchRequest):
         except ValueError:
             skipped += 1
     return ProcessingRunBatchResponse(requested=len(addresses), enqueued=enqueued, skipped=skipped)
+
+
+@router.get("/processing/api_stats", summary="Hyperliquid 接口调用耗时统计（当前进程）")
+def processing_api_stats():
+    return {
+        "endpoints": hyperliquid_client.endpoint_latency_stats(),
+        "concurrency": rate_limiter.get_concurrency_limiter().snapshot(),
+        "request_memo": hyperliquid_client.request_memo_stats(),
+    }
@@ -77,12 +77,29 @@ def wallets_sync_async(payload: WalletSyncRequest = Body(...)) -> JobEnqueueResp
     return JobEnqueueResponse(job_id=job_id)
 
 
+@router.post(
+    "/wallets/{address}/repair",
+    response_model=JobEnqueueResponse,
+    dependencies=[Depends(get_current_user)],
+    summary="补拉覆盖缺口（仅重新拉取缺失的时间区间）",
+)
+def wallets_repair(address: str) -> JobEnqueueResponse:
+    if not query_service.get_coverage_gaps(address):
+        raise HTTPException(status_code=400, detail="no coverage gaps")
+    return JobEnqueueResponse(job_id=task_queue.enqueue_wallet_repair(address))
+
+
 @router.get("/wallets/status/{address}", response_model=CursorStatusResponse, summary="查看钱包同步游标")
 def wallets_status(address: str) -> CursorStatusResponse:
     snapshot = processing_service.get_wallet_snapshot(address)
     if snapshot is None:
         raise HTTPException(status_code=404, detail="wallet not found")
-    return CursorStatusResponse(cursors=query_service.get_cursors(address), **snapshot)
+    return CursorStatusResponse(
+        cursors=query_service.get_cursors(address),
+        coverage=query_service.get_coverage(address),
+        gaps=query_service.get_coverage_gaps(address),
+        **snapshot,
+    )
 
 
 @router.get(
@@ -175,6 +192,13 @@ def wallets_positions(
     )
 
 
+@router.get("/wallets/positions/current", summary="当前持仓")
+def wallets_current_positions(address: str, at: int | None = Query(None, description="毫秒时间戳，按历史变更还原该时刻持仓")):
+    if at is not None:
+        return {"items": query_service.positions_at(address, at)}
+    return {"items": query_service.get_current_positions(address)}
+
+
 @router.get("/wallets/orders", summary="分页查询订单历史")
 def wallets_orders(
     address: str,
@@ -289,8 +313,11 @@ def wallet_ai_generate(address: str) -> AIAnalysisResponse:
     response_model=ScoreResponse,
     summary="计算并保存钱包评分/指标",
 )
-def wallets_score(payload: WalletSyncRequest = Body(...)) -> ScoreResponse:
-    metric, score = scoring.compute_metrics(payload.address)
+def wallets_score(
+    payload: WalletSyncRequest = Body(...),
+    full: bool = Query(False, description="从全部成交重新计算指标（审计用），默认增量计算"),
+) -> ScoreResponse:
+    metric, score = scoring.compute_metrics(payload.address, full=full)
     def serialize(obj):
         data = obj.__dict__.copy()
         data.pop("_sa_instance_state", None)
@@ -17,6 +17,19 @@ class Settings(BaseSettings):
     data_dir: Path = Path("./data")
     sqlite_path: Path = Path("./data/wallet_analytics.db")
     cache_dir: Path = Path("./data/cache")
+    # Local cache compaction (dedup + time order); 0 keeps events forever
+    cache_retention_days: int = 0
+    cache_compaction_interval_hours: float = 24.0
+    raw_archive_dir: Path = Path("./data/raw_archive")
+    fill_columns_dir: Path = Path("./data/fill_columns")
+    # Full metric recomputes use the NumPy kernel (app/services/metrics_kernel.py).
+    # Scoring rounds px/sz to 8 and fee/PnL to 6 decimals (like the fill store)
+    # whether or not fixed_point_storage is enabled.
+    scoring_vectorized: bool = True
+    raw_archive_codec: str = "zlib"  # zlib | zstd (needs the zstandard package)
+    # Store prices/sizes/PnL/fees as scaled integers (see app/models/types.py);
+    # all processes must use the same value, bootstrap.migrate() converts the DB.
+    fixed_point_storage: bool = False
 
     # Security / Auth
     secret_key: str = "change-me"
@@ -25,6 +38,24 @@ class Settings(BaseSettings):
     # Hyperliquid
     hyperliquid_base_url: str = "https://api.hyperliquid.xyz/info"
     hyperliquid_timeout_sec: float = 10.0
+    hyperliquid_pool_max_connections: int = 20
+    hyperliquid_pool_max_keepalive: int = 10
+    hyperliquid_keepalive_expiry_sec: float = 30.0
+    hyperliquid_http2: bool = False
+    hyperliquid_rate_limit_enabled: bool = True
+    hyperliquid_rate_burst_seconds: float = 5.0
+    hyperliquid_max_concurrency: int = 8
+    hyperliquid_max_retries: int = 4
+    hyperliquid_backoff_base_sec: float = 0.5
+    hyperliquid_backoff_max_sec: float = 30.0
+    hyperliquid_request_memo_ttl_sec: float = 120.0
+    hyperliquid_ws_url: str = "wss://api.hyperliquid.xyz/ws"
+    # Live ingestion (python -m app.live) of followed wallets
+    live_ingest_max_wallets: int = 10
+    live_ingest_refresh_sec: float = 60.0
+    live_ingest_ping_sec: float = 50.0
+    wallet_sync_lease_sec: float = 900.0
+    wallet_sync_wait_sec: float = 600.0
 
     # Logging
     log_level: str = "INFO"
@@ -51,6 +82,8 @@ class Settings(BaseSettings):
         """Create required local directories."""
         self.data_dir.mkdir(parents=True, exist_ok=True)
         self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self.raw_archive_dir.mkdir(parents=True, exist_ok=True)
+        self.fill_columns_dir.mkdir(parents=True, exist_ok=True)
 
 
 @lru_cache(maxsize=1)
@@ -0,0 +1,40 @@
+"""Live ingestion entrypoint: ``python -m app.live``.
+
+Keeps followed wallets up to date from the Hyperliquid WebSocket API (see
+``app.services.live_ingest``). Run a single instance; REST polling by the RQ
+workers keeps working alongside it and finds the live-ingested ranges done.
+"""
+import asyncio
+import logging
+import signal
+
+from app.core.config import get_settings
+from app.core.logging import setup_logging
+from app.services import hyperliquid_client
+from app.services.bootstrap import migrate
+from app.services.live_ingest import LiveIngestor
+
+logger = logging.getLogger(__name__)
+
+
+async def _serve() -> None:
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, stop.set)
+    ingestor = LiveIngestor()
+    await ingestor.run(stop)
+    logger.info("Live ingest stopped, rows written: %s", ingestor.written)
+
+
+def main() -> None:
+    setup_logging(get_settings().log_level)
+    migrate()
+    try:
+        asyncio.run(_serve())
+    finally:
+        hyperliquid_client.close_shared_clients()
+
+
+if __name__ == "__main__":
+    main()
@@ -4,10 +4,10 @@ from fastapi.middleware.cors import CORSMiddleware
 from app.api.routes import api_router
 from app.core.config import get_settings
 from app.core.logging import setup_logging
-from app.core.database import Base, engine
 import app.models  # noqa: F401
 from app.services.scheduler import start_scheduler, stop_scheduler
-from app.services.bootstrap import ensure_default_admin, ensure_processing_schema, ensure_default_leaderboards
+from app.services.hyperliquid_client import close_shared_clients
+from app.services.bootstrap import ensure_default_admin, ensure_default_leaderboards, migrate
 
 
 def create_app() -> FastAPI:
@@ -33,8 +33,7 @@ def create_app() -> FastAPI:
 
     @app.on_event("startup")
     def _startup() -> None:
-        Base.metadata.create_all(bind=engine)
-        ensure_processing_schema()
+        migrate()
         ensure_default_admin()
         ensure_default_leaderboards()
         start_scheduler()
@@ -42,6 +41,7 @@ def create_app() -> FastAPI:
     @app.on_event("shutdown")
     def _shutdown() -> None:
         stop_scheduler()
+        close_shared_clients()
 
     return app
 
@@ -1,9 +1,9 @@
-from app.models.ledger import LedgerEvent, FundingEvent, FetchCursor
+from app.models.ledger import LedgerEvent, FundingEvent, FetchCursor, FetchCoverage, FetchDigest
 from app.models.fills import Fill
-from app.models.positions import PositionSnapshot
+from app.models.positions import CurrentPosition, PositionSnapshot
 from app.models.orders import OrderHistory
 from app.models.portfolio import PortfolioSeries, PortfolioSnapshot
-from app.models.scores import WalletMetric, WalletScore
+from app.models.scores import WalletMetric, WalletMetricState, WalletScore
 from app.models.wallets import Wallet
 from app.models.wallet_follow import WalletFollow
 from app.models.auth import User, Role, Permission, AuditLog, SystemConfig, UserPreference
@@ -25,12 +25,16 @@ __all__ = [
     "LedgerEvent",
     "FundingEvent",
     "FetchCursor",
+    "FetchCoverage",
+    "FetchDigest",
     "Fill",
     "PositionSnapshot",
+    "CurrentPosition",
     "OrderHistory",
     "PortfolioSeries",
     "PortfolioSnapshot",
     "WalletMetric",
+    "WalletMetricState",
     "WalletScore",
     "Wallet",
     "WalletFollow",
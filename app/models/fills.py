@@ -1,7 +1,8 @@
 from datetime import datetime
-from sqlalchemy import BigInteger, Column, DateTime, Integer, Numeric, String, Text, UniqueConstraint, Boolean
+from sqlalchemy import BigInteger, Column, DateTime, Integer, String, UniqueConstraint, Boolean
 
 from app.core.database import Base
+from app.models.types import money
 
 
 class Fill(Base):
@@ -16,16 +17,15 @@ class Fill(Base):
     coin = Column(String(64), index=True, nullable=False)
     side = Column(String(8))
     dir = Column(String(32))
-    px = Column(Numeric(38, 18))
-    sz = Column(Numeric(38, 18))
-    fee = Column(Numeric(38, 18))
+    px = Column(money(8))
+    sz = Column(money(8))
+    fee = Column(money(6))
     fee_token = Column(String(32))
     crossed = Column(Boolean)
-    closed_pnl = Column(Numeric(38, 18))
-    start_position = Column(Numeric(38, 18))
+    closed_pnl = Column(money(6))
+    start_position = Column(money(8))
     hash = Column(String(128))
     oid = Column(BigInteger)
     tid = Column(BigInteger)
-    builder_fee = Column(Numeric(38, 18))
+    builder_fee = Column(money(6))
     created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
-    raw_json = Column(Text, nullable=False)
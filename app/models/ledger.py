@@ -2,9 +2,10 @@ from datetime import datetime
 from decimal import Decimal
 from typing import Optional
 
-from sqlalchemy import BigInteger, Column, DateTime, Integer, Numeric, String, Text, UniqueConstraint
+from sqlalchemy import BigInteger, Column, DateTime, Index, Integer, String, UniqueConstraint
 
 from app.core.database import Base
+from app.models.types import money
 
 
 class LedgerEvent(Base):
@@ -20,19 +21,18 @@ class LedgerEvent(Base):
     delta_type = Column(String(32), index=True, nullable=False)
     vault = Column(String(128))
     token = Column(String(64))
-    amount = Column(Numeric(38, 18))
-    usdc_value = Column(Numeric(38, 18))
-    fee = Column(Numeric(38, 18))
-    native_token_fee = Column(Numeric(38, 18))
+    amount = Column(money(8))
+    usdc_value = Column(money(6))
+    fee = Column(money(6))
+    native_token_fee = Column(money(8))
     nonce = Column(BigInteger)
-    basis = Column(Numeric(38, 18))
-    commission = Column(Numeric(38, 18))
-    closing_cost = Column(Numeric(38, 18))
-    net_withdrawn_usd = Column(Numeric(38, 18))
+    basis = Column(money(6))
+    commission = Column(money(6))
+    closing_cost = Column(money(6))
+    net_withdrawn_usd = Column(money(6))
     source_dex = Column(String(32))
     destination_dex = Column(String(32))
     created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
-    raw_json = Column(Text, nullable=False)
 
 
 class FundingEvent(Base):
@@ -48,19 +48,18 @@ class FundingEvent(Base):
     delta_type = Column(String(32), index=True, nullable=False)
     vault = Column(String(128))
     token = Column(String(64))
-    amount = Column(Numeric(38, 18))
-    usdc_value = Column(Numeric(38, 18))
-    fee = Column(Numeric(38, 18))
-    native_token_fee = Column(Numeric(38, 18))
+    amount = Column(money(8))
+    usdc_value = Column(money(6))
+    fee = Column(money(6))
+    native_token_fee = Column(money(8))
     nonce = Column(BigInteger)
-    basis = Column(Numeric(38, 18))
-    commission = Column(Numeric(38, 18))
-    closing_cost = Column(Numeric(38, 18))
-    net_withdrawn_usd = Column(Numeric(38, 18))
+    basis = Column(money(6))
+    commission = Column(money(6))
+    closing_cost = Column(money(6))
+    net_withdrawn_usd = Column(money(6))
     source_dex = Column(String(32))
     destination_dex = Column(String(32))
     created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
-    raw_json = Column(Text, nullable=False)
 
 
 class FetchCursor(Base):
@@ -74,3 +73,42 @@ class FetchCursor(Base):
     cursor_type = Column(String(32), nullable=False)
     last_time_ms = Column(BigInteger, default=0, nullable=False)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=False)
+
+
+class FetchCoverage(Base):
+    """Time range ``[start_ms, end_ms]`` (inclusive) whose events are fully stored.
+
+    Intervals of one (user, stream) are kept merged, so any space between two
+    rows is a gap that still has to be fetched.
+    """
+
+    __tablename__ = "fetch_coverage"
+    __table_args__ = (
+        Index("ix_fetch_coverage_user_stream_start", "user", "stream", "start_ms"),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    user = Column(String(64), nullable=False)
+    stream = Column(String(32), nullable=False)
+    start_ms = Column(BigInteger, nullable=False)
+    end_ms = Column(BigInteger, nullable=False)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=False)
+
+
+class FetchDigest(Base):
+    """Fingerprint of the last stored response for a snapshot-style endpoint.
+
+    ``scope`` names the response (e.g. ``historicalOrders``); a matching
+    digest means the response is unchanged and nothing needs to be written.
+    """
+
+    __tablename__ = "fetch_digests"
+    __table_args__ = (
+        UniqueConstraint("user", "scope", name="uq_digest_user_scope"),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    user = Column(String(64), nullable=False, index=True)
+    scope = Column(String(64), nullable=False)
+    digest = Column(String(64), nullable=False)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=False)
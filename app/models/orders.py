@@ -1,7 +1,8 @@
 from datetime import datetime
-from sqlalchemy import BigInteger, Column, DateTime, Integer, Numeric, String, Text, UniqueConstraint
+from sqlalchemy import BigInteger, Column, DateTime, Integer, String, UniqueConstraint
 
 from app.core.database import Base
+from app.models.types import money
 
 
 class OrderHistory(Base):
@@ -12,19 +13,18 @@ class OrderHistory(Base):
     time_ms = Column(BigInteger, nullable=False, index=True)
     coin = Column(String(64), index=True, nullable=False)
     side = Column(String(8))
-    limit_px = Column(Numeric(38, 18))
-    sz = Column(Numeric(38, 18))
+    limit_px = Column(money(8))
+    sz = Column(money(8))
     order_type = Column(String(32))
     tif = Column(String(32))
     oid = Column(BigInteger, nullable=True, index=True)
     reduce_only = Column(Integer)  # store as 0/1
     is_trigger = Column(Integer)  # store as 0/1
-    trigger_px = Column(Numeric(38, 18))
+    trigger_px = Column(money(8))
     trigger_condition = Column(String(32))
     status = Column(String(32))
     status_ts = Column(BigInteger)
     cloid = Column(String(64))
-    raw_json = Column(Text, nullable=False)
     created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
 
     __table_args__ = (
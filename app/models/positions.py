@@ -1,5 +1,5 @@
 from datetime import datetime
-from sqlalchemy import BigInteger, Column, DateTime, Integer, Numeric, String, Text, UniqueConstraint
+from sqlalchemy import BigInteger, Column, DateTime, Integer, Numeric, String, UniqueConstraint
 
 from app.core.database import Base
 
@@ -31,4 +31,38 @@ class PositionSnapshot(Base):
     summary_ntl_pos = Column(Numeric(38, 18))
     withdrawable = Column(Numeric(38, 18))
     created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
-    raw_json = Column(Text, nullable=False)
+
+
+class CurrentPosition(Base):
+    """Latest state of each open position; closed positions are removed.
+
+    ``fingerprint`` joins the fields that make a change material (size, entry
+    price, leverage); a new ``PositionSnapshot`` row is written only when it
+    changes. ``changed_ms`` is the snapshot time of that last change.
+    """
+
+    __tablename__ = "current_positions"
+    __table_args__ = (
+        UniqueConstraint("user", "coin", name="uq_current_position_user_coin"),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    user = Column(String(64), nullable=False, index=True)
+    coin = Column(String(64), nullable=False)
+    time_ms = Column(BigInteger)
+    changed_ms = Column(BigInteger)
+    fingerprint = Column(String(255), nullable=False)
+    szi = Column(Numeric(38, 18))
+    entry_px = Column(Numeric(38, 18))
+    pos_value = Column(Numeric(38, 18))
+    unrealized_pnl = Column(Numeric(38, 18))
+    roe = Column(Numeric(38, 18))
+    liq_px = Column(Numeric(38, 18))
+    margin_used = Column(Numeric(38, 18))
+    leverage_type = Column(String(16))
+    leverage_value = Column(Numeric(38, 18))
+    max_leverage = Column(Numeric(38, 18))
+    cum_funding_all = Column(Numeric(38, 18))
+    cum_funding_open = Column(Numeric(38, 18))
+    cum_funding_change = Column(Numeric(38, 18))
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=False)
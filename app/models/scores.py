@@ -40,3 +40,28 @@ class WalletScore(Base):
     created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
     metrics_id = Column(Integer)
     dimension_scores = Column(Text, nullable=True)
+
+
+class WalletMetricState(Base):
+    """Running fill aggregates of a wallet, advanced incrementally by scoring.
+
+    ``last_fill_id`` is the highest ``fills.id`` already folded in. Decimal
+    sums (totals, equity walk, per-period window sums) are kept as exact
+    strings in ``aggregates`` so repeated increments do not drift.
+    """
+
+    __tablename__ = "wallet_metric_states"
+    __table_args__ = (
+        UniqueConstraint("user", name="uq_wallet_metric_states_user"),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    user = Column(String(64), nullable=False, index=True)
+    last_fill_id = Column(BigInteger, default=0, nullable=False)
+    last_time_ms = Column(BigInteger, default=0, nullable=False)
+    computed_ms = Column(BigInteger, default=0, nullable=False)
+    trades = Column(Integer, default=0, nullable=False)
+    wins = Column(Integer, default=0, nullable=False)
+    losses = Column(Integer, default=0, nullable=False)
+    aggregates = Column(Text, nullable=False)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=False)
@@ -0,0 +1,79 @@
+import logging
+from decimal import ROUND_HALF_EVEN, Decimal, InvalidOperation
+from typing import Any, Optional
+
+from sqlalchemy import BigInteger, Numeric
+from sqlalchemy.types import TypeDecorator
+
+from app.core.config import get_settings
+
+logger = logging.getLogger(__name__)
+
+INT64_MIN = -(2**63)
+INT64_MAX = 2**63 - 1
+
+
+class FixedPoint(TypeDecorator):
+    """Decimal stored as a scaled 64-bit integer (``value * 10**scale``).
+
+    SQLite keeps the column as an INTEGER, so ``SUM``/comparisons run on
+    native integers and reading a row needs no string parsing. Results come
+    back as ``Decimal`` exactly like ``Numeric``. Values are rounded half-even
+    to ``scale`` digits. A value that does not fit int64 after scaling is
+    logged and stored as NULL, so it only affects its own row instead of
+    failing the whole bulk insert (and with it every retry of the sync);
+    :meth:`scaled` raises ``ValueError`` for it instead.
+    """
+
+    impl = BigInteger
+    cache_ok = True
+
+    def __init__(self, scale: int) -> None:
+        super().__init__()
+        self.scale = scale
+        self._quantum = Decimal(1).scaleb(-scale)
+
+    def scaled(self, value: Any) -> int:
+        """``value`` as the stored integer; ``ValueError`` when it does not fit int64."""
+        if not isinstance(value, Decimal):
+            value = Decimal(str(value))
+        try:
+            scaled = int(value.quantize(self._quantum, rounding=ROUND_HALF_EVEN).scaleb(self.scale))
+        except InvalidOperation:  # more digits than the Decimal context holds
+            scaled = None
+        if scaled is None or not INT64_MIN <= scaled <= INT64_MAX:
+            raise ValueError(
+                f"{value} does not fit FixedPoint({self.scale}): "
+                f"the scaled value must fit int64 (|value| <= {Decimal(INT64_MAX).scaleb(-self.scale)})"
+            )
+        return scaled
+
+    def process_bind_param(self, value: Any, dialect) -> Optional[int]:
+        if value is None:
+            return None
+        try:
+            return self.scaled(value)
+        except ValueError as exc:
+            logger.warning("Storing NULL for an out-of-range amount: %s", exc)
+            return None
+
+    def process_result_value(self, value: Any, dialect) -> Optional[Decimal]:
+        if value is None:
+            return None
+        return Decimal(int(value)).scaleb(-self.scale)
+
+    def coerce_compared_value(self, op, value):
+        # Literals compared with the column (``closed_pnl > 0``) are scaled too.
+        return self
+
+
+def money(scale: int):
+    """Type for price/size/PnL/fee columns.
+
+    ``FixedPoint(scale)`` when ``FIXED_POINT_STORAGE`` is enabled, otherwise
+    the historical ``Numeric(38, 18)``. Existing databases are converted at
+    startup by ``bootstrap.ensure_fixed_point_storage``.
+    """
+    if get_settings().fixed_point_storage:
+        return FixedPoint(scale)
+    return Numeric(38, 18)
@@ -21,6 +21,11 @@ class ProcessingConfigSchema(BaseModel):
     score_cooldown_days: int = Field(default=7, gt=0)
     ai_cooldown_days: int = Field(default=30, gt=0)
     portfolio_refresh_hours: int = Field(default=24, gt=0)
+    max_pages_per_sync: int = Field(default=20, gt=0)
+    concurrent_fetch: bool = True
+    backfill_window_days: int = Field(default=14, gt=0)
+    backfill_concurrency: int = Field(default=4, gt=0)
+    backfill_max_windows: int = Field(default=48, gt=0)
 
 
 class ProcessingConfigRequest(BaseModel):
@@ -83,6 +83,8 @@ class WalletSyncResponse(BaseModel):
 
 class CursorStatusResponse(BaseModel):
     cursors: dict
+    coverage: dict = {}
+    gaps: dict = {}
     sync_status: Optional[str] = None
     score_status: Optional[str] = None
     ai_status: Optional[str] = None
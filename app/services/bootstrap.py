@@ -1,8 +1,14 @@
+import fcntl
+from contextlib import contextmanager
+
 from sqlalchemy import select, text
 
-from app.core.database import session_scope, engine
+from app.core.config import get_settings
+from app.core.database import Base, session_scope, engine
 from app.core.security import hash_password
 from app.models import User, Leaderboard
+from app.models.types import FixedPoint
+from app.services import raw_archive
 import json
 
 PROCESSING_COLUMNS = {
@@ -212,16 +218,197 @@ LEADERBOARD_PRESETS = [
 ]
 
 
+def _columns(conn, table: str) -> set:
+    return {row[1] for row in conn.execute(text(f"PRAGMA table_info('{table}')"))}
+
+
 def ensure_processing_schema() -> None:
     """Ensure new processing columns exist when using SQLite without migrations."""
     with engine.begin() as conn:
         for table, columns in PROCESSING_COLUMNS.items():
-            existing_columns = {row[1] for row in conn.execute(text(f"PRAGMA table_info('{table}')"))}
+            existing_columns = _columns(conn, table)
             for column, ddl in columns.items():
                 if column not in existing_columns:
                     conn.execute(text(f"ALTER TABLE {table} ADD COLUMN {column} {ddl}"))
 
 
+def ensure_fetch_coverage() -> None:
+    """Seed coverage for cursors created before the coverage map existed.
+
+    A cursor claims everything up to ``last_time_ms`` was fetched, so it is
+    recorded as one interval; later syncs extend it and new gaps show up
+    against it.
+    """
+    with engine.begin() as conn:
+        conn.execute(
+            text(
+                """
+                INSERT INTO fetch_coverage (user, stream, start_ms, end_ms, updated_at)
+                SELECT c.user, c.cursor_type, 1, c.last_time_ms, CURRENT_TIMESTAMP
+                FROM fetch_cursors c
+                WHERE c.cursor_type IN ('ledger', 'fills', 'funding')
+                  AND c.last_time_ms > 0
+                  AND NOT EXISTS (
+                    SELECT 1 FROM fetch_coverage f WHERE f.user = c.user AND f.stream = c.cursor_type
+                  )
+                """
+            )
+        )
+
+
+def ensure_current_positions() -> None:
+    """Seed ``current_positions`` from the latest snapshot of each wallet.
+
+    Only wallets without current rows are seeded, so the first sync after an
+    upgrade compares against the stored history instead of writing every
+    position again. The fingerprint comes from the snapshot's ``raw_json``,
+    so this must run before :func:`ensure_raw_archive` drops that column.
+    A ``raw_json`` column left on ``current_positions`` by earlier versions
+    is dropped; the payloads are in the raw archive with the snapshots.
+    """
+    with engine.begin() as conn:
+        if "raw_json" in _columns(conn, "current_positions"):
+            conn.execute(text("ALTER TABLE current_positions DROP COLUMN raw_json"))
+        if "raw_json" not in _columns(conn, "positions_snapshot"):
+            return
+        conn.execute(
+            text(
+                """
+                INSERT INTO current_positions (
+                    user, coin, time_ms, changed_ms, fingerprint, szi, entry_px, pos_value, unrealized_pnl, roe,
+                    liq_px, margin_used, leverage_type, leverage_value, max_leverage, cum_funding_all,
+                    cum_funding_open, cum_funding_change, updated_at
+                )
+                SELECT p.user, p.coin, p.time_ms, p.time_ms,
+                    COALESCE(json_extract(p.raw_json, '$.position.szi'), '') || '|' ||
+                    COALESCE(json_extract(p.raw_json, '$.position.entryPx'), '') || '|' ||
+                    COALESCE(json_extract(p.raw_json, '$.position.leverage.type'), '') || '|' ||
+                    COALESCE(json_extract(p.raw_json, '$.position.leverage.value'), ''),
+                    p.szi, p.entry_px, p.pos_value, p.unrealized_pnl, p.roe, p.liq_px, p.margin_used,
+                    p.leverage_type, p.leverage_value, p.max_leverage, p.cum_funding_all, p.cum_funding_open,
+                    p.cum_funding_change, CURRENT_TIMESTAMP
+                FROM positions_snapshot p
+                WHERE p.time_ms = (SELECT MAX(l.time_ms) FROM positions_snapshot l WHERE l.user = p.user)
+                  AND p.szi != 0
+                  AND NOT EXISTS (SELECT 1 FROM current_positions c WHERE c.user = p.user)
+                """
+            )
+        )
+
+
+# Tables whose raw_json column moved to the raw archive, with the archive kind.
+RAW_ARCHIVE_TABLES = {
+    "fills": "fills",
+    "ledger_events": "ledger",
+    "funding_events": "funding",
+    "orders_history": "orders",
+    "positions_snapshot": "positions",
+}
+RAW_ARCHIVE_BLOCK_ROWS = 5000
+
+
+def ensure_raw_archive() -> None:
+    """Move ``raw_json`` of databases created before the raw archive into it.
+
+    Rows are archived per wallet in blocks, then the column is dropped
+    (SQLite >= 3.35). An interrupted migration simply runs again on the next
+    start; items archived twice are deduplicated on lookup. The freed pages
+    are reused by new rows; run ``VACUUM`` once to shrink the file.
+    """
+    with engine.begin() as conn:
+        for table, kind in RAW_ARCHIVE_TABLES.items():
+            if "raw_json" not in _columns(conn, table):
+                continue
+            user, block = None, []
+            for row_user, time_ms, raw in conn.execute(
+                text(f"SELECT user, time_ms, raw_json FROM {table} ORDER BY user, time_ms")
+            ):
+                if row_user != user or len(block) >= RAW_ARCHIVE_BLOCK_ROWS:
+                    if block:
+                        raw_archive.append(user, kind, block)
+                    user, block = row_user, []
+                if time_ms is not None and raw:
+                    block.append((time_ms, raw))
+            if block:
+                raw_archive.append(user, kind, block)
+            conn.execute(text(f"ALTER TABLE {table} DROP COLUMN raw_json"))
+
+
+FIXED_POINT_MARKER = "storage.fixed_point"
+
+
+def ensure_fixed_point_storage() -> None:
+    """Convert monetary columns to match the ``FIXED_POINT_STORAGE`` setting.
+
+    The scales currently applied are recorded as ``{"table.column": scale}``
+    under the ``storage.fixed_point`` system config key. Columns whose scale
+    differs from the models' are rewritten in place (scaled integers when the
+    flag is on, plain values when it was turned off again), so switching the
+    flag is a one-time conversion on the next start (see :func:`migrate`).
+    """
+    desired = {
+        f"{table.name}.{column.name}": column.type.scale
+        for table in Base.metadata.sorted_tables
+        for column in table.columns
+        if isinstance(column.type, FixedPoint)
+    }
+    with engine.begin() as conn:
+        stored = conn.execute(
+            text("SELECT value FROM system_configs WHERE key = :key"), {"key": FIXED_POINT_MARKER}
+        ).scalar_one_or_none()
+        applied = json.loads(stored) if stored else {}
+        if applied == desired:
+            return
+        for name in sorted(set(applied) | set(desired)):
+            old, new = applied.get(name), desired.get(name)
+            if old == new:
+                continue
+            table, column = name.split(".", 1)
+            value = f"({column} / {10 ** old}.0)" if old else column
+            if new:
+                value = f"CAST(ROUND({value} * {10 ** new}) AS INTEGER)"
+            conn.execute(text(f"UPDATE {table} SET {column} = {value} WHERE {column} IS NOT NULL"))
+        conn.execute(
+            text(
+                """
+                INSERT INTO system_configs (key, value, description, updated_at)
+                VALUES (:key, :value, 'fixed-point column scales (managed at startup)', CURRENT_TIMESTAMP)
+                ON CONFLICT(key) DO UPDATE SET value = excluded.value, updated_at = excluded.updated_at
+                """
+            ),
+            {"key": FIXED_POINT_MARKER, "value": json.dumps(desired, sort_keys=True)},
+        )
+
+
+MIGRATE_LOCK_FILE = ".migrate.lock"
+
+
+@contextmanager
+def _migrate_lock():
+    with (get_settings().data_dir / MIGRATE_LOCK_FILE).open("a") as fh:
+        fcntl.flock(fh, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(fh, fcntl.LOCK_UN)
+
+
+def migrate() -> None:
+    """Bring the SQLite schema up to date; every entrypoint calls this first.
+
+    The API, the RQ workers and the live ingester may each start first after
+    an upgrade, so all of them run the same steps. A file lock serializes
+    processes starting together; every step is a no-op once applied.
+    """
+    with _migrate_lock():
+        Base.metadata.create_all(bind=engine)
+        ensure_processing_schema()
+        ensure_fetch_coverage()
+        ensure_current_positions()
+        ensure_raw_archive()
+        ensure_fixed_point_storage()
+
+
 def ensure_default_admin():
     """Create default admin account if none exists."""
     with session_scope() as session:
@@ -1,30 +1,42 @@
+import asyncio
+import hashlib
 import json
 import logging
+from collections import Counter
+from contextlib import aclosing, closing
 from datetime import datetime
 from decimal import Decimal
-from typing import Dict, List, Optional
+from typing import Any, Dict, List, Optional, Tuple
 
-from sqlalchemy import select, update, func
+from sqlalchemy import UniqueConstraint, case, delete, select, update, func
 from sqlalchemy.dialects.sqlite import insert as sqlite_insert
 
 from app.core.database import session_scope
 from app.models import (
+    FetchCoverage,
     FetchCursor,
+    FetchDigest,
     Fill,
     FundingEvent,
     LedgerEvent,
+    CurrentPosition,
     PositionSnapshot,
     OrderHistory,
     PortfolioSeries,
     PortfolioSnapshot,
     Wallet,
 )
-from app.services.hyperliquid_client import HyperliquidClient
-from app.services import local_cache, processing_config
-from app.services import local_cache
+from app.services.hyperliquid_client import PAGE_LIMITS, AsyncHyperliquidClient, HyperliquidClient
+from app.services import fill_columns, local_cache, processing_config, query, raw_archive
+from app.services.json_stream import iter_array_items
 
 logger = logging.getLogger(__name__)
 
+# Sync functions follow a fetch-then-commit model: cursors are read and the
+# Hyperliquid API is called without holding ``write_lock``; the lock is only
+# taken for the short bulk write of an already normalized batch, so a slow
+# response for one wallet never stalls other writers in the process.
+
 
 def _get_cursor(session, user: str, cursor_type: str) -> int:
     row = session.execute(
@@ -33,11 +45,24 @@ def _get_cursor(session, user: str, cursor_type: str) -> int:
     return row.last_time_ms if row else 0
 
 
+def _read_cursor(user: str, cursor_type: str) -> int:
+    with session_scope() as session:
+        return _get_cursor(session, user, cursor_type)
+
+
 def _upsert_cursor(session, user: str, cursor_type: str, last_time_ms: int) -> None:
+    """Advance a cursor; never moves it backwards.
+
+    Fetches run outside the write lock, so two overlapping syncs may commit out
+    of order. Keeping the cursor monotonic makes the later commit a no-op
+    instead of rewinding progress.
+    """
     row = session.execute(
         select(FetchCursor).where(FetchCursor.user == user, FetchCursor.cursor_type == cursor_type)
     ).scalar_one_or_none()
     if row:
+        if last_time_ms <= row.last_time_ms:
+            return
         session.execute(
             update(FetchCursor)
             .where(FetchCursor.id == row.id)
@@ -47,239 +72,795 @@ def _upsert_cursor(session, user: str, cursor_type: str, last_time_ms: int) -> N
         session.add(FetchCursor(user=user, cursor_type=cursor_type, last_time_ms=last_time_ms))
 
 
+def _record_coverage(session, user: str, stream: str, start_ms: int, end_ms: int) -> None:
+    """Merge ``[start_ms, end_ms]`` into the stream's coverage intervals.
+
+    Overlapping and adjacent intervals are folded into one row, so the rows
+    of a stream never touch and the space between them is exactly the gaps.
+    """
+    if end_ms < start_ms:
+        return
+    rows = session.execute(
+        select(FetchCoverage)
+        .where(
+            FetchCoverage.user == user,
+            FetchCoverage.stream == stream,
+            FetchCoverage.start_ms <= end_ms + 1,
+            FetchCoverage.end_ms >= start_ms - 1,
+        )
+        .order_by(FetchCoverage.start_ms)
+    ).scalars().all()
+    if not rows:
+        session.add(FetchCoverage(user=user, stream=stream, start_ms=start_ms, end_ms=end_ms))
+        return
+    keep = rows[0]
+    keep.start_ms = min(start_ms, keep.start_ms)
+    keep.end_ms = max([end_ms] + [row.end_ms for row in rows])
+    for row in rows[1:]:
+        session.delete(row)
+
+
+def _read_digest(user: str, scope: str) -> Optional[str]:
+    with session_scope() as session:
+        return session.execute(
+            select(FetchDigest.digest).where(FetchDigest.user == user, FetchDigest.scope == scope)
+        ).scalar_one_or_none()
+
+
+def _upsert_digest(session, user: str, scope: str, digest: str) -> None:
+    stmt = sqlite_insert(FetchDigest).values(user=user, scope=scope, digest=digest, updated_at=datetime.utcnow())
+    session.execute(
+        stmt.on_conflict_do_update(
+            index_elements=["user", "scope"],
+            set_={"digest": stmt.excluded.digest, "updated_at": stmt.excluded.updated_at},
+        )
+    )
+
+
 def _dec(value: Optional[str]):
     return Decimal(value) if value is not None else None
 
 
+BULK_INSERT_CHUNK = 1000
+
+
+def _insert_rows(session, model, rows: List[Dict[str, Any]]) -> int:
+    """Bulk insert normalized rows with ``OR IGNORE``; returns number of new rows.
+
+    Rows are sent through a single compiled statement via ``executemany`` in
+    chunks of ``BULK_INSERT_CHUNK``. The DBAPI ``rowcount`` is unreliable for
+    executemany, so the new-row count is taken from SQLite's
+    ``total_changes()`` on the same connection before and after the insert;
+    ignored duplicates do not count as changes.
+    """
+    if not rows:
+        return 0
+    conn = session.connection()
+    stmt = sqlite_insert(model).prefix_with("OR IGNORE")
+    before = conn.exec_driver_sql("SELECT total_changes()").scalar_one()
+    for offset in range(0, len(rows), BULK_INSERT_CHUNK):
+        conn.execute(stmt, rows[offset : offset + BULK_INSERT_CHUNK])
+    after = conn.exec_driver_sql("SELECT total_changes()").scalar_one()
+    return after - before
+
+
+def _insert_new_rows(session, model, rows: List[Dict[str, Any]]) -> List[int]:
+    """Like :func:`_insert_rows`, but returns the indexes of the rows inserted.
+
+    The statement returns the unique key of every row it inserts (ignored
+    duplicates return nothing), which is matched back to ``rows``.
+    """
+    if not rows:
+        return []
+    key = next(
+        constraint.columns for constraint in model.__table__.constraints if isinstance(constraint, UniqueConstraint)
+    )
+    conn = session.connection()
+    stmt = sqlite_insert(model).prefix_with("OR IGNORE").returning(*key)
+    inserted: Counter = Counter()
+    for offset in range(0, len(rows), BULK_INSERT_CHUNK):
+        inserted.update(tuple(row) for row in conn.execute(stmt, rows[offset : offset + BULK_INSERT_CHUNK]))
+    indexes = []
+    for index, row in enumerate(rows):
+        values = tuple(row.get(column.name) for column in key)
+        # A key repeated within ``rows`` was inserted once, for its first row.
+        if inserted[values] > 0:
+            inserted[values] -= 1
+            indexes.append(index)
+    return indexes
+
+
+def _delta_row(user: str, item: Dict[str, Any]) -> Dict[str, Any]:
+    """Normalize a ledger/funding update into a ``LedgerEvent``/``FundingEvent`` row."""
+    delta = item.get("delta", {})
+    return {
+        "user": user,
+        "time_ms": item["time"],
+        "hash": item.get("hash", ""),
+        "delta_type": delta.get("type", ""),
+        "vault": delta.get("vault"),
+        "token": delta.get("token"),
+        "amount": _dec(delta.get("amount") or delta.get("usdc")),
+        "usdc_value": _dec(delta.get("usdcValue") or delta.get("usdc")),
+        "fee": _dec(delta.get("fee")),
+        "native_token_fee": _dec(delta.get("nativeTokenFee")),
+        "nonce": delta.get("nonce"),
+        "basis": _dec(delta.get("basis")),
+        "commission": _dec(delta.get("commission")),
+        "closing_cost": _dec(delta.get("closingCost")),
+        "net_withdrawn_usd": _dec(delta.get("netWithdrawnUsd")),
+        "source_dex": delta.get("sourceDex"),
+        "destination_dex": delta.get("destinationDex"),
+    }
+
+
+def _fill_row(user: str, item: Dict[str, Any]) -> Dict[str, Any]:
+    return {
+        "user": user,
+        "time_ms": item["time"],
+        "coin": item["coin"],
+        "side": item.get("side"),
+        "dir": item.get("dir"),
+        "px": _dec(item.get("px")),
+        "sz": _dec(item.get("sz")),
+        "fee": _dec(item.get("fee")),
+        "fee_token": item.get("feeToken"),
+        "crossed": item.get("crossed"),
+        "closed_pnl": _dec(item.get("closedPnl")),
+        "start_position": _dec(item.get("startPosition")),
+        "hash": item.get("hash"),
+        "oid": item.get("oid"),
+        "tid": item.get("tid"),
+        "builder_fee": _dec(item.get("builderFee")),
+    }
+
+
+def _position_row(
+    user: str, time_ms: Optional[int], ap: Dict[str, Any], summary: Dict[str, Any], withdrawable: Optional[str]
+) -> Dict[str, Any]:
+    pos = ap.get("position", {})
+    leverage = pos.get("leverage", {})
+    cum_funding = pos.get("cumFunding", {})
+    return {
+        "user": user,
+        "time_ms": time_ms,
+        "coin": pos.get("coin"),
+        "szi": _dec(pos.get("szi")),
+        "entry_px": _dec(pos.get("entryPx")),
+        "pos_value": _dec(pos.get("positionValue")),
+        "unrealized_pnl": _dec(pos.get("unrealizedPnl")),
+        "roe": _dec(pos.get("returnOnEquity")),
+        "liq_px": _dec(pos.get("liquidationPx")),
+        "margin_used": _dec(pos.get("marginUsed")),
+        "leverage_type": leverage.get("type"),
+        "leverage_value": _dec(str(leverage.get("value")) if leverage.get("value") is not None else None),
+        "max_leverage": _dec(str(pos.get("maxLeverage")) if pos.get("maxLeverage") is not None else None),
+        "cum_funding_all": _dec(cum_funding.get("allTime")),
+        "cum_funding_open": _dec(cum_funding.get("sinceOpen")),
+        "cum_funding_change": _dec(cum_funding.get("sinceChange")),
+        "summary_account_value": _dec(summary.get("accountValue")),
+        "summary_ntl_pos": _dec(summary.get("totalNtlPos")),
+        "withdrawable": _dec(withdrawable),
+    }
+
+
+def _position_fingerprint(ap: Dict[str, Any]) -> str:
+    """Fields whose change makes a new position snapshot worth storing."""
+    pos = ap.get("position", {})
+    leverage = pos.get("leverage", {})
+    values = (pos.get("szi"), pos.get("entryPx"), leverage.get("type"), leverage.get("value"))
+    return "|".join("" if value is None else str(value) for value in values)
+
+
+def _order_row(user: str, item: Dict[str, Any]) -> Dict[str, Any]:
+    order = item.get("order", {})
+    return {
+        "user": user,
+        "time_ms": order.get("timestamp"),
+        "coin": order.get("coin"),
+        "side": order.get("side"),
+        "limit_px": _dec(order.get("limitPx")),
+        "sz": _dec(order.get("sz")),
+        "order_type": order.get("orderType"),
+        "tif": order.get("tif"),
+        "oid": order.get("oid"),
+        "reduce_only": 1 if order.get("reduceOnly") else 0,
+        "is_trigger": 1 if order.get("isTrigger") else 0,
+        "trigger_px": _dec(order.get("triggerPx")),
+        "trigger_condition": order.get("triggerCondition"),
+        "status": item.get("status"),
+        "status_ts": item.get("statusTimestamp"),
+        "cloid": order.get("cloid"),
+    }
+
+
+def _update_first_trade_time(session, user: str, computed_ts: Optional[int]) -> None:
+    wallet = session.execute(select(Wallet).where(Wallet.address == user)).scalar_one_or_none()
+    if wallet and computed_ts:
+        if wallet.first_trade_time is None or wallet.first_trade_time.timestamp() * 1000 > computed_ts:
+            wallet.first_trade_time = datetime.utcfromtimestamp(computed_ts / 1000)
+            session.add(wallet)
+
+
+# Time-ranged streams share one paginated sync loop. ``request_type`` is the
+# info type requested (and the key for its page limit).
+TIME_STREAMS: Dict[str, Dict[str, Any]] = {
+    "ledger": {
+        "request_type": "userNonFundingLedgerUpdates",
+        "model": LedgerEvent,
+        "normalize": _delta_row,
+        "meta_field": "last_ledger_time_ms",
+    },
+    "fills": {
+        "request_type": "userFillsByTime",
+        "model": Fill,
+        "normalize": _fill_row,
+        "meta_field": "last_fill_time_ms",
+    },
+    "funding": {
+        "request_type": "userFunding",
+        "model": FundingEvent,
+        "normalize": _delta_row,
+        "meta_field": "last_funding_time_ms",
+    },
+}
+
+# Streamed pages are written in chunks of this many items, so memory held per
+# page stays bounded whatever the API page size is.
+STREAM_CHUNK_ITEMS = 500
+
+
+def _page_cursor(last_time: int, start_time: int, page_full: bool) -> int:
+    """Cursor value after a page: every event with ``time <= cursor`` is stored.
+
+    A full page may have been cut in the middle of its last millisecond, so
+    the cursor stops just before it and the next page re-reads that
+    millisecond (duplicates are dropped by ``OR IGNORE``). If an entire full
+    page shares one timestamp we cannot make progress that way and skip past
+    it instead.
+    """
+    if not page_full:
+        return last_time
+    if last_time - 1 >= start_time:
+        return last_time - 1
+    logger.warning("Full page shares timestamp %s; advancing past it", last_time)
+    return last_time
+
+
+def _write_time_items(
+    user: str,
+    stream: str,
+    pairs: List[Tuple[Dict[str, Any], Optional[str]]],
+    cursor_value: Optional[int] = None,
+    coverage: Optional[Tuple[int, int]] = None,
+) -> int:
+    """Store ``(item, raw_json)`` pairs in one short transaction.
+
+    ``cursor_value`` advances the cursor and ``coverage`` records a fetched
+    time range in the same transaction as the rows. Each item is serialized
+    at most once: streamed items carry their source text, which is written to
+    the local cache and the raw archive unchanged. Only the items whose rows
+    were actually inserted are archived, so page-boundary re-reads, retries
+    and catch-up re-fetches do not grow the append-only archive; that happens
+    before the rows are committed, so a stored row always has its raw item.
+    """
+    spec = TIME_STREAMS[stream]
+    pairs = [(item, raw if raw is not None else json.dumps(item, ensure_ascii=False)) for item, raw in pairs]
+    if pairs:
+        local_cache.append_raw_events(user, stream, [(item["time"], raw) for item, raw in pairs])
+    rows = [spec["normalize"](user, item) for item, _ in pairs]
+    with session_scope(use_lock=True) as session:
+        inserted = _insert_new_rows(session, spec["model"], rows)
+        new_rows = len(inserted)
+        raw_archive.append(user, stream, [(pairs[index][0]["time"], pairs[index][1]) for index in inserted])
+        if cursor_value is not None:
+            _upsert_cursor(session, user, stream, cursor_value)
+        if coverage is not None:
+            _record_coverage(session, user, stream, *coverage)
+        if stream == "fills" and new_rows:
+            _update_first_trade_time(session, user, min(item["time"] for item, _ in pairs))
+    if stream == "fills" and new_rows:
+        try:
+            fill_columns.append(user, [rows[index] for index in inserted])
+        except Exception:
+            # Derived store: rebuilt from the DB when its count disagrees.
+            logger.exception("Failed to append fill columns for %s", user)
+    if cursor_value is not None:
+        local_cache.update_metadata(user, **{spec["meta_field"]: cursor_value})
+    return new_rows
+
+
+class _PageWriter:
+    """Writes one streamed page in chunks and advances the cursor at page end.
+
+    ``add`` returns True when a chunk is ready for ``flush``; ``finish``
+    writes the remainder together with the cursor and the page's coverage
+    (``start_time`` up to the new cursor value), so a page interrupted
+    midway leaves its rows stored but the cursor untouched, and the next sync
+    re-reads the page (duplicates are ignored). Backfill windows pass
+    ``advance_cursor=False`` and move the cursor themselves.
+    """
+
+    def __init__(self, user: str, stream: str, start_time: int, advance_cursor: bool = True) -> None:
+        self.user = user
+        self.stream = stream
+        self.start_time = start_time
+        self.advance_cursor = advance_cursor
+        self.pending: List[Tuple[Dict[str, Any], Optional[str]]] = []
+        self.count = 0
+        self.last_time: Optional[int] = None
+        self.new_rows = 0
+
+    def add(self, item: Dict[str, Any], raw: Optional[str]) -> bool:
+        self.pending.append((item, raw))
+        self.count += 1
+        if self.last_time is None or item["time"] > self.last_time:
+            self.last_time = item["time"]
+        return len(self.pending) >= STREAM_CHUNK_ITEMS
+
+    def flush(self) -> None:
+        pairs, self.pending = self.pending, []
+        self.new_rows += _write_time_items(self.user, self.stream, pairs)
+
+    def finish(self) -> Tuple[int, Optional[int], bool]:
+        """Write the rest of the page; returns (new rows, cursor, page was full)."""
+        if not self.count:
+            return 0, None, False
+        page_limit = PAGE_LIMITS.get(TIME_STREAMS[self.stream]["request_type"])
+        page_full = page_limit is not None and self.count >= page_limit
+        cursor_value = _page_cursor(self.last_time, self.start_time, page_full)
+        pairs, self.pending = self.pending, []
+        self.new_rows += _write_time_items(
+            self.user,
+            self.stream,
+            pairs,
+            cursor_value if self.advance_cursor else None,
+            coverage=(self.start_time, cursor_value),
+        )
+        return self.new_rows, cursor_value, page_full
+
+
+def _sync_time_stream(
+    user: str, stream: str, end_time: Optional[int] = None, max_pages: Optional[int] = None
+) -> int:
+    """Page forward from the stream cursor until the window is exhausted.
+
+    Pages are decoded as they arrive and written in chunks; the cursor moves
+    when a page is complete, so a crash resumes from the last finished page.
+    At most ``max_pages_per_sync`` pages are fetched per call, which keeps one
+    very active wallet from holding a worker; the remainder is picked up by
+    the next sync. When a full page leaves more than one backfill window of
+    history to catch up on, the rest is fetched by :func:`backfill_streams`.
+    """
+    request_type = TIME_STREAMS[stream]["request_type"]
+    if max_pages is None:
+        max_pages = processing_config.get_processing_config().get("max_pages_per_sync", 20)
+    start_time = _read_cursor(user, stream) + 1
+    new_rows = 0
+    backfill = False
+    with HyperliquidClient() as client:
+        for _ in range(max_pages):
+            page = _PageWriter(user, stream, start_time)
+            with closing(client.time_range_items(request_type, user, start_time, end_time)) as items:
+                for item, raw in items:
+                    if page.add(item, raw):
+                        page.flush()
+            written, cursor_value, page_full = page.finish()
+            new_rows += written
+            if not page_full:
+                break
+            start_time = cursor_value + 1
+            if _backfill_due(cursor_value, end_time):
+                backfill = True
+                break
+        else:
+            logger.info("Page budget exhausted", extra={"address": user, "stream": stream, "pages": max_pages})
+    if backfill:
+        new_rows += backfill_streams(user, {stream: start_time}, end_time)[stream]
+    return new_rows
+
+
+# Historical backfill: instead of crawling a long history one page after the
+# other, the span between the cursor and now is cut into time windows that
+# are fetched concurrently (bounded by ``backfill_concurrency`` plus the
+# shared rate limiter and AIMD limit) and written independently. The cursor
+# only moves over the contiguous prefix of finished windows, so a failed or
+# unfinished window is retried by the next sync and nothing behind it is
+# skipped.
+
+DAY_MS = 86_400_000
+
+
+def _now_ms() -> int:
+    return int(datetime.utcnow().timestamp() * 1000)
+
+
+def _backfill_due(cursor_value: int, end_time: Optional[int]) -> bool:
+    window_days = processing_config.get_processing_config().get("backfill_window_days", 14)
+    return (end_time or _now_ms()) - cursor_value > window_days * DAY_MS
+
+
+def _backfill_windows(start: int, end: int, window_ms: int, max_windows: int) -> List[Tuple[int, int]]:
+    """The earliest ``max_windows`` windows of ``[start, end]``, aligned to ``end``.
+
+    Aligning to ``end`` keeps the newest window a full window long, so the
+    ones before it are safely in the past.
+    """
+    windows: List[Tuple[int, int]] = []
+    hi = end
+    while hi >= start:
+        lo = max(start, hi - window_ms + 1)
+        windows.append((lo, hi))
+        hi = lo - 1
+    windows.reverse()
+    return windows[:max_windows]
+
+
+def _advance_cursor(user: str, stream: str, cursor_value: int) -> None:
+    with session_scope(use_lock=True) as session:
+        _upsert_cursor(session, user, stream, cursor_value)
+    local_cache.update_metadata(user, **{TIME_STREAMS[stream]["meta_field"]: cursor_value})
+
+
+def _mark_covered(user: str, stream: str, start_ms: int, end_ms: int) -> None:
+    with session_scope(use_lock=True) as session:
+        _record_coverage(session, user, stream, start_ms, end_ms)
+
+
+class _BackfillProgress:
+    """Finished windows of one stream and the cursor of their contiguous prefix."""
+
+    def __init__(self) -> None:
+        self.done: Dict[int, Optional[int]] = {}
+        self.next_index = 0
+
+    def complete(self, index: int, covered_to: Optional[int]) -> Optional[int]:
+        """Record a finished window; returns the new cursor if the prefix grew."""
+        self.done[index] = covered_to
+        cursor_value = None
+        while self.next_index in self.done:
+            covered = self.done.pop(self.next_index)
+            self.next_index += 1
+            if covered is not None:
+                cursor_value = covered
+        return cursor_value
+
+
+async def _backfill_window(
+    client: AsyncHyperliquidClient, user: str, stream: str, lo: int, hi: int, live_edge: bool
+) -> Tuple[int, Optional[int]]:
+    """Fetch every page of ``[lo, hi]``; returns (new rows, time covered up to).
+
+    A past window is complete once its pages are exhausted. The window ending
+    at "now" only counts as covered up to its last event, because events for
+    the last moments may still be arriving.
+    """
+    request_type = TIME_STREAMS[stream]["request_type"]
+    start = lo
+    new_rows = 0
+    covered: Optional[int] = None
+    while True:
+        page = _PageWriter(user, stream, start, advance_cursor=False)
+        items = client.time_range_items(request_type, user, start, hi)
+        async with aclosing(items):
+            async for item, raw in items:
+                if page.add(item, raw):
+                    await asyncio.to_thread(page.flush)
+        written, cursor_value, page_full = await asyncio.to_thread(page.finish)
+        new_rows += written
+        if cursor_value is not None:
+            covered = cursor_value
+        if not page_full:
+            break
+        start = cursor_value + 1
+    if not live_edge:
+        covered = hi
+    if covered is not None:
+        # Also covers the tail of a window whose last page was empty.
+        await asyncio.to_thread(_mark_covered, user, stream, lo, covered)
+    return new_rows, covered
+
+
+async def _run_backfill(
+    user: str, plans: Dict[str, List[Tuple[int, int]]], live_end: Optional[int], concurrency: int
+) -> Tuple[Dict[str, int], List[BaseException]]:
+    semaphore = asyncio.Semaphore(concurrency)
+    totals = {stream: 0 for stream in plans}
+    progress = {stream: _BackfillProgress() for stream in plans}
+
+    async def run_window(client: AsyncHyperliquidClient, stream: str, index: int, lo: int, hi: int) -> None:
+        async with semaphore:
+            new_rows, covered = await _backfill_window(client, user, stream, lo, hi, hi == live_end)
+        totals[stream] += new_rows
+        cursor_value = progress[stream].complete(index, covered)
+        if cursor_value is not None:
+            await asyncio.to_thread(_advance_cursor, user, stream, cursor_value)
+
+    async with AsyncHyperliquidClient() as client:
+        results = await asyncio.gather(
+            *(
+                run_window(client, stream, index, lo, hi)
+                for stream, windows in plans.items()
+                for index, (lo, hi) in enumerate(windows)
+            ),
+            return_exceptions=True,
+        )
+    return totals, [value for value in results if isinstance(value, BaseException)]
+
+
+def _backfill(
+    user: str, starts: Dict[str, int], end_time: Optional[int] = None
+) -> Tuple[Dict[str, int], List[BaseException]]:
+    cfg = processing_config.get_processing_config()
+    end = end_time or _now_ms()
+    window_ms = cfg.get("backfill_window_days", 14) * DAY_MS
+    plans = {
+        stream: _backfill_windows(start, end, window_ms, cfg.get("backfill_max_windows", 48))
+        for stream, start in starts.items()
+    }
+    logger.info(
+        "Backfilling history",
+        extra={"address": user, "windows": {stream: len(windows) for stream, windows in plans.items()}},
+    )
+    return asyncio.run(
+        _run_backfill(user, plans, None if end_time else end, cfg.get("backfill_concurrency", 4))
+    )
+
+
+def repair_gaps(user: str, streams: Optional[List[str]] = None) -> Dict[str, int]:
+    """Refetch only the holes in the coverage map of ``user``'s time streams.
+
+    Each gap is fetched as one paginated range, gaps run concurrently like
+    backfill windows (at most ``backfill_max_windows`` per stream per call),
+    and every repaired range is recorded as covered. Afterwards the cursor
+    moves to the end of the contiguous coverage from the origin, so ranges
+    fetched beyond an old hole are not read again. Returns new rows per
+    stream.
+    """
+    cfg = processing_config.get_processing_config()
+    gaps = query.get_coverage_gaps(user)
+    plans = {
+        stream: [(lo, hi) for lo, hi in gaps.get(stream, [])][: cfg.get("backfill_max_windows", 48)]
+        for stream in streams or TIME_STREAMS
+    }
+    plans = {stream: windows for stream, windows in plans.items() if windows}
+    if not plans:
+        return {stream: 0 for stream in streams or TIME_STREAMS}
+    logger.info(
+        "Repairing coverage gaps",
+        extra={"address": user, "gaps": {stream: len(windows) for stream, windows in plans.items()}},
+    )
+    totals, errors = asyncio.run(_run_backfill(user, plans, None, cfg.get("backfill_concurrency", 4)))
+    coverage = query.get_coverage(user)
+    for stream in plans:
+        intervals = coverage.get(stream) or []
+        if intervals and intervals[0][0] <= query.COVERAGE_ORIGIN_MS:
+            _advance_cursor(user, stream, intervals[0][1])
+    if errors:
+        raise errors[0]
+    return {stream: totals.get(stream, 0) for stream in streams or TIME_STREAMS}
+
+
+def backfill_streams(user: str, starts: Dict[str, int], end_time: Optional[int] = None) -> Dict[str, int]:
+    """Backfill time streams from ``starts[stream]`` to ``end_time`` (default now) in parallel windows.
+
+    At most ``backfill_max_windows`` windows per stream are fetched per call;
+    the remainder continues on the next sync. Returns new rows per stream and
+    re-raises the first window error after the other windows were written.
+    """
+    totals, errors = _backfill(user, starts, end_time)
+    if errors:
+        raise errors[0]
+    return totals
+
+
+def write_live_items(user: str, stream: str, items: List[Dict[str, Any]]) -> int:
+    """Store pushed (WebSocket) items of a time stream and advance its cursor.
+
+    Callers must only push items for a stream that is complete up to its
+    cursor (the live ingestor catches up over REST first), so the range from
+    the cursor to the newest pushed item is recorded as covered and REST
+    polling resumes after it.
+    """
+    if not items:
+        return 0
+    pairs = [(item, None) for item in items]
+    last_time = max(item["time"] for item in items)
+    cursor_value = _read_cursor(user, stream)
+    if last_time <= cursor_value:
+        return _write_time_items(user, stream, pairs)
+    return _write_time_items(user, stream, pairs, last_time, coverage=(cursor_value + 1, last_time))
+
+
 def sync_ledger(user: str, end_time: Optional[int] = None) -> int:
     """Fetch and store ledger updates; returns number of new rows."""
-    with session_scope(use_lock=True) as session, HyperliquidClient() as client:
-        start_time = _get_cursor(session, user, "ledger") + 1
-        batch = client.user_non_funding_ledger_updates(user=user, start_time=start_time, end_time=end_time)
-        if not batch:
-            return 0
-        new_rows = 0
-        last_time_written: Optional[int] = None
-        local_cache.append_events(user, "ledger", batch)
-        for item in batch:
-            delta = item.get("delta", {})
-            stmt = sqlite_insert(LedgerEvent).values(
-                user=user,
-                time_ms=item["time"],
-                hash=item.get("hash", ""),
-                delta_type=delta.get("type", ""),
-                vault=delta.get("vault"),
-                token=delta.get("token"),
-                amount=_dec(delta.get("amount") or delta.get("usdc")),
-                usdc_value=_dec(delta.get("usdcValue") or delta.get("usdc")),
-                fee=_dec(delta.get("fee")),
-                native_token_fee=_dec(delta.get("nativeTokenFee")),
-                nonce=delta.get("nonce"),
-                basis=_dec(delta.get("basis")),
-                commission=_dec(delta.get("commission")),
-                closing_cost=_dec(delta.get("closingCost")),
-                net_withdrawn_usd=_dec(delta.get("netWithdrawnUsd")),
-                source_dex=delta.get("sourceDex"),
-                destination_dex=delta.get("destinationDex"),
-                raw_json=json.dumps(item),
-            ).prefix_with("OR IGNORE")
-            result = session.execute(stmt)
-            if result.rowcount:
-                new_rows += 1
-            event_time = item["time"]
-            start_time = max(start_time, event_time + 1)
-            last_time_written = event_time if last_time_written is None else max(last_time_written, event_time)
-        if new_rows:
-            cursor_value = last_time_written if last_time_written is not None else (start_time - 1)
-            _upsert_cursor(session, user, "ledger", cursor_value)
-            local_cache.update_metadata(user, last_ledger_time_ms=cursor_value)
-        return new_rows
+    return _sync_time_stream(user, "ledger", end_time)
 
 
 def sync_fills(user: str, end_time: Optional[int] = None) -> int:
     """Fetch fills with time pagination; returns number of new rows."""
-    with session_scope(use_lock=True) as session, HyperliquidClient() as client:
-        start_time = _get_cursor(session, user, "fills") + 1
-        batch = client.user_fills(user=user, start_time=start_time, end_time=end_time)
-        if not batch:
-            return 0
-        new_rows = 0
-        last_time_written: Optional[int] = None
-        earliest_time: Optional[int] = None
-        local_cache.append_events(user, "fills", batch)
-        for item in batch:
-            stmt = sqlite_insert(Fill).values(
-                user=user,
-                time_ms=item["time"],
-                coin=item["coin"],
-                side=item.get("side"),
-                dir=item.get("dir"),
-                px=_dec(item.get("px")),
-                sz=_dec(item.get("sz")),
-                fee=_dec(item.get("fee")),
-                fee_token=item.get("feeToken"),
-                crossed=item.get("crossed"),
-                closed_pnl=_dec(item.get("closedPnl")),
-                start_position=_dec(item.get("startPosition")),
-                hash=item.get("hash"),
-                oid=item.get("oid"),
-                tid=item.get("tid"),
-                builder_fee=_dec(item.get("builderFee")),
-                raw_json=json.dumps(item),
-            ).prefix_with("OR IGNORE")
-            result = session.execute(stmt)
-            if result.rowcount:
-                new_rows += 1
-            event_time = item["time"]
-            start_time = max(start_time, event_time + 1)
-            last_time_written = event_time if last_time_written is None else max(last_time_written, event_time)
-            earliest_time = event_time if earliest_time is None else min(earliest_time, event_time)
-        if new_rows:
-            cursor_value = last_time_written if last_time_written is not None else (start_time - 1)
-            _upsert_cursor(session, user, "fills", cursor_value)
-            local_cache.update_metadata(user, last_fill_time_ms=cursor_value)
-            wallet = session.execute(select(Wallet).where(Wallet.address == user)).scalar_one_or_none()
-            computed_ts = earliest_time if earliest_time is not None else cursor_value
-            if wallet and computed_ts:
-                if wallet.first_trade_time is None or wallet.first_trade_time.timestamp() * 1000 > computed_ts:
-                    wallet.first_trade_time = datetime.utcfromtimestamp(computed_ts / 1000)
-                    session.add(wallet)
-        return new_rows
+    return _sync_time_stream(user, "fills", end_time)
 
 
 def sync_funding(user: str, end_time: Optional[int] = None) -> int:
-    with session_scope(use_lock=True) as session, HyperliquidClient() as client:
-        start_time = _get_cursor(session, user, "funding") + 1
-        batch = client.user_funding(user=user, start_time=start_time, end_time=end_time)
-        if not batch:
-            return 0
-        new_rows = 0
-        last_time_written: Optional[int] = None
-        local_cache.append_events(user, "funding", batch)
-        for item in batch:
-            delta = item.get("delta", {})
-            stmt = sqlite_insert(FundingEvent).values(
-                user=user,
-                time_ms=item["time"],
-                hash=item.get("hash", ""),
-                delta_type=delta.get("type", ""),
-                vault=delta.get("vault"),
-                token=delta.get("token"),
-                amount=_dec(delta.get("amount") or delta.get("usdc")),
-                usdc_value=_dec(delta.get("usdcValue") or delta.get("usdc")),
-                fee=_dec(delta.get("fee")),
-                native_token_fee=_dec(delta.get("nativeTokenFee")),
-                nonce=delta.get("nonce"),
-                basis=_dec(delta.get("basis")),
-                commission=_dec(delta.get("commission")),
-                closing_cost=_dec(delta.get("closingCost")),
-                net_withdrawn_usd=_dec(delta.get("netWithdrawnUsd")),
-                source_dex=delta.get("sourceDex"),
-                destination_dex=delta.get("destinationDex"),
-                raw_json=json.dumps(item),
-            ).prefix_with("OR IGNORE")
-            result = session.execute(stmt)
-            if result.rowcount:
-                new_rows += 1
-            event_time = item["time"]
-            start_time = max(start_time, event_time + 1)
-            last_time_written = event_time if last_time_written is None else max(last_time_written, event_time)
-        if new_rows:
-            cursor_value = last_time_written if last_time_written is not None else (start_time - 1)
-            _upsert_cursor(session, user, "funding", cursor_value)
-            local_cache.update_metadata(user, last_funding_time_ms=cursor_value)
-        return new_rows
+    return _sync_time_stream(user, "funding", end_time)
+
+
+def _write_user_fees(user: str, payload: Any) -> None:
+    local_cache.write_json(user, "fees.json", payload)
+    local_cache.update_metadata(user, last_fee_sync_ms=int(datetime.utcnow().timestamp() * 1000))
 
 
 def sync_user_fees(user: str) -> None:
     with HyperliquidClient() as client:
         payload = client.user_fees(user=user)
-    local_cache.write_json(user, "fees.json", payload)
-    local_cache.update_metadata(user, last_fee_sync_ms=int(datetime.utcnow().timestamp() * 1000))
+    _write_user_fees(user, payload)
+
+
+CURRENT_POSITION_FIELDS = (
+    "szi",
+    "entry_px",
+    "pos_value",
+    "unrealized_pnl",
+    "roe",
+    "liq_px",
+    "margin_used",
+    "leverage_type",
+    "leverage_value",
+    "max_leverage",
+    "cum_funding_all",
+    "cum_funding_open",
+    "cum_funding_change",
+)
+
+
+def _write_positions(user: str, snapshot: Any) -> int:
+    """Store a clearinghouse snapshot as position changes.
+
+    ``current_positions`` always holds the latest state per coin. A
+    ``PositionSnapshot`` row is only written when size, entry price or
+    leverage changed since the last one, and a row with ``szi = 0`` is written
+    when a position disappears from the snapshot, so the history still reads
+    as the sequence of position states. Returns the snapshot rows written.
+    """
+    if not snapshot or not isinstance(snapshot, dict) or "assetPositions" not in snapshot:
+        return 0
+    summary = snapshot.get("marginSummary", {}) or {}
+    withdrawable = snapshot.get("withdrawable")
+    time_ms = snapshot.get("time")
+    if time_ms is None:
+        return 0
+    observed = {}
+    for ap in snapshot.get("assetPositions") or []:
+        row = _position_row(user, time_ms, ap, summary, withdrawable)
+        if row["coin"]:
+            observed[row["coin"]] = (row, _position_fingerprint(ap), json.dumps(ap))
+    with session_scope() as session:
+        current = dict(
+            session.execute(
+                select(CurrentPosition.coin, CurrentPosition.fingerprint).where(CurrentPosition.user == user)
+            ).all()
+        )
+    if not observed and not current:
+        return 0
+    changed = [entry for coin, entry in observed.items() if current.get(coin) != entry[1]]
+    closed = [coin for coin in current if coin not in observed]
+    closing_items = [{"position": {"coin": coin, "szi": "0"}} for coin in closed]
+    closing_rows = [_position_row(user, time_ms, item, summary, withdrawable) for item in closing_items]
+    now = datetime.utcnow()
+    current_rows = [
+        {
+            "user": user,
+            "coin": coin,
+            "time_ms": time_ms,
+            "changed_ms": time_ms,
+            "fingerprint": fingerprint,
+            "updated_at": now,
+            **{field: row[field] for field in CURRENT_POSITION_FIELDS},
+        }
+        for coin, (row, fingerprint, _) in observed.items()
+    ]
+    raw_archive.append(
+        user,
+        "positions",
+        [(time_ms, raw) for _, _, raw in changed] + [(time_ms, json.dumps(item)) for item in closing_items],
+    )
+    with session_scope(use_lock=True) as session:
+        written = _insert_rows(session, PositionSnapshot, [row for row, _, _ in changed] + closing_rows)
+        if current_rows:
+            stmt = sqlite_insert(CurrentPosition).values(current_rows)
+            refreshed = {
+                field: stmt.excluded[field] for field in ("time_ms", "updated_at", *CURRENT_POSITION_FIELDS)
+            }
+            refreshed["fingerprint"] = stmt.excluded.fingerprint
+            # changed_ms only moves when the material fields did.
+            refreshed["changed_ms"] = case(
+                (CurrentPosition.fingerprint == stmt.excluded.fingerprint, CurrentPosition.changed_ms),
+                else_=stmt.excluded.changed_ms,
+            )
+            session.execute(stmt.on_conflict_do_update(index_elements=["user", "coin"], set_=refreshed))
+        if closed:
+            session.execute(
+                delete(CurrentPosition).where(CurrentPosition.user == user, CurrentPosition.coin.in_(closed))
+            )
+        if written:
+            _upsert_cursor(session, user, "positions", time_ms)
+    return written
 
 
 def sync_positions(user: str) -> int:
     """Fetch current positions snapshot; returns number of rows written."""
-    with session_scope(use_lock=True) as session, HyperliquidClient() as client:
-        snapshot = client.portfolio(user)
-        if not snapshot or not isinstance(snapshot, dict):
-            return 0
-        asset_positions = snapshot.get("assetPositions", [])
-        summary = snapshot.get("marginSummary", {}) or {}
-        withdrawable = snapshot.get("withdrawable")
-        time_ms = snapshot.get("time")
-        written = 0
-        for ap in asset_positions:
-            pos = ap.get("position", {})
-            leverage = pos.get("leverage", {})
-            cum_funding = pos.get("cumFunding", {})
-            stmt = sqlite_insert(PositionSnapshot).values(
-                user=user,
-                time_ms=time_ms,
-                coin=pos.get("coin"),
-                szi=_dec(pos.get("szi")),
-                entry_px=_dec(pos.get("entryPx")),
-                pos_value=_dec(pos.get("positionValue")),
-                unrealized_pnl=_dec(pos.get("unrealizedPnl")),
-                roe=_dec(pos.get("returnOnEquity")),
-                liq_px=_dec(pos.get("liquidationPx")),
-                margin_used=_dec(pos.get("marginUsed")),
-                leverage_type=leverage.get("type"),
-                leverage_value=_dec(str(leverage.get("value")) if leverage.get("value") is not None else None),
-                max_leverage=_dec(str(pos.get("maxLeverage")) if pos.get("maxLeverage") is not None else None),
-                cum_funding_all=_dec(cum_funding.get("allTime")),
-                cum_funding_open=_dec(cum_funding.get("sinceOpen")),
-                cum_funding_change=_dec(cum_funding.get("sinceChange")),
-                summary_account_value=_dec(summary.get("accountValue")),
-                summary_ntl_pos=_dec(summary.get("totalNtlPos")),
-                withdrawable=_dec(withdrawable),
-                raw_json=json.dumps(ap),
-            ).prefix_with("OR IGNORE")
-            result = session.execute(stmt)
-            if result.rowcount:
-                written += 1
-        if written:
-            _upsert_cursor(session, user, "positions", time_ms or 0)
-        return written
+    with HyperliquidClient() as client:
+        snapshot = client.clearinghouse_state(user)
+    return _write_positions(user, snapshot)
+
+
+ORDERS_DIGEST_SCOPE = "historicalOrders"
+
+
+def _write_orders(user: str, body: bytes) -> int:
+    """Apply a ``historicalOrders`` response as a diff against stored orders.
+
+    The endpoint has no time filter and always returns the latest 2000
+    orders. The body is fingerprinted before parsing: an unchanged response
+    is neither decoded nor written. Otherwise the window is compared with the
+    stored orders from its oldest timestamp on; new orders are inserted and
+    orders whose ``status``/``statusTimestamp`` changed are updated in place.
+    Returns the number of rows inserted or updated.
+    """
+    if not body:
+        return 0
+    digest = hashlib.sha256(body).hexdigest()
+    if _read_digest(user, ORDERS_DIGEST_SCOPE) == digest:
+        return 0
+    latest: Dict[Tuple[int, Optional[int]], Tuple[Dict[str, Any], str]] = {}
+    for item, raw in iter_array_items([body.decode("utf-8")]):
+        row = _order_row(user, item)
+        if row["time_ms"] is None:
+            continue
+        key = (row["time_ms"], row["oid"])
+        current = latest.get(key)
+        if current is None or (row["status_ts"] or 0) >= (current[0]["status_ts"] or 0):
+            latest[key] = (row, raw)
+    stored: Dict[Tuple[int, Optional[int]], Tuple[int, Optional[str], Optional[int]]] = {}
+    if latest:
+        window_start = min(time_ms for time_ms, _ in latest)
+        with session_scope() as session:
+            for order_id, time_ms, oid, status, status_ts in session.execute(
+                select(
+                    OrderHistory.id, OrderHistory.time_ms, OrderHistory.oid, OrderHistory.status, OrderHistory.status_ts
+                ).where(OrderHistory.user == user, OrderHistory.time_ms >= window_start)
+            ):
+                stored[(time_ms, oid)] = (order_id, status, status_ts)
+    inserts = [(row, raw) for key, (row, raw) in latest.items() if key not in stored]
+    updated = [
+        (key, row, raw)
+        for key, (row, raw) in latest.items()
+        if key in stored and stored[key][1:] != (row["status"], row["status_ts"])
+    ]
+    updates = [
+        {"id": stored[key][0], "status": row["status"], "status_ts": row["status_ts"]} for key, row, _ in updated
+    ]
+    raw_archive.append(
+        user,
+        "orders",
+        [(row["time_ms"], raw) for row, raw in inserts] + [(row["time_ms"], raw) for _, row, raw in updated],
+    )
+    with session_scope(use_lock=True) as session:
+        written = _insert_rows(session, OrderHistory, [row for row, _ in inserts])
+        if updates:
+            session.execute(update(OrderHistory), updates)
+        if latest:
+            _upsert_cursor(session, user, "orders", max(time_ms for time_ms, _ in latest))
+        _upsert_digest(session, user, ORDERS_DIGEST_SCOPE, digest)
+    return written + len(updates)
 
 
 def sync_orders(user: str) -> int:
-    """Fetch historical orders (most recent 2000) and store; not paginated by API limit."""
-    with session_scope(use_lock=True) as session, HyperliquidClient() as client:
-        start_time = _get_cursor(session, user, "orders") + 1
-        batch = client.historical_orders(user=user)
-        new_rows = 0
-        for item in batch:
-            order = item.get("order", {})
-            status = item.get("status")
-            status_ts = item.get("statusTimestamp")
-            if order.get("timestamp", 0) < start_time:
-                continue
-            stmt = sqlite_insert(OrderHistory).values(
-                user=user,
-                time_ms=order.get("timestamp"),
-                coin=order.get("coin"),
-                side=order.get("side"),
-                limit_px=_dec(order.get("limitPx")),
-                sz=_dec(order.get("sz")),
-                order_type=order.get("orderType"),
-                tif=order.get("tif"),
-                reduce_only=1 if order.get("reduceOnly") else 0,
-                is_trigger=1 if order.get("isTrigger") else 0,
-                trigger_px=_dec(order.get("triggerPx")),
-                trigger_condition=order.get("triggerCondition"),
-                status=status,
-                status_ts=status_ts,
-                cloid=order.get("cloid"),
-                raw_json=json.dumps(item),
-            ).prefix_with("OR IGNORE")
-            result = session.execute(stmt)
-            if result.rowcount:
-                new_rows += 1
-            start_time = max(start_time, order.get("timestamp", 0) + 1)
-        if new_rows:
-            _upsert_cursor(session, user, "orders", start_time - 1)
-        return new_rows
+    """Fetch historical orders (most recent 2000) and store the changes; not paginated by API limit."""
+    with HyperliquidClient() as client:
+        body = client.historical_orders_raw(user=user)
+    return _write_orders(user, body)
 
 
 def _should_refresh_portfolio(session, user: str) -> bool:
@@ -293,47 +874,187 @@ def _should_refresh_portfolio(session, user: str) -> bool:
     return (now - last).total_seconds() >= min_hours * 3600
 
 
-def sync_portfolio_series(user: str, force: bool = False) -> int:
-    """Fetch portfolio time series and store account value/pnl per interval."""
-    with session_scope(use_lock=True) as session:
-        if not force and not _should_refresh_portfolio(session, user):
-            return 0
-        with HyperliquidClient() as client:
-            data = client.portfolio(user=user)
-        if not data or not isinstance(data, list):
+def _portfolio_due(user: str, force: bool = False) -> bool:
+    if force:
+        return True
+    with session_scope() as session:
+        return _should_refresh_portfolio(session, user)
+
+
+PORTFOLIO_DIGEST_PREFIX = "portfolio:"
+
+
+def _write_portfolio_series(user: str, data: Any) -> int:
+    """Store the portfolio series of every interval whose payload changed.
+
+    Each interval's payload is hashed and compared with the digest stored for
+    ``portfolio:<interval>``; unchanged intervals are skipped without touching
+    the database. For changed intervals only points after the newest stored
+    ``ts`` are inserted and the snapshot metrics are recomputed.
+    """
+    if not data or not isinstance(data, list):
+        return 0
+    intervals: Dict[str, Tuple[Dict[str, Any], str, str]] = {}
+    for interval_pair in data:
+        if not isinstance(interval_pair, list) or len(interval_pair) != 2:
+            continue
+        interval, payload = interval_pair
+        canonical = json.dumps(payload, sort_keys=True, separators=(",", ":"))
+        intervals[interval] = (payload, canonical, hashlib.sha256(canonical.encode()).hexdigest())
+    with session_scope() as session:
+        stored_digests = dict(
+            session.execute(
+                select(FetchDigest.scope, FetchDigest.digest).where(
+                    FetchDigest.user == user, FetchDigest.scope.startswith(PORTFOLIO_DIGEST_PREFIX)
+                )
+            ).all()
+        )
+        changed = {
+            interval: entry
+            for interval, entry in intervals.items()
+            if stored_digests.get(PORTFOLIO_DIGEST_PREFIX + interval) != entry[2]
+        }
+        if not changed:
             return 0
-        written = 0
-        for interval_pair in data:
-            if not isinstance(interval_pair, list) or len(interval_pair) != 2:
+        last_ts = dict(
+            session.execute(
+                select(PortfolioSeries.interval, func.max(PortfolioSeries.ts))
+                .where(PortfolioSeries.user == user, PortfolioSeries.interval.in_(list(changed)))
+                .group_by(PortfolioSeries.interval)
+            ).all()
+        )
+    series_rows: List[Dict[str, Any]] = []
+    snapshot_rows: List[Dict[str, Any]] = []
+    for interval, (payload, canonical, _) in changed.items():
+        av_hist = {int(ts): val for ts, val in payload.get("accountValueHistory", [])}
+        pnl_hist = {int(ts): val for ts, val in payload.get("pnlHistory", [])}
+        after = last_ts.get(interval)
+        for ts in sorted(set(av_hist.keys()) | set(pnl_hist.keys())):
+            if after is not None and ts <= after:
                 continue
-            interval, payload = interval_pair
-            av_hist = {int(ts): val for ts, val in payload.get("accountValueHistory", [])}
-            pnl_hist = {int(ts): val for ts, val in payload.get("pnlHistory", [])}
-            ts_set = set(av_hist.keys()) | set(pnl_hist.keys())
-            for ts in ts_set:
-                stmt = sqlite_insert(PortfolioSeries).values(
-                    user=user,
-                    interval=interval,
-                    ts=ts,
-                    account_value=_dec(av_hist.get(ts)),
-                    pnl=_dec(pnl_hist.get(ts)),
-                    vlm=_dec(payload.get("vlm")),
-                ).prefix_with("OR IGNORE")
-                result = session.execute(stmt)
-                if result.rowcount:
-                    written += 1
-            ret_pct, drawdown_pct = _compute_portfolio_metrics(list(av_hist.items()))
-            snapshot_stmt = sqlite_insert(PortfolioSnapshot).values(
-                user=user,
-                period=interval,
-                payload=json.dumps(payload),
-                return_pct=ret_pct,
-                max_drawdown_pct=drawdown_pct,
-                volume=_dec(payload.get("vlm")),
-                updated_at=datetime.utcnow(),
-            ).prefix_with("OR REPLACE")
-            session.execute(snapshot_stmt)
-        return written
+            series_rows.append(
+                {
+                    "user": user,
+                    "interval": interval,
+                    "ts": ts,
+                    "account_value": _dec(av_hist.get(ts)),
+                    "pnl": _dec(pnl_hist.get(ts)),
+                    "vlm": _dec(payload.get("vlm")),
+                }
+            )
+        ret_pct, drawdown_pct = _compute_portfolio_metrics(list(av_hist.items()))
+        snapshot_rows.append(
+            {
+                "user": user,
+                "period": interval,
+                "payload": canonical,
+                "return_pct": ret_pct,
+                "max_drawdown_pct": drawdown_pct,
+                "volume": _dec(payload.get("vlm")),
+                "updated_at": datetime.utcnow(),
+            }
+        )
+    with session_scope(use_lock=True) as session:
+        written = _insert_rows(session, PortfolioSeries, series_rows)
+        for row in snapshot_rows:
+            session.execute(sqlite_insert(PortfolioSnapshot).values(**row).prefix_with("OR REPLACE"))
+        for interval, (_, _, digest) in changed.items():
+            _upsert_digest(session, user, PORTFOLIO_DIGEST_PREFIX + interval, digest)
+    return written
+
+
+def sync_portfolio_series(user: str, force: bool = False) -> int:
+    """Fetch portfolio time series and store account value/pnl per interval."""
+    if not _portfolio_due(user, force):
+        return 0
+    with HyperliquidClient() as client:
+        data = client.portfolio(user=user)
+    return _write_portfolio_series(user, data)
+
+
+async def _stream_first_page(
+    client: AsyncHyperliquidClient, user: str, stream: str, start_time: int, end_time: Optional[int]
+) -> Tuple[int, Optional[int], bool]:
+    page = _PageWriter(user, stream, start_time)
+    items = client.time_range_items(TIME_STREAMS[stream]["request_type"], user, start_time, end_time)
+    async with aclosing(items):
+        async for item, raw in items:
+            if page.add(item, raw):
+                await asyncio.to_thread(page.flush)
+    return await asyncio.to_thread(page.finish)
+
+
+async def _fetch_wallet_concurrent(
+    user: str, start_times: Dict[str, int], end_time: Optional[int]
+) -> Dict[str, Any]:
+    async with AsyncHyperliquidClient() as client:
+        requests = {
+            stream: _stream_first_page(client, user, stream, start_times[stream], end_time)
+            for stream in TIME_STREAMS
+        }
+        requests["fees"] = client.user_fees(user=user)
+        requests["positions"] = client.clearinghouse_state(user=user)
+        requests["portfolio"] = client.portfolio(user=user)
+        requests["orders"] = client.historical_orders_raw(user=user)
+        results = await asyncio.gather(*requests.values(), return_exceptions=True)
+    return dict(zip(requests.keys(), results))
+
+
+def sync_wallet_concurrent(user: str, end_time: Optional[int] = None) -> Dict[str, int]:
+    """Fetch every endpoint for a wallet concurrently, then run the writers.
+
+    The first page of each time stream, fees, positions (clearinghouse
+    state), portfolio and historical orders are requested at once over one
+    pooled async client, so sync latency is bounded by the slowest endpoint
+    instead of the sum of all of them. Time stream pages are written in
+    chunks while they stream in. Time streams whose first page was full continue with the regular
+    paginated loop for the rest of their page budget or, when more than one
+    backfill window of history remains (typically a newly imported wallet),
+    with a windowed parallel backfill of all such streams at once.
+
+    Results that did arrive are written even if another request failed; the
+    first error is re-raised afterwards so the sync is still reported failed.
+    """
+    start_times = {stream: _read_cursor(user, stream) + 1 for stream in TIME_STREAMS}
+    refresh_portfolio = _portfolio_due(user)
+    fetched = asyncio.run(_fetch_wallet_concurrent(user, start_times, end_time))
+    errors = [value for value in fetched.values() if isinstance(value, BaseException)]
+
+    def ok(key: str) -> bool:
+        return not isinstance(fetched[key], BaseException)
+
+    max_pages = processing_config.get_processing_config().get("max_pages_per_sync", 20)
+    result: Dict[str, int] = {}
+    backfill_starts: Dict[str, int] = {}
+    for stream in TIME_STREAMS:
+        if not ok(stream):
+            result[stream] = 0
+            continue
+        new_rows, cursor_value, page_full = fetched[stream]
+        if page_full and _backfill_due(cursor_value, end_time):
+            backfill_starts[stream] = cursor_value + 1
+        elif page_full and max_pages > 1:
+            # A failed continuation must not keep the remaining writers from running.
+            try:
+                new_rows += _sync_time_stream(user, stream, end_time, max_pages=max_pages - 1)
+            except Exception as exc:
+                errors.append(exc)
+        result[stream] = new_rows
+    if backfill_starts:
+        totals, backfill_errors = _backfill(user, backfill_starts, end_time)
+        for stream, new_rows in totals.items():
+            result[stream] += new_rows
+        errors.extend(backfill_errors)
+    if ok("fees"):
+        _write_user_fees(user, fetched["fees"])
+    result["positions"] = _write_positions(user, fetched["positions"]) if ok("positions") else 0
+    result["orders"] = _write_orders(user, fetched["orders"]) if ok("orders") else 0
+    result["portfolio_points"] = (
+        _write_portfolio_series(user, fetched["portfolio"]) if refresh_portfolio and ok("portfolio") else 0
+    )
+    if errors:
+        raise errors[0]
+    return result
 
 
 def _compute_portfolio_metrics(av_hist: list[tuple[int, str]]) -> tuple[Optional[Decimal], Optional[Decimal]]:
@@ -0,0 +1,334 @@
+"""Columnar per-wallet fill store for analytics reads.
+
+Every wallet gets one flat binary file per column under
+``<fill_columns_dir>/<wallet>/``::
+
+    time_ms.bin  tid.bin  oid.bin  coin.bin  px.bin  sz.bin  fee.bin  closed_pnl.bin
+
+``time_ms``/``tid``/``oid`` are int64, ``coin`` is an int32 id into
+``coins.json`` and the amounts are int64 scaled like the fixed-point DB
+columns (``px``/``sz`` by 10^8, ``fee``/``closed_pnl`` by 10^6), so they
+convert back to exact ``Decimal`` values and sum exactly. Amounts are rounded
+half-even to those scales whether or not ``FIXED_POINT_STORAGE`` is on;
+Hyperliquid reports fewer decimals, so this only strips the float noise of
+``Numeric`` columns in SQLite. :func:`exact` applies the same rounding to
+values read from the DB. :func:`load` returns read-only ``numpy.memmap``
+views in time order: scoring a wallet reads a few MB of contiguous arrays
+instead of building an ORM object per fill.
+
+The ETL appends newly inserted fills (:func:`append`, deduplicated by
+``(time_ms, tid, oid)`` like the ``fills`` unique constraint, so the store
+keeps exactly the rows the table does). Backfill pages arrive out of order;
+the store is then marked unsorted and the next :func:`load` rewrites it
+sorted. The DB stays the
+source of truth: callers pass the DB fill count and a store that disagrees
+(missing directory, crash between commit and append) is rebuilt from it.
+
+A wallet with an amount that does not fit int64 at its scale (a spot fill
+of more than ~9.2e10 tokens) cannot be stored: its store is marked
+``overflow`` in ``meta.json`` and :func:`load` returns None, so scoring reads
+that wallet from the DB.
+
+NumPy is optional; without it :func:`available` is False and callers read
+the DB directly.
+"""
+from __future__ import annotations
+
+import fcntl
+import json
+import logging
+import os
+from contextlib import contextmanager
+from decimal import ROUND_HALF_EVEN, Decimal, InvalidOperation
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, NamedTuple, Optional
+
+from sqlalchemy import asc, select
+
+from app.core.config import get_settings
+from app.core.database import session_scope
+from app.models import Fill
+from app.models.types import FixedPoint
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover - optional dependency
+    np = None
+
+logger = logging.getLogger(__name__)
+
+# column -> (dtype, scale of the stored integer or None)
+COLUMNS = {
+    "time_ms": ("<i8", None),
+    "tid": ("<i8", None),
+    "oid": ("<i8", None),
+    "coin": ("<i4", None),
+    "px": ("<i8", 8),
+    "sz": ("<i8", 8),
+    "fee": ("<i8", 6),
+    "closed_pnl": ("<i8", 6),
+}
+COINS_FILE = "coins.json"
+META_FILE = "meta.json"
+LOCK_FILE = ".lock"
+MISSING_ID = -1
+
+_SCALERS = {name: FixedPoint(scale) for name, (_, scale) in COLUMNS.items() if scale is not None}
+_QUANTA = {name: Decimal(1).scaleb(-scale) for name, (_, scale) in COLUMNS.items() if scale is not None}
+
+
+class FillColumns(NamedTuple):
+    """Time-ordered column views of one wallet's fills."""
+
+    time_ms: Any
+    tid: Any
+    oid: Any
+    coin: Any
+    px: Any
+    sz: Any
+    fee: Any
+    closed_pnl: Any
+    coins: List[str]
+
+    def __len__(self) -> int:
+        return len(self.time_ms)
+
+    def decimal(self, column: str, index: int) -> Decimal:
+        """Exact ``Decimal`` of a scaled amount column."""
+        return Decimal(int(getattr(self, column)[index])).scaleb(-COLUMNS[column][1])
+
+
+def exact(column: str, value: Any) -> Decimal:
+    """``value`` rounded like the stored ``column``, as :func:`load` returns it.
+
+    Rounds regardless of ``FIXED_POINT_STORAGE`` so DB reads and the store
+    agree exactly (see the module docstring). Unlike the store it has no
+    range limit.
+    """
+    if not isinstance(value, Decimal):
+        value = Decimal(str(value or 0))
+    try:
+        return value.quantize(_QUANTA[column], rounding=ROUND_HALF_EVEN)
+    except InvalidOperation:  # more digits than the Decimal context holds
+        return value
+
+
+def available() -> bool:
+    return np is not None
+
+
+def _wallet_dir(user: str) -> Path:
+    target = get_settings().fill_columns_dir / user.lower()
+    target.mkdir(parents=True, exist_ok=True)
+    return target
+
+
+@contextmanager
+def _locked(target: Path, exclusive: bool = False):
+    with (target / LOCK_FILE).open("a") as fh:
+        fcntl.flock(fh, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+        try:
+            yield
+        finally:
+            fcntl.flock(fh, fcntl.LOCK_UN)
+
+
+def _read_json(path: Path, default: Any) -> Any:
+    try:
+        return json.loads(path.read_text(encoding="utf-8"))
+    except (FileNotFoundError, json.JSONDecodeError):
+        return default
+
+
+def _write_json(path: Path, payload: Any) -> None:
+    tmp = path.with_name(path.name + ".tmp")
+    tmp.write_text(json.dumps(payload), encoding="utf-8")
+    os.replace(tmp, path)
+
+
+def _count(target: Path) -> int:
+    """Rows present in every column file (a torn append is ignored)."""
+    counts = []
+    for name, (dtype, _) in COLUMNS.items():
+        path = target / f"{name}.bin"
+        counts.append(path.stat().st_size // np.dtype(dtype).itemsize if path.exists() else 0)
+    return min(counts)
+
+
+def _map(target: Path, name: str, count: int):
+    dtype = COLUMNS[name][0]
+    if count == 0:
+        return np.empty(0, dtype=dtype)
+    return np.memmap(target / f"{name}.bin", dtype=dtype, mode="r", shape=(count,))
+
+
+def _id(value: Any) -> int:
+    return MISSING_ID if value is None else int(value)
+
+
+def _encode(rows: Iterable[Dict[str, Any]], coins: List[str]) -> Dict[str, Any]:
+    coin_ids = {coin: idx for idx, coin in enumerate(coins)}
+    values: Dict[str, List[int]] = {name: [] for name in COLUMNS}
+    for row in rows:
+        coin = row.get("coin") or ""
+        if coin not in coin_ids:
+            coin_ids[coin] = len(coins)
+            coins.append(coin)
+        values["time_ms"].append(int(row["time_ms"]))
+        values["tid"].append(_id(row.get("tid")))
+        values["oid"].append(_id(row.get("oid")))
+        values["coin"].append(coin_ids[coin])
+        for name, scaler in _SCALERS.items():
+            values[name].append(scaler.scaled(row.get(name) or 0))
+    return {name: np.asarray(column, dtype=COLUMNS[name][0]) for name, column in values.items()}
+
+
+def _write_columns(target: Path, arrays: Dict[str, Any], mode: str) -> None:
+    for name, array in arrays.items():
+        path = target / f"{name}.bin"
+        if mode == "ab":
+            with path.open("ab", buffering=0) as fh:
+                fh.write(array.tobytes())
+        else:
+            tmp = path.with_name(path.name + ".tmp")
+            tmp.write_bytes(array.tobytes())
+            os.replace(tmp, path)
+
+
+def _overflowed(target: Path) -> bool:
+    return bool(_read_json(target / META_FILE, {}).get("overflow"))
+
+
+def _mark_overflow(target: Path, user: str, exc: ValueError) -> None:
+    _write_json(target / META_FILE, {"sorted": True, "overflow": True})
+    logger.warning("Fill columns disabled for %s, scoring reads the DB: %s", user, exc)
+
+
+def _stored_keys(target: Path, count: int, tids: set) -> set:
+    """``(time_ms, tid, oid)`` of the stored rows whose tid is in ``tids``."""
+    if not tids or not count:
+        return set()
+    stored = np.nonzero(np.isin(_map(target, "tid", count), np.fromiter(tids, dtype="<i8", count=len(tids))))[0]
+    return set(
+        zip(
+            _map(target, "time_ms", count)[stored].tolist(),
+            _map(target, "tid", count)[stored].tolist(),
+            _map(target, "oid", count)[stored].tolist(),
+        )
+    )
+
+
+def append(user: str, rows: List[Dict[str, Any]]) -> int:
+    """Append normalized fill rows (as written to the DB); returns rows added."""
+    if np is None or not rows:
+        return 0
+    target = _wallet_dir(user)
+    with _locked(target, exclusive=True):
+        if _overflowed(target):
+            return 0
+        count = _count(target)
+        keys = [(int(row["time_ms"]), _id(row.get("tid")), _id(row.get("oid"))) for row in rows]
+        # Like the unique constraint, rows missing tid or oid never collide.
+        seen = _stored_keys(target, count, {tid for _, tid, oid in keys if MISSING_ID not in (tid, oid)})
+        fresh = []
+        for row, key in zip(rows, keys):
+            if MISSING_ID not in key[1:]:
+                if key in seen:
+                    continue
+                seen.add(key)
+            fresh.append(row)
+        if not fresh:
+            return 0
+        coins = _read_json(target / COINS_FILE, [])
+        known = len(coins)
+        try:
+            arrays = _encode(fresh, coins)
+        except ValueError as exc:
+            _mark_overflow(target, user, exc)
+            return 0
+        if len(coins) != known:
+            _write_json(target / COINS_FILE, coins)
+        meta = _read_json(target / META_FILE, {"sorted": True})
+        times = arrays["time_ms"]
+        in_order = bool((times[1:] >= times[:-1]).all())
+        if count and times[0] < _map(target, "time_ms", count)[-1]:
+            in_order = False
+        for name, (dtype, _) in COLUMNS.items():
+            # Drop the tail of a torn append so all columns line up again.
+            path = target / f"{name}.bin"
+            size = count * np.dtype(dtype).itemsize
+            if path.exists() and path.stat().st_size > size:
+                with path.open("r+b") as fh:
+                    fh.truncate(size)
+        _write_columns(target, arrays, "ab")
+        if meta.get("sorted", True) and not in_order:
+            _write_json(target / META_FILE, {"sorted": False})
+    return len(fresh)
+
+
+def _sort(target: Path) -> None:
+    count = _count(target)
+    order = np.argsort(np.array(_map(target, "time_ms", count)), kind="stable")
+    _write_columns(target, {name: np.array(_map(target, name, count))[order] for name in COLUMNS}, "wb")
+    _write_json(target / META_FILE, {"sorted": True})
+
+
+def rebuild(user: str) -> int:
+    """Rewrite the store of ``user`` from the ``fills`` table."""
+    if np is None:
+        return 0
+    with session_scope() as session:
+        rows = [
+            row._asdict()
+            for row in session.execute(
+                select(Fill.time_ms, Fill.tid, Fill.oid, Fill.coin, Fill.px, Fill.sz, Fill.fee, Fill.closed_pnl)
+                .where(Fill.user == user)
+                .order_by(asc(Fill.time_ms), asc(Fill.id))
+            )
+        ]
+    target = _wallet_dir(user)
+    coins: List[str] = []
+    try:
+        arrays = _encode(rows, coins)
+    except ValueError as exc:
+        with _locked(target, exclusive=True):
+            _mark_overflow(target, user, exc)
+        return 0
+    with _locked(target, exclusive=True):
+        _write_json(target / COINS_FILE, coins)
+        _write_columns(target, arrays, "wb")
+        _write_json(target / META_FILE, {"sorted": True})
+    logger.info("Rebuilt fill columns", extra={"address": user, "rows": len(rows)})
+    return len(rows)
+
+
+def load(user: str, expected: Optional[int] = None) -> Optional[FillColumns]:
+    """Time-ordered memory-mapped columns of ``user``'s fills.
+
+    ``expected`` is the wallet's fill count in the DB; a store of another
+    size is rebuilt first. Returns None when NumPy is not installed or the
+    wallet's amounts do not fit the store.
+    """
+    if np is None:
+        return None
+    target = _wallet_dir(user)
+    with _locked(target):
+        if _overflowed(target):
+            return None
+        count = _count(target)
+        unsorted = not _read_json(target / META_FILE, {"sorted": True}).get("sorted", True)
+    if expected is not None and count != expected:
+        rebuild(user)
+        if _overflowed(target):
+            return None
+    elif unsorted:
+        with _locked(target, exclusive=True):
+            if not _read_json(target / META_FILE, {"sorted": True}).get("sorted", True):
+                _sort(target)
+    with _locked(target):
+        count = _count(target)
+        # Maps keep the files they opened even if a writer replaces them later.
+        return FillColumns(
+            **{name: _map(target, name, count) for name in COLUMNS},
+            coins=_read_json(target / COINS_FILE, []),
+        )
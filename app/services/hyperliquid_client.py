@@ -1,53 +1,330 @@
+import abc
+import asyncio
+import atexit
+import email.utils
+import json
 import logging
-from typing import Any, Dict, List, Optional
+import random
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import datetime, timezone
+from typing import Any, AsyncIterator, Dict, Iterator, List, Optional, Tuple
 
 import httpx
 
-from app.core.config import get_settings
+from app.core.config import Settings, get_settings
+from app.services.json_stream import aiter_array_items, iter_array_items
+from app.services.rate_limiter import get_concurrency_limiter, get_rate_limiter
 
 logger = logging.getLogger(__name__)
 
+# Maximum number of items the info API returns per time-ranged request; a
+# response of this size means there may be more data after its last item.
+PAGE_LIMITS: Dict[str, int] = {
+    "userFillsByTime": 2000,
+    "userNonFundingLedgerUpdates": 500,
+    "userFunding": 500,
+}
 
-class HyperliquidClient:
-    """Lightweight client for Hyperliquid info API."""
+RETRY_STATUS_CODES = {429, 500, 502, 503, 504}
+JSON_HEADERS = {"Content-Type": "application/json"}
+
+_shared_client: Optional[httpx.Client] = None
+_shared_lock = threading.Lock()
+_transport_override: Optional[Any] = None
+_stats_lock = threading.Lock()
+_endpoint_stats: Dict[str, Dict[str, float]] = {}
+
+
+def _pool_limits(settings: Settings) -> httpx.Limits:
+    return httpx.Limits(
+        max_connections=settings.hyperliquid_pool_max_connections,
+        max_keepalive_connections=settings.hyperliquid_pool_max_keepalive,
+        keepalive_expiry=settings.hyperliquid_keepalive_expiry_sec,
+    )
+
+
+def _http2_enabled(settings: Settings) -> bool:
+    if not settings.hyperliquid_http2:
+        return False
+    try:
+        import h2  # noqa: F401
+    except ImportError:
+        logger.warning("HYPERLIQUID_HTTP2 is set but the h2 package is not installed; using HTTP/1.1")
+        return False
+    return True
+
+
+def install_transport(transport: Optional[Any]) -> None:
+    """Route all info requests in this process through ``transport``.
+
+    ``transport`` must implement ``httpx.BaseTransport`` and, for the async
+    client, ``httpx.AsyncBaseTransport`` (see ``hyperliquid_replay``). Pass
+    ``None`` to restore the network. The shared pool is rebuilt on next use.
+    """
+    global _transport_override
+    close_shared_clients()
+    _transport_override = transport
+
+
+def _sync_transport() -> Optional[httpx.BaseTransport]:
+    return _transport_override if isinstance(_transport_override, httpx.BaseTransport) else None
+
+
+def _async_transport() -> Optional[httpx.AsyncBaseTransport]:
+    return _transport_override if isinstance(_transport_override, httpx.AsyncBaseTransport) else None
+
+
+def get_shared_http_client() -> httpx.Client:
+    """Return the process-wide pooled ``httpx.Client`` used for info requests.
+
+    Created lazily on first use and kept alive for the life of the process, so
+    consecutive syncs (and consecutive jobs in a non-forking worker) reuse
+    warm TCP/TLS connections.
+    """
+    global _shared_client
+    with _shared_lock:
+        if _shared_client is None or _shared_client.is_closed:
+            settings = get_settings()
+            _shared_client = httpx.Client(
+                timeout=settings.hyperliquid_timeout_sec,
+                limits=_pool_limits(settings),
+                http2=_http2_enabled(settings),
+                transport=_sync_transport(),
+            )
+        return _shared_client
+
+
+def close_shared_clients() -> None:
+    """Close the pooled client; safe to call more than once."""
+    global _shared_client
+    with _shared_lock:
+        if _shared_client is not None:
+            _shared_client.close()
+            _shared_client = None
+
+
+atexit.register(close_shared_clients)
+
+
+def _record_latency(endpoint: str, elapsed_ms: float, ok: bool) -> None:
+    with _stats_lock:
+        stats = _endpoint_stats.setdefault(endpoint, {"count": 0, "errors": 0, "total_ms": 0.0, "max_ms": 0.0})
+        stats["count"] += 1
+        stats["total_ms"] += elapsed_ms
+        stats["max_ms"] = max(stats["max_ms"], elapsed_ms)
+        if not ok:
+            stats["errors"] += 1
+
+
+def endpoint_latency_stats() -> Dict[str, Dict[str, float]]:
+    """Per-endpoint request count, error count and latency for this process."""
+    with _stats_lock:
+        return {
+            endpoint: {
+                "count": int(stats["count"]),
+                "errors": int(stats["errors"]),
+                "avg_ms": round(stats["total_ms"] / stats["count"], 2) if stats["count"] else 0.0,
+                "max_ms": round(stats["max_ms"], 2),
+            }
+            for endpoint, stats in _endpoint_stats.items()
+        }
+
+
+class RequestMemo:
+    """Responses already fetched in one pipeline run, keyed by request body.
+
+    Entries expire after ``ttl_sec`` so a long run does not serve stale
+    snapshots. Only whole responses (``_post``) are memoized; streamed
+    time-ranged pages are consumed once and never repeated within a run.
+    """
+
+    def __init__(self, ttl_sec: float) -> None:
+        self.ttl_sec = ttl_sec
+        self.hits = 0
+        self.misses = 0
+        self._entries: Dict[str, Tuple[float, Any]] = {}
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Tuple[bool, Any]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] > time.monotonic():
+                self.hits += 1
+                hit, value = True, entry[1]
+            else:
+                self._entries.pop(key, None)
+                self.misses += 1
+                hit, value = False, None
+        _count_memo(hit)
+        return hit, value
+
+    def put(self, key: str, value: Any) -> None:
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl_sec, value)
+
+
+_request_memo: ContextVar[Optional[RequestMemo]] = ContextVar("hyperliquid_request_memo", default=None)
+_memo_stats = {"hits": 0, "misses": 0}
+
+
+def _count_memo(hit: bool) -> None:
+    with _stats_lock:
+        _memo_stats["hits" if hit else "misses"] += 1
+
+
+@contextmanager
+def request_memo(ttl_sec: Optional[float] = None) -> Iterator[RequestMemo]:
+    """Reuse identical info responses for the duration of the block.
+
+    Every client request made in this context (including coroutines started
+    from it) first looks up the active memo. Nested blocks share the outer
+    memo.
+    """
+    active = _request_memo.get()
+    if active is not None:
+        yield active
+        return
+    if ttl_sec is None:
+        ttl_sec = get_settings().hyperliquid_request_memo_ttl_sec
+    memo = RequestMemo(ttl_sec)
+    token = _request_memo.set(memo)
+    try:
+        yield memo
+    finally:
+        _request_memo.reset(token)
+
+
+def request_memo_stats() -> Dict[str, int]:
+    """Process-wide memo hits (API calls saved) and misses."""
+    with _stats_lock:
+        return dict(_memo_stats)
+
+
+def _memo_key(payload: Dict[str, Any], raw: bool) -> str:
+    return json.dumps([payload, raw], sort_keys=True)
 
-    def __init__(self, timeout: Optional[float] = None):
-        self.settings = get_settings()
-        self.base_url = self.settings.hyperliquid_base_url
-        self.timeout = timeout or self.settings.hyperliquid_timeout_sec
-        self._client = httpx.Client(timeout=self.timeout)
 
-    def _post(self, payload: Dict[str, Any]) -> Any:
-        resp = self._client.post(self.base_url, json=payload, headers={"Content-Type": "application/json"})
-        resp.raise_for_status()
-        return resp.json()
+def _retry_after_seconds(resp: Optional[httpx.Response]) -> Optional[float]:
+    value = resp.headers.get("Retry-After") if resp is not None else None
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        when = email.utils.parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if when.tzinfo is None:
+        when = when.replace(tzinfo=timezone.utc)
+    return max(0.0, (when - datetime.now(timezone.utc)).total_seconds())
+
+
+def _describe_error(error: httpx.HTTPError) -> str:
+    if isinstance(error, httpx.HTTPStatusError):
+        return f"HTTP {error.response.status_code}"
+    return type(error).__name__
+
+
+def _retry_delay(settings: Settings, attempt: int, error: httpx.HTTPError) -> Optional[float]:
+    """Seconds to wait before retrying ``error``, or ``None`` if it should not be retried.
+
+    Timeouts, connection errors, 429 and 5xx responses are retried with full
+    jitter exponential backoff. A ``Retry-After`` header is honoured as a
+    minimum delay unless it asks for longer than ``hyperliquid_backoff_max_sec``,
+    in which case we give up rather than hold the worker.
+    """
+    response = None
+    if isinstance(error, httpx.HTTPStatusError):
+        response = error.response
+        if response.status_code not in RETRY_STATUS_CODES:
+            return None
+    elif not isinstance(error, httpx.TransportError):
+        return None
+    cap = settings.hyperliquid_backoff_max_sec
+    delay = random.uniform(0, min(cap, settings.hyperliquid_backoff_base_sec * 2 ** attempt))
+    retry_after = _retry_after_seconds(response)
+    if retry_after is not None:
+        if retry_after > cap:
+            return None
+        delay = max(delay, retry_after)
+    return delay
+
+
+def _time_range_body(request_type: str, user: str, start_time: int, end_time: Optional[int]) -> Dict[str, Any]:
+    body: Dict[str, Any] = {"type": request_type, "user": user, "startTime": start_time}
+    if end_time:
+        body["endTime"] = end_time
+    return body
+
+
+class _InfoRequests(abc.ABC):
+    """Request bodies for the info API endpoints we use.
+
+    Each method returns ``self._post(body)``: the value itself for
+    :class:`HyperliquidClient` and an awaitable for
+    :class:`AsyncHyperliquidClient`; with ``raw=True`` the undecoded body
+    bytes are returned instead of the parsed JSON. Inside
+    :func:`request_memo` repeated bodies are answered from the memo.
+    :meth:`time_range_items` returns ``self._stream(body)``, an (async)
+    iterator of ``(item, raw_json)``.
+    """
+
+    settings: Settings
+
+    @abc.abstractmethod
+    def _post(self, payload: Dict[str, Any], raw: bool = False) -> Any:
+        """Send ``payload`` to the info endpoint (see the class docstring)."""
+
+    @abc.abstractmethod
+    def _stream(self, payload: Dict[str, Any]) -> Any:
+        """Stream the items of a time-range ``payload`` as ``(item, raw_json)``."""
+
+    def _retry_delay_or_raise(self, endpoint: str, attempt: int, error: httpx.HTTPError) -> float:
+        """Back off after a failed attempt: returns the delay, or re-raises ``error`` when giving up."""
+        max_retries = self.settings.hyperliquid_max_retries
+        delay = _retry_delay(self.settings, attempt, error)
+        if delay is None or attempt == max_retries:
+            raise error
+        get_concurrency_limiter().on_throttle()
+        logger.warning(
+            "Hyperliquid %s failed (%s), retry %s/%s in %.2fs",
+            endpoint,
+            _describe_error(error),
+            attempt + 1,
+            max_retries,
+            delay,
+        )
+        return delay
 
     def user_non_funding_ledger_updates(
         self, user: str, start_time: int, end_time: Optional[int] = None
     ) -> List[Dict[str, Any]]:
-        body: Dict[str, Any] = {"type": "userNonFundingLedgerUpdates", "user": user, "startTime": start_time}
-        if end_time:
-            body["endTime"] = end_time
-        return self._post(body)
+        return self._post(_time_range_body("userNonFundingLedgerUpdates", user, start_time, end_time))
 
     def user_fills(self, user: str, start_time: int, end_time: Optional[int] = None) -> List[Dict[str, Any]]:
         """Uses userFillsByTime when start_time is provided (even 0) to避免历史缺口。"""
         if start_time is not None or end_time is not None:
-            body: Dict[str, Any] = {
-                "type": "userFillsByTime",
-                "user": user,
-                "startTime": start_time,
-            }
-            if end_time:
-                body["endTime"] = end_time
-            return self._post(body)
+            return self._post(_time_range_body("userFillsByTime", user, start_time, end_time))
         return self._post({"type": "userFills", "user": user})
 
     def user_funding(self, user: str, start_time: int, end_time: Optional[int] = None) -> List[Dict[str, Any]]:
-        body: Dict[str, Any] = {"type": "userFunding", "user": user, "startTime": start_time}
-        if end_time:
-            body["endTime"] = end_time
-        return self._post(body)
+        return self._post(_time_range_body("userFunding", user, start_time, end_time))
+
+    def time_range_items(
+        self, request_type: str, user: str, start_time: int, end_time: Optional[int] = None
+    ) -> Any:
+        """Stream one page of a time-ranged endpoint as ``(item, raw_json)`` pairs.
+
+        Items are decoded incrementally while the body arrives, so memory use
+        does not grow with the page size and ``raw_json`` is the item's text
+        exactly as served (no re-serialization needed).
+        """
+        return self._stream(_time_range_body(request_type, user, start_time, end_time))
 
     def user_fees(self, user: str) -> Dict[str, Any]:
         return self._post({"type": "userFees", "user": user})
@@ -55,14 +332,205 @@ class HyperliquidClient:
     def portfolio(self, user: str) -> Any:
         return self._post({"type": "portfolio", "user": user})
 
+    def clearinghouse_state(self, user: str) -> Dict[str, Any]:
+        """Open perp positions and margin summary (``assetPositions``, ``marginSummary``, ``time``)."""
+        return self._post({"type": "clearinghouseState", "user": user})
+
     def historical_orders(self, user: str) -> List[Dict[str, Any]]:
         return self._post({"type": "historicalOrders", "user": user})
 
+    def historical_orders_raw(self, user: str) -> bytes:
+        """``historicalOrders`` body as bytes, so it can be fingerprinted before parsing."""
+        return self._post({"type": "historicalOrders", "user": user}, raw=True)
+
+
+class HyperliquidClient(_InfoRequests):
+    """Lightweight client for Hyperliquid info API.
+
+    By default requests go through the process-wide pooled client from
+    :func:`get_shared_http_client`, and ``close()`` leaves that pool open.
+    Passing an explicit ``timeout`` (or ``shared=False``) creates a private
+    ``httpx.Client`` owned and closed by this instance.
+    """
+
+    def __init__(self, timeout: Optional[float] = None, shared: bool = True):
+        self.settings = get_settings()
+        self.base_url = self.settings.hyperliquid_base_url
+        self.timeout = timeout or self.settings.hyperliquid_timeout_sec
+        self._owns_client = not shared or timeout is not None
+        if self._owns_client:
+            self._client = httpx.Client(
+                timeout=self.timeout, limits=_pool_limits(self.settings), transport=_sync_transport()
+            )
+        else:
+            self._client = get_shared_http_client()
+
+    def _post(self, payload: Dict[str, Any], raw: bool = False) -> Any:
+        memo = _request_memo.get()
+        if memo is None:
+            return self._send(payload, raw)
+        key = _memo_key(payload, raw)
+        hit, value = memo.get(key)
+        if not hit:
+            value = self._send(payload, raw)
+            memo.put(key, value)
+        return value
+
+    def _send(self, payload: Dict[str, Any], raw: bool) -> Any:
+        endpoint = payload.get("type", "unknown")
+        concurrency = get_concurrency_limiter()
+        for attempt in range(self.settings.hyperliquid_max_retries + 1):
+            get_rate_limiter().acquire()
+            concurrency.acquire()
+            started = time.perf_counter()
+            error: Optional[httpx.HTTPError] = None
+            try:
+                resp = self._client.post(self.base_url, json=payload, headers=JSON_HEADERS)
+                resp.raise_for_status()
+            except httpx.HTTPError as exc:
+                error = exc
+            finally:
+                concurrency.release()
+                _record_latency(endpoint, (time.perf_counter() - started) * 1000, error is None)
+            if error is None:
+                concurrency.on_success()
+                return resp.content if raw else resp.json()
+            time.sleep(self._retry_delay_or_raise(endpoint, attempt, error))
+
+    def _stream(self, payload: Dict[str, Any]) -> Iterator[Tuple[Any, str]]:
+        """Streaming counterpart of :meth:`_post` for JSON array responses.
+
+        Latency is recorded when the response headers arrive. Failures before
+        the first item are retried like ``_post``; once items have been handed
+        to the caller the error is raised, since the page cannot be resumed.
+        """
+        endpoint = payload.get("type", "unknown")
+        concurrency = get_concurrency_limiter()
+        for attempt in range(self.settings.hyperliquid_max_retries + 1):
+            get_rate_limiter().acquire()
+            concurrency.acquire()
+            started = time.perf_counter()
+            resp: Optional[httpx.Response] = None
+            error: Optional[httpx.HTTPError] = None
+            yielded = 0
+            try:
+                with self._client.stream("POST", self.base_url, json=payload, headers=JSON_HEADERS) as resp:
+                    _record_latency(endpoint, (time.perf_counter() - started) * 1000, resp.is_success)
+                    resp.raise_for_status()
+                    for pair in iter_array_items(resp.iter_text()):
+                        yielded += 1
+                        yield pair
+            except httpx.HTTPError as exc:
+                error = exc
+                if resp is None:
+                    _record_latency(endpoint, (time.perf_counter() - started) * 1000, False)
+            finally:
+                concurrency.release()
+            if error is None:
+                concurrency.on_success()
+                return
+            if yielded:
+                raise error
+            time.sleep(self._retry_delay_or_raise(endpoint, attempt, error))
+
     def close(self) -> None:
-        self._client.close()
+        if self._owns_client:
+            self._client.close()
 
     def __enter__(self) -> "HyperliquidClient":
         return self
 
     def __exit__(self, exc_type, exc, tb) -> None:
         self.close()
+
+
+class AsyncHyperliquidClient(_InfoRequests):
+    """Async variant of :class:`HyperliquidClient`.
+
+    All requests share one ``httpx.AsyncClient`` connection pool, so several
+    endpoints for the same wallet can be awaited concurrently. The pool is
+    bound to the event loop that uses it and therefore lives per instance,
+    with the same limits and HTTP/2 setting as the shared sync client.
+    """
+
+    def __init__(self, timeout: Optional[float] = None):
+        self.settings = get_settings()
+        self.base_url = self.settings.hyperliquid_base_url
+        self.timeout = timeout or self.settings.hyperliquid_timeout_sec
+        self._client = httpx.AsyncClient(
+            timeout=self.timeout,
+            limits=_pool_limits(self.settings),
+            http2=_http2_enabled(self.settings),
+            transport=_async_transport(),
+        )
+
+    async def _post(self, payload: Dict[str, Any], raw: bool = False) -> Any:
+        memo = _request_memo.get()
+        if memo is None:
+            return await self._send(payload, raw)
+        key = _memo_key(payload, raw)
+        hit, value = memo.get(key)
+        if not hit:
+            value = await self._send(payload, raw)
+            memo.put(key, value)
+        return value
+
+    async def _send(self, payload: Dict[str, Any], raw: bool) -> Any:
+        endpoint = payload.get("type", "unknown")
+        concurrency = get_concurrency_limiter()
+        for attempt in range(self.settings.hyperliquid_max_retries + 1):
+            await get_rate_limiter().acquire_async()
+            await concurrency.acquire_async()
+            started = time.perf_counter()
+            error: Optional[httpx.HTTPError] = None
+            try:
+                resp = await self._client.post(self.base_url, json=payload, headers=JSON_HEADERS)
+                resp.raise_for_status()
+            except httpx.HTTPError as exc:
+                error = exc
+            finally:
+                concurrency.release()
+                _record_latency(endpoint, (time.perf_counter() - started) * 1000, error is None)
+            if error is None:
+                concurrency.on_success()
+                return resp.content if raw else resp.json()
+            await asyncio.sleep(self._retry_delay_or_raise(endpoint, attempt, error))
+
+    async def _stream(self, payload: Dict[str, Any]) -> AsyncIterator[Tuple[Any, str]]:
+        endpoint = payload.get("type", "unknown")
+        concurrency = get_concurrency_limiter()
+        for attempt in range(self.settings.hyperliquid_max_retries + 1):
+            await get_rate_limiter().acquire_async()
+            await concurrency.acquire_async()
+            started = time.perf_counter()
+            resp: Optional[httpx.Response] = None
+            error: Optional[httpx.HTTPError] = None
+            yielded = 0
+            try:
+                async with self._client.stream("POST", self.base_url, json=payload, headers=JSON_HEADERS) as resp:
+                    _record_latency(endpoint, (time.perf_counter() - started) * 1000, resp.is_success)
+                    resp.raise_for_status()
+                    async for pair in aiter_array_items(resp.aiter_text()):
+                        yielded += 1
+                        yield pair
+            except httpx.HTTPError as exc:
+                error = exc
+                if resp is None:
+                    _record_latency(endpoint, (time.perf_counter() - started) * 1000, False)
+            finally:
+                concurrency.release()
+            if error is None:
+                concurrency.on_success()
+                return
+            if yielded:
+                raise error
+            await asyncio.sleep(self._retry_delay_or_raise(endpoint, attempt, error))
+
+    async def aclose(self) -> None:
+        await self._client.aclose()
+
+    async def __aenter__(self) -> "AsyncHyperliquidClient":
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb) -> None:
+        await self.aclose()
@@ -0,0 +1,487 @@
+"""Offline stand-in for the Hyperliquid info API.
+
+``ReplayTransport`` is an httpx transport (sync and async) that answers info
+requests from a dataset instead of the network, with optional latency and
+error injection. Install it process-wide with
+``hyperliquid_client.install_transport(ReplayTransport(...))`` and the ETL
+runs unchanged against it.
+
+Two datasets are provided:
+
+* ``SyntheticDataset`` generates deterministic fills, ledger and funding
+  events, orders, open positions (``clearinghouseState``) and a portfolio
+  payload for any address.
+* ``RecordedDataset`` serves responses captured from the real API by
+  ``RecordingTransport`` (``<dir>/<address>/<type>.json``).
+
+``ReplayWebSocketServer`` is the matching stand-in for the WebSocket API
+used by live ingestion: it accepts user event subscriptions and pushes
+events added with :meth:`ReplayWebSocketServer.push`.
+
+Time-ranged requests are filtered by ``startTime``/``endTime`` and capped at
+``PAGE_LIMITS`` exactly like the live API, so pagination is exercised too.
+"""
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import json
+import random
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+import httpx
+
+from app.services.hyperliquid_client import PAGE_LIMITS
+
+TIME_RANGED_TYPES = {
+    "userFillsByTime": "fills",
+    "userFills": "fills",
+    "userNonFundingLedgerUpdates": "ledger",
+    "userFunding": "funding",
+}
+SNAPSHOT_TYPES = {"portfolio", "historicalOrders", "userFees", "clearinghouseState"}
+
+COINS = ["BTC", "ETH", "SOL", "HYPE", "ARB", "DOGE"]
+DAY_MS = 86_400_000
+
+
+class SyntheticDataset:
+    """Deterministic generated history; every address gets its own stream."""
+
+    def __init__(
+        self,
+        fills_per_wallet: int = 1000,
+        ledger_per_wallet: int = 50,
+        funding_per_wallet: int = 200,
+        orders_per_wallet: int = 500,
+        start_ms: int = 1_700_000_000_000,
+        span_days: int = 180,
+        seed: int = 0,
+    ) -> None:
+        self.fills_per_wallet = fills_per_wallet
+        self.ledger_per_wallet = ledger_per_wallet
+        self.funding_per_wallet = funding_per_wallet
+        self.orders_per_wallet = orders_per_wallet
+        self.start_ms = start_ms
+        self.span_ms = span_days * DAY_MS
+        self.seed = seed
+        self._cache: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+
+    def _rng(self, user: str) -> random.Random:
+        digest = hashlib.sha256(f"{self.seed}:{user.lower()}".encode()).digest()
+        return random.Random(int.from_bytes(digest[:8], "big"))
+
+    def _times(self, rng: random.Random, count: int) -> List[int]:
+        return sorted(self.start_ms + rng.randrange(self.span_ms) for _ in range(count))
+
+    def _generate(self, user: str) -> Dict[str, Any]:
+        rng = self._rng(user)
+        fills = []
+        for idx, ts in enumerate(self._times(rng, self.fills_per_wallet)):
+            px = round(rng.uniform(1, 70_000), 2)
+            fills.append(
+                {
+                    "coin": rng.choice(COINS),
+                    "px": str(px),
+                    "sz": str(round(rng.uniform(0.001, 5), 4)),
+                    "side": rng.choice(["A", "B"]),
+                    "time": ts,
+                    "startPosition": str(round(rng.uniform(-10, 10), 4)),
+                    "dir": rng.choice(["Open Long", "Close Long", "Open Short", "Close Short"]),
+                    "closedPnl": str(round(rng.gauss(0, 50), 6)),
+                    "hash": "0x" + hashlib.sha256(f"{user}:fill:{idx}".encode()).hexdigest(),
+                    "oid": 10_000_000 + idx,
+                    "crossed": rng.random() < 0.7,
+                    "fee": str(round(rng.uniform(0, 2), 6)),
+                    "tid": 50_000_000 + idx,
+                    "feeToken": "USDC",
+                }
+            )
+        ledger = [
+            {
+                "time": ts,
+                "hash": "0x" + hashlib.sha256(f"{user}:ledger:{idx}".encode()).hexdigest(),
+                "delta": {"type": rng.choice(["deposit", "withdraw"]), "usdc": str(round(rng.uniform(10, 10_000), 2))},
+            }
+            for idx, ts in enumerate(self._times(rng, self.ledger_per_wallet))
+        ]
+        funding = [
+            {
+                "time": ts,
+                "hash": "0x" + "0" * 64,
+                "delta": {
+                    "type": "funding",
+                    "coin": rng.choice(COINS),
+                    "usdc": str(round(rng.gauss(0, 1), 6)),
+                    "szi": str(round(rng.uniform(-10, 10), 4)),
+                    "fundingRate": str(round(rng.gauss(0, 0.0001), 8)),
+                },
+            }
+            for ts in self._times(rng, self.funding_per_wallet)
+        ]
+        orders = [
+            {
+                "order": {
+                    "coin": rng.choice(COINS),
+                    "side": rng.choice(["A", "B"]),
+                    "limitPx": str(round(rng.uniform(1, 70_000), 2)),
+                    "sz": str(round(rng.uniform(0.001, 5), 4)),
+                    "oid": 20_000_000 + idx,
+                    "timestamp": ts,
+                    "orderType": "Limit",
+                    "tif": "Gtc",
+                    "reduceOnly": False,
+                    "isTrigger": False,
+                },
+                "status": rng.choice(["filled", "canceled", "open"]),
+                "statusTimestamp": ts + rng.randrange(60_000),
+            }
+            for idx, ts in enumerate(self._times(rng, self.orders_per_wallet))
+        ][-2000:]
+        end_ms = self.start_ms + self.span_ms
+        portfolio = []
+        for interval, span in (("day", DAY_MS), ("week", 7 * DAY_MS), ("month", 30 * DAY_MS), ("allTime", self.span_ms)):
+            step = max(span // 50, 1)
+            value = rng.uniform(1_000, 100_000)
+            av_hist, pnl_hist = [], []
+            for ts in range(end_ms - span, end_ms, step):
+                value = max(0.0, value * (1 + rng.gauss(0, 0.01)))
+                av_hist.append([ts, str(round(value, 2))])
+                pnl_hist.append([ts, str(round(rng.gauss(0, 100), 2))])
+            portfolio.append(
+                [interval, {"accountValueHistory": av_hist, "pnlHistory": pnl_hist, "vlm": str(round(rng.uniform(0, 1e6), 2))}]
+            )
+        asset_positions = []
+        for coin in rng.sample(COINS, 3):
+            szi = round(rng.uniform(-5, 5), 4) or 0.1
+            entry_px = round(rng.uniform(1, 70_000), 2)
+            leverage = rng.choice([3, 5, 10, 20])
+            value = abs(szi) * entry_px
+            asset_positions.append(
+                {
+                    "type": "oneWay",
+                    "position": {
+                        "coin": coin,
+                        "szi": str(szi),
+                        "entryPx": str(entry_px),
+                        "positionValue": str(round(value, 2)),
+                        "unrealizedPnl": str(round(rng.gauss(0, value * 0.05), 2)),
+                        "returnOnEquity": str(round(rng.gauss(0, 0.1), 4)),
+                        "liquidationPx": None,
+                        "marginUsed": str(round(value / leverage, 2)),
+                        "leverage": {"type": "cross", "value": leverage},
+                        "maxLeverage": 50,
+                        "cumFunding": {"allTime": "0.0", "sinceOpen": "0.0", "sinceChange": "0.0"},
+                    },
+                }
+            )
+        account_value = round(rng.uniform(10_000, 1_000_000), 2)
+        clearinghouse = {
+            "assetPositions": asset_positions,
+            "marginSummary": {
+                "accountValue": str(account_value),
+                "totalNtlPos": str(round(sum(float(ap["position"]["positionValue"]) for ap in asset_positions), 2)),
+                "totalRawUsd": str(account_value),
+                "totalMarginUsed": str(round(sum(float(ap["position"]["marginUsed"]) for ap in asset_positions), 2)),
+            },
+            "withdrawable": str(round(account_value * 0.5, 2)),
+            "time": end_ms,
+        }
+        fees = {"userCrossRate": "0.00035", "userAddRate": "0.0001", "userSpotCrossRate": "0.0007", "userSpotAddRate": "0.0004"}
+        return {
+            "fills": fills,
+            "ledger": ledger,
+            "funding": funding,
+            "historicalOrders": orders,
+            "portfolio": portfolio,
+            "userFees": fees,
+            "clearinghouseState": clearinghouse,
+        }
+
+    def _wallet(self, user: str) -> Dict[str, Any]:
+        key = user.lower()
+        with self._lock:
+            if key not in self._cache:
+                self._cache[key] = self._generate(key)
+            return self._cache[key]
+
+    def events(self, user: str, kind: str) -> List[Dict[str, Any]]:
+        return self._wallet(user)[kind]
+
+    def snapshot(self, user: str, request_type: str) -> Any:
+        return self._wallet(user)[request_type]
+
+    def add_event(self, user: str, kind: str, item: Dict[str, Any]) -> None:
+        """Append a new event (time-ordered) so later REST requests see it too."""
+        events = self._wallet(user)[kind]
+        with self._lock:
+            events.append(item)
+            events.sort(key=lambda event: event["time"])
+
+
+class RecordedDataset:
+    """Responses captured by :class:`RecordingTransport`."""
+
+    def __init__(self, directory: Path | str) -> None:
+        self.directory = Path(directory)
+
+    def _load(self, user: str, name: str, default: Any) -> Any:
+        path = self.directory / user.lower() / f"{name}.json"
+        if not path.exists():
+            return default
+        return json.loads(path.read_text(encoding="utf-8"))
+
+    def events(self, user: str, kind: str) -> List[Dict[str, Any]]:
+        return sorted(self._load(user, kind, []), key=lambda item: item.get("time", 0))
+
+    def snapshot(self, user: str, request_type: str) -> Any:
+        return self._load(user, request_type, {} if request_type in ("userFees", "clearinghouseState") else [])
+
+
+def respond(dataset: Any, body: Dict[str, Any]) -> Any:
+    """Build the info API response for ``body`` from ``dataset``."""
+    request_type = body.get("type")
+    user = body.get("user", "")
+    if request_type in TIME_RANGED_TYPES:
+        start = body.get("startTime") or 0
+        end = body.get("endTime")
+        items = [
+            item
+            for item in dataset.events(user, TIME_RANGED_TYPES[request_type])
+            if item["time"] >= start and (end is None or item["time"] <= end)
+        ]
+        limit = PAGE_LIMITS.get(request_type)
+        return items[:limit] if limit else items
+    if request_type in SNAPSHOT_TYPES:
+        return dataset.snapshot(user, request_type)
+    raise KeyError(request_type)
+
+
+class ReplayTransport(httpx.BaseTransport, httpx.AsyncBaseTransport):
+    """Serve info requests from ``dataset`` with injected latency and errors.
+
+    ``latency_ms`` (+ uniform ``jitter_ms``) is slept before every response;
+    ``error_rate`` is the probability of answering ``error_status`` instead
+    (429 responses carry ``Retry-After: 0``). ``requests`` counts calls per
+    info type.
+    """
+
+    def __init__(
+        self,
+        dataset: Any,
+        latency_ms: float = 0.0,
+        jitter_ms: float = 0.0,
+        error_rate: float = 0.0,
+        error_status: int = 503,
+        seed: Optional[int] = None,
+    ) -> None:
+        self.dataset = dataset
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.requests: Dict[str, int] = {}
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def _plan(self, request: httpx.Request) -> tuple[float, httpx.Response]:
+        body = json.loads(request.content or b"{}")
+        with self._lock:
+            request_type = body.get("type", "unknown")
+            self.requests[request_type] = self.requests.get(request_type, 0) + 1
+            delay = (self.latency_ms + self._rng.uniform(0, self.jitter_ms)) / 1000
+            fail = self._rng.random() < self.error_rate
+        if fail:
+            headers = {"Retry-After": "0"} if self.error_status == 429 else {}
+            return delay, httpx.Response(self.error_status, headers=headers, request=request)
+        try:
+            payload = respond(self.dataset, body)
+        except KeyError:
+            return delay, httpx.Response(422, json={"error": "unsupported type"}, request=request)
+        return delay, httpx.Response(200, json=payload, request=request)
+
+    def handle_request(self, request: httpx.Request) -> httpx.Response:
+        delay, response = self._plan(request)
+        if delay:
+            time.sleep(delay)
+        return response
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        delay, response = self._plan(request)
+        if delay:
+            await asyncio.sleep(delay)
+        return response
+
+
+class RecordingTransport(httpx.BaseTransport, httpx.AsyncBaseTransport):
+    """Pass requests to the real API and save responses for later replay.
+
+    Time-ranged responses are merged into ``<dir>/<address>/<kind>.json``
+    (deduplicated), snapshot responses overwrite ``<type>.json``. The inner
+    transports stay open when a client closes this one, because the async
+    client is recreated for every concurrent sync.
+    """
+
+    def __init__(self, directory: Path | str, inner: Optional[httpx.HTTPTransport] = None) -> None:
+        self.directory = Path(directory)
+        self.inner = inner or httpx.HTTPTransport()
+        self.inner_async = httpx.AsyncHTTPTransport()
+        self._lock = threading.Lock()
+
+    def _save(self, request: httpx.Request, response: httpx.Response) -> None:
+        if response.status_code != 200:
+            return
+        body = json.loads(request.content or b"{}")
+        request_type = body.get("type")
+        user = (body.get("user") or "").lower()
+        if not user:
+            return
+        target = self.directory / user
+        target.mkdir(parents=True, exist_ok=True)
+        payload = response.json()
+        with self._lock:
+            if request_type in TIME_RANGED_TYPES:
+                path = target / f"{TIME_RANGED_TYPES[request_type]}.json"
+                existing = json.loads(path.read_text(encoding="utf-8")) if path.exists() else []
+                seen = {json.dumps(item, sort_keys=True) for item in existing}
+                existing.extend(item for item in payload if json.dumps(item, sort_keys=True) not in seen)
+                path.write_text(json.dumps(existing), encoding="utf-8")
+            elif request_type in SNAPSHOT_TYPES:
+                (target / f"{request_type}.json").write_text(json.dumps(payload), encoding="utf-8")
+
+    def handle_request(self, request: httpx.Request) -> httpx.Response:
+        response = self.inner.handle_request(request)
+        response.read()
+        self._save(request, response)
+        return response
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        response = await self.inner_async.handle_async_request(request)
+        await response.aread()
+        self._save(request, response)
+        return response
+
+
+# WebSocket subscription type -> (dataset kind, key of the event list)
+WS_SUBSCRIPTIONS = {
+    "userFills": ("fills", "fills"),
+    "userNonFundingLedgerUpdates": ("ledger", "nonFundingLedgerUpdates"),
+    "userFundings": ("funding", "fundings"),
+}
+
+
+def _ws_funding(item: Dict[str, Any]) -> Dict[str, Any]:
+    """Funding events are pushed flat (``WsUserFunding``), unlike the REST items."""
+    delta = item.get("delta", {})
+    return {
+        "time": item["time"],
+        "coin": delta.get("coin"),
+        "usdc": delta.get("usdc"),
+        "szi": delta.get("szi"),
+        "fundingRate": delta.get("fundingRate"),
+    }
+
+
+class ReplayWebSocketServer:
+    """Local stand-in for the Hyperliquid WebSocket API::
+
+        async with ReplayWebSocketServer(dataset) as server:
+            ingestor = LiveIngestor(url=server.url)
+            ...
+            await server.push(address, "fills", fill)
+
+    Subscriptions are answered with ``subscriptionResponse`` and a snapshot
+    (``isSnapshot``) of the latest ``snapshot_size`` events; ``ping`` gets a
+    ``pong``. :meth:`push` adds an event to the dataset (when it supports
+    ``add_event``) and sends it to the subscribers; :meth:`drop_connections`
+    closes every client connection to exercise reconnects.
+    """
+
+    def __init__(self, dataset: Any, host: str = "127.0.0.1", port: int = 0, snapshot_size: int = 50) -> None:
+        self.dataset = dataset
+        self.host = host
+        self.port = port
+        self.snapshot_size = snapshot_size
+        self.subscriptions: Dict[Any, set] = {}
+        self._server = None
+
+    @property
+    def url(self) -> str:
+        return f"ws://{self.host}:{self.port}"
+
+    async def __aenter__(self) -> "ReplayWebSocketServer":
+        # Only the WebSocket stand-in needs the package; the HTTP replay
+        # transport and the ingestion bench import without it.
+        import websockets
+
+        self._server = await websockets.serve(self._handle, self.host, self.port)
+        self.port = self._server.sockets[0].getsockname()[1]
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb) -> None:
+        self._server.close()
+        await self._server.wait_closed()
+
+    def _message(self, subscription_type: str, user: str, items: List[Dict[str, Any]], snapshot: bool) -> str:
+        kind, key = WS_SUBSCRIPTIONS[subscription_type]
+        if kind == "funding":
+            items = [_ws_funding(item) for item in items]
+        data: Dict[str, Any] = {"user": user.lower(), key: items}
+        if snapshot:
+            data["isSnapshot"] = True
+        return json.dumps({"channel": subscription_type, "data": data})
+
+    async def _handle(self, ws) -> None:
+        import websockets
+
+        subscribed = self.subscriptions.setdefault(ws, set())
+        try:
+            async for raw in ws:
+                message = json.loads(raw)
+                method = message.get("method")
+                if method == "ping":
+                    await ws.send(json.dumps({"channel": "pong"}))
+                    continue
+                subscription = message.get("subscription") or {}
+                key = (subscription.get("type"), (subscription.get("user") or "").lower())
+                if method not in ("subscribe", "unsubscribe") or key[0] not in WS_SUBSCRIPTIONS:
+                    await ws.send(json.dumps({"channel": "error", "data": f"unsupported: {raw}"}))
+                    continue
+                await ws.send(json.dumps({"channel": "subscriptionResponse", "data": message}))
+                if method == "unsubscribe":
+                    subscribed.discard(key)
+                    continue
+                subscribed.add(key)
+                kind = WS_SUBSCRIPTIONS[key[0]][0]
+                recent = self.dataset.events(key[1], kind)[-self.snapshot_size :]
+                await ws.send(self._message(key[0], key[1], recent, snapshot=True))
+        except websockets.ConnectionClosed:
+            pass
+        finally:
+            self.subscriptions.pop(ws, None)
+
+    async def push(self, user: str, kind: str, item: Dict[str, Any]) -> int:
+        """Publish a new event; returns the number of connections it was sent to."""
+        import websockets
+
+        add_event = getattr(self.dataset, "add_event", None)
+        if add_event is not None:
+            add_event(user, kind, item)
+        sent = 0
+        for ws, subscribed in list(self.subscriptions.items()):
+            for subscription_type, sub_user in subscribed:
+                if sub_user == user.lower() and WS_SUBSCRIPTIONS[subscription_type][0] == kind:
+                    try:
+                        await ws.send(self._message(subscription_type, user, [item], snapshot=False))
+                        sent += 1
+                    except websockets.ConnectionClosed:
+                        pass
+        return sent
+
+    async def drop_connections(self) -> None:
+        for ws in list(self.subscriptions):
+            await ws.close()
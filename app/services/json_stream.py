@@ -0,0 +1,106 @@
+"""Incremental decoding of top-level JSON arrays.
+
+The info API answers time-ranged requests with one JSON array of up to a few
+thousand objects. ``ArrayItemDecoder`` is fed the response text chunk by
+chunk and returns each element as soon as it is complete, together with the
+exact source text of that element, so callers can store the raw JSON without
+serializing the parsed object again. Only the unparsed tail of the body is
+buffered.
+"""
+import json
+from typing import Any, AsyncIterable, AsyncIterator, Iterable, Iterator, List, Tuple
+
+_WHITESPACE = " \t\n\r"
+_NUMBER_CHARS = "0123456789.eE+-"
+
+
+class ArrayItemDecoder:
+    def __init__(self) -> None:
+        self._decoder = json.JSONDecoder()
+        self._buf = ""
+        self._state = "start"  # start -> first -> (item -> sep)* -> done
+
+    def _skip_ws(self, pos: int) -> int:
+        while pos < len(self._buf) and self._buf[pos] in _WHITESPACE:
+            pos += 1
+        return pos
+
+    def feed(self, text: str, final: bool = False) -> List[Tuple[Any, str]]:
+        """Consume ``text`` and return the elements completed by it.
+
+        ``final`` marks the end of the body; a truncated or malformed body
+        raises ``ValueError``.
+        """
+        self._buf += text
+        items: List[Tuple[Any, str]] = []
+        pos = 0
+        while True:
+            pos = self._skip_ws(pos)
+            if pos >= len(self._buf):
+                break
+            if self._state == "start":
+                if self._buf.startswith("null", pos):
+                    pos += 4
+                    self._state = "done"
+                    continue
+                if not final and "null".startswith(self._buf[pos:]):
+                    break
+                if self._buf[pos] != "[":
+                    raise ValueError("expected a JSON array")
+                pos += 1
+                self._state = "first"
+            elif self._state in ("first", "item"):
+                if self._state == "first" and self._buf[pos] == "]":
+                    pos += 1
+                    self._state = "done"
+                    continue
+                try:
+                    item, end = self._decoder.raw_decode(self._buf, pos)
+                except ValueError:
+                    if final:
+                        raise
+                    break
+                # A number cut at the chunk boundary ("1." of "1.5") decodes
+                # as a shorter number, so wait until something follows it.
+                if not final and isinstance(item, (int, float)) and not isinstance(item, bool):
+                    tail = end
+                    while tail < len(self._buf) and self._buf[tail] in _NUMBER_CHARS:
+                        tail += 1
+                    if tail >= len(self._buf):
+                        break
+                items.append((item, self._buf[pos:end]))
+                pos = end
+                self._state = "sep"
+            elif self._state == "sep":
+                char = self._buf[pos]
+                pos += 1
+                if char == ",":
+                    self._state = "item"
+                elif char == "]":
+                    self._state = "done"
+                else:
+                    raise ValueError(f"unexpected {char!r} between array items")
+            else:
+                raise ValueError("trailing data after JSON array")
+        self._buf = self._buf[pos:]
+        if final and self._state != "done":
+            raise ValueError("truncated JSON array")
+        return items
+
+
+def iter_array_items(chunks: Iterable[str]) -> Iterator[Tuple[Any, str]]:
+    """Yield ``(item, raw_text)`` for each element of the JSON array in ``chunks``."""
+    decoder = ArrayItemDecoder()
+    for chunk in chunks:
+        yield from decoder.feed(chunk)
+    yield from decoder.feed("", final=True)
+
+
+async def aiter_array_items(chunks: AsyncIterable[str]) -> AsyncIterator[Tuple[Any, str]]:
+    """Async variant of :func:`iter_array_items`."""
+    decoder = ArrayItemDecoder()
+    async for chunk in chunks:
+        for pair in decoder.feed(chunk):
+            yield pair
+    for pair in decoder.feed("", final=True):
+        yield pair
@@ -0,0 +1,253 @@
+"""Live ingestion of followed wallets over the Hyperliquid WebSocket API.
+
+``LiveIngestor`` keeps one WebSocket connection subscribed to ``userFills``,
+``userNonFundingLedgerUpdates`` and ``userFundings`` for every followed wallet
+(``WalletFollow``) and writes pushed events through the ETL's normalized
+writers (:func:`etl.write_live_items`), advancing the same ``FetchCursor`` the
+REST pipeline uses.
+
+Pushed events are only applied once the wallet's streams are complete up to
+their cursors: after subscribing (on every connect and for wallets followed
+later) each wallet is caught up over REST first, and events arriving
+meanwhile are buffered. A dropped connection therefore never leaves a hole;
+the reconnect catches up again from the cursor, and regular polling simply
+finds nothing new.
+
+Run it with ``python -m app.live``.
+"""
+import asyncio
+import json
+import logging
+import random
+from typing import Any, Dict, List, Optional, Set
+
+import websockets
+from sqlalchemy import select
+
+from app.core.config import get_settings
+from app.core.database import session_scope
+from app.models import WalletFollow
+from app.services import etl, hyperliquid_client, local_cache
+from app.services.wallet_lease import get_single_flight
+
+logger = logging.getLogger(__name__)
+
+# subscription type -> (ETL time stream, key of the event list in ``data``)
+LIVE_SUBSCRIPTIONS = {
+    "userFills": ("fills", "fills"),
+    "userNonFundingLedgerUpdates": ("ledger", "nonFundingLedgerUpdates"),
+    "userFundings": ("funding", "fundings"),
+}
+CATCH_UP_CONCURRENCY = 2
+RECONNECT_BASE_SEC = 1.0
+RECONNECT_MAX_SEC = 60.0
+FUNDING_HASH = "0x" + "0" * 64
+# Distinct from run_wallet_sync's params, so a catch-up never reuses its result.
+CATCH_UP_PARAMS = {"end_time": None, "source": "live"}
+
+
+def followed_wallets(limit: Optional[int] = None) -> List[str]:
+    """Followed wallet addresses, oldest follow first."""
+    with session_scope() as session:
+        query = select(WalletFollow.wallet_address).order_by(WalletFollow.created_at, WalletFollow.id)
+        if limit:
+            query = query.limit(limit)
+        return list(session.execute(query).scalars())
+
+
+def _funding_item(item: Dict[str, Any]) -> Dict[str, Any]:
+    """Reshape a pushed funding payment like the ``userFunding`` REST items."""
+    if "delta" in item:
+        return item
+    return {
+        "time": item["time"],
+        "hash": item.get("hash") or FUNDING_HASH,
+        "delta": {
+            "type": "funding",
+            "coin": item.get("coin"),
+            "usdc": item.get("usdc"),
+            "szi": item.get("szi"),
+            "fundingRate": item.get("fundingRate"),
+        },
+    }
+
+
+def parse_message(message: Dict[str, Any]) -> Optional[tuple]:
+    """``(user, stream, items)`` for a user event message, else None."""
+    channel = message.get("channel")
+    if channel not in LIVE_SUBSCRIPTIONS:
+        return None
+    stream, key = LIVE_SUBSCRIPTIONS[channel]
+    data = message.get("data") or {}
+    user = (data.get("user") or "").lower()
+    items = [item for item in data.get(key) or [] if isinstance(item, dict) and "time" in item]
+    if stream == "funding":
+        items = [_funding_item(item) for item in items]
+    if not user or not items:
+        return None
+    return user, stream, items
+
+
+def _sync_streams(user: str) -> Dict[str, int]:
+    with hyperliquid_client.request_memo(), local_cache.metadata_batch():
+        return {
+            "ledger": etl.sync_ledger(user),
+            "fills": etl.sync_fills(user),
+            "funding": etl.sync_funding(user),
+        }
+
+
+def catch_up(user: str) -> Dict[str, int]:
+    """Fetch every time stream of ``user`` over REST up to now.
+
+    Runs under the wallet's single-flight lease like ``run_wallet_sync``, so
+    it never fetches concurrently with a queued sync of the same wallet. A
+    sync already in flight is waited for but not reused: it may have read
+    the streams before our subscription started, so we fetch from the
+    cursors it left afterwards.
+    """
+    result, _ = get_single_flight().run(user, lambda: _sync_streams(user), params=CATCH_UP_PARAMS)
+    return result
+
+
+class LiveIngestor:
+    def __init__(self, url: Optional[str] = None, wallets_fn=followed_wallets) -> None:
+        settings = get_settings()
+        self.url = url or settings.hyperliquid_ws_url
+        self.max_wallets = settings.live_ingest_max_wallets
+        self.refresh_sec = settings.live_ingest_refresh_sec
+        self.ping_sec = settings.live_ingest_ping_sec
+        self.wallets_fn = wallets_fn
+        self.written: Dict[str, int] = {stream: 0 for stream, _ in LIVE_SUBSCRIPTIONS.values()}
+        # Pushed messages carry lowercase addresses; rows are stored under the
+        # address as followed, like the REST pipeline does.
+        self._addresses: Dict[str, str] = {}
+        self._subscribed: Set[str] = set()
+        self._ready: Set[str] = set()
+        self._pending: Dict[str, List[tuple]] = {}
+        self._catching_up: Dict[str, asyncio.Task] = {}
+        self._catch_up_slots = asyncio.Semaphore(CATCH_UP_CONCURRENCY)
+
+    async def run(self, stop: Optional[asyncio.Event] = None) -> None:
+        """Stay connected (reconnecting with backoff) until ``stop`` is set."""
+        stop = stop or asyncio.Event()
+        attempt = 0
+        while not stop.is_set():
+            try:
+                async with websockets.connect(self.url, ping_interval=None, max_size=None) as ws:
+                    attempt = 0
+                    await self._session(ws, stop)
+            except (OSError, websockets.WebSocketException) as exc:
+                logger.warning("Live ingest connection lost: %s", exc)
+            finally:
+                await self._reset()
+            if stop.is_set():
+                break
+            delay = min(RECONNECT_MAX_SEC, RECONNECT_BASE_SEC * 2**attempt) * (0.5 + random.random() / 2)
+            attempt += 1
+            try:
+                await asyncio.wait_for(stop.wait(), timeout=delay)
+            except asyncio.TimeoutError:
+                pass
+
+    async def _reset(self) -> None:
+        for task in self._catching_up.values():
+            task.cancel()
+        self._catching_up.clear()
+        self._subscribed.clear()
+        self._ready.clear()
+        self._pending.clear()
+
+    async def _session(self, ws, stop: asyncio.Event) -> None:
+        loop = asyncio.get_running_loop()
+        next_refresh = 0.0
+        next_ping = loop.time() + self.ping_sec
+        while not stop.is_set():
+            now = loop.time()
+            if now >= next_refresh:
+                await self._refresh(ws)
+                next_refresh = now + self.refresh_sec
+            if now >= next_ping:
+                await ws.send(json.dumps({"method": "ping"}))
+                next_ping = now + self.ping_sec
+            timeout = max(0.0, min(next_refresh, next_ping) - loop.time())
+            try:
+                raw = await asyncio.wait_for(ws.recv(), timeout=min(timeout, 1.0))
+            except asyncio.TimeoutError:
+                continue
+            parsed = parse_message(json.loads(raw))
+            if parsed is None:
+                continue
+            user = parsed[0]
+            if user in self._ready:
+                if not await self._apply(*parsed):
+                    # Later events must not move the cursor past the failed
+                    # ones: buffer again and catch up over REST first.
+                    self._ready.discard(user)
+                    self._catching_up[user] = asyncio.create_task(self._catch_up(user))
+            elif user in self._subscribed:
+                self._pending.setdefault(user, []).append(parsed)
+
+    async def _refresh(self, ws) -> None:
+        """Subscribe newly followed wallets and drop unfollowed ones."""
+        followed = await asyncio.to_thread(self.wallets_fn)
+        self._addresses.update({address.lower(): address for address in followed})
+        wallets = list(dict.fromkeys(address.lower() for address in followed))
+        if len(wallets) > self.max_wallets:
+            logger.warning(
+                "%s followed wallets, live ingest covers the first %s (LIVE_INGEST_MAX_WALLETS)",
+                len(wallets),
+                self.max_wallets,
+            )
+            wallets = wallets[: self.max_wallets]
+        wanted = set(wallets)
+        for user in sorted(self._subscribed - wanted):
+            await self._send_subscriptions(ws, "unsubscribe", user)
+            self._subscribed.discard(user)
+            self._ready.discard(user)
+            self._pending.pop(user, None)
+            task = self._catching_up.pop(user, None)
+            if task:
+                task.cancel()
+        for user in wallets:
+            if user not in self._subscribed:
+                await self._send_subscriptions(ws, "subscribe", user)
+                self._subscribed.add(user)
+            if user not in self._ready and user not in self._catching_up:
+                self._catching_up[user] = asyncio.create_task(self._catch_up(user))
+
+    async def _send_subscriptions(self, ws, method: str, user: str) -> None:
+        for subscription_type in LIVE_SUBSCRIPTIONS:
+            subscription = {"type": subscription_type, "user": self._addresses.get(user, user)}
+            await ws.send(json.dumps({"method": method, "subscription": subscription}))
+
+    async def _catch_up(self, user: str) -> None:
+        try:
+            async with self._catch_up_slots:
+                result = await asyncio.to_thread(catch_up, self._addresses.get(user, user))
+            logger.info("Live ingest caught up over REST", extra={"address": user, "result": result})
+        except Exception as exc:
+            # Retried on the next refresh; pushed events stay buffered until then.
+            logger.warning("Live ingest catch-up failed for %s: %s", user, exc)
+            return
+        finally:
+            if self._catching_up.get(user) is asyncio.current_task():
+                self._catching_up.pop(user)
+        # Events keep arriving while the buffer is applied; drain until empty
+        # before the wallet switches to direct writes.
+        while self._pending.get(user):
+            for parsed in self._pending.pop(user):
+                if not await self._apply(*parsed):
+                    return
+        self._ready.add(user)
+
+    async def _apply(self, user: str, stream: str, items: List[Dict[str, Any]]) -> bool:
+        try:
+            written = await asyncio.to_thread(etl.write_live_items, self._addresses.get(user, user), stream, items)
+        except Exception:
+            logger.exception("Failed to store live %s for %s", stream, user)
+            return False
+        self.written[stream] += written
+        if written:
+            logger.info("Live %s stored", stream, extra={"address": user, "rows": written})
+        return True
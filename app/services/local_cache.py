@@ -1,42 +1,340 @@
+"""Per-wallet local cache of raw API events.
+
+Events are stored as JSON lines partitioned by month of the event time::
+
+    <cache>/<wallet>/<kind>/<YYYY-MM>.jsonl   one event per line, append order
+    <cache>/<wallet>/<kind>/<YYYY-MM>.idx     (time_ms, offset, length) per line
+    <cache>/<wallet>/<kind>/<YYYY-MM>.hw      high-water: newest time_ms indexed
+
+The sidecar index lets range and "latest N" reads pick the segments and lines
+they need (newest segment first) and decode only those, instead of parsing
+and sorting the whole history. Appends write the lines of a batch with one
+``write`` on a file opened for appending and then their index entries, so
+concurrent writers stay consistent; lines whose index entry was never written
+(a crash in between) are simply not visible.
+
+Flat ``<kind>.jsonl`` files from older versions are split into segments the
+first time the kind is accessed.
+
+``meta.json`` is rewritten through a temp file and ``os.replace``. Inside
+:func:`metadata_batch` (one wallet sync) updates are merged in memory and
+written once per wallet when the block exits.
+
+Retried or overlapping fetches deliver events that are already cached.
+Events newer than the segment's high-water mark cannot be cached yet and are
+appended without a lookup; only events at or below it are compared, by key
+(:func:`event_key`), against the stored lines with the same ``time_ms``, so
+an append decodes just the lines a re-fetched page could duplicate.
+:func:`compact_all` (a scheduler job) removes duplicates that concurrent
+appends still let through: it rewrites changed segments deduplicated and
+time-ordered, swaps them in with ``os.replace`` and drops events older than
+``CACHE_RETENTION_DAYS``. Appends hold a shared lock on the kind directory
+and compaction an exclusive one, so no append is lost to a swap.
+"""
 from __future__ import annotations
 
+import fcntl
 import json
+import logging
+import mmap
+import os
+import struct
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import datetime, timezone
 from pathlib import Path
-from typing import Any, Dict, List, Optional
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
 
 from app.core.config import get_settings
 
+logger = logging.getLogger(__name__)
+
+INDEX_ENTRY = struct.Struct("<qqI")
+SEGMENT_SUFFIX = ".jsonl"
+INDEX_SUFFIX = ".idx"
+HIGH_WATER = struct.Struct("<q")
+HIGH_WATER_SUFFIX = ".hw"
+LOCK_FILE = ".lock"
+COMPACTION_STATE_FILE = "compaction.json"
+DAY_MS = 86_400_000
+
+# Wallet directories known to exist in this process (skips a mkdir per call).
+_known_dirs: set = set()
+
+
+class MetadataBatch:
+    """Metadata updates buffered per wallet until the batch is flushed."""
+
+    def __init__(self) -> None:
+        self.pending: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+
+    def add(self, address: str, fields: Dict[str, Any]) -> None:
+        with self._lock:
+            self.pending.setdefault(address.lower(), {}).update(fields)
+
+    def flush(self) -> None:
+        with self._lock:
+            pending, self.pending = self.pending, {}
+        for address, fields in pending.items():
+            _write_metadata(address, fields)
+
+
+_metadata_batch: ContextVar[Optional[MetadataBatch]] = ContextVar("local_cache_metadata_batch", default=None)
+
 
 def _wallet_dir(address: str) -> Path:
     settings = get_settings()
     target = settings.cache_dir / address.lower()
-    target.mkdir(parents=True, exist_ok=True)
+    if target not in _known_dirs:
+        target.mkdir(parents=True, exist_ok=True)
+        _known_dirs.add(target)
+    return target
+
+
+def _event_time(item: Dict[str, Any]) -> Optional[int]:
+    ts = item.get("time_ms") or item.get("time") or item.get("timestamp")
+    try:
+        return int(ts) if ts is not None else None
+    except (TypeError, ValueError):
+        return None
+
+
+def event_key(item: Dict[str, Any]) -> Tuple:
+    """Identity of a cached event: fills by ``tid``, other events by time, hash and delta."""
+    if item.get("tid") is not None:
+        return ("tid", item["tid"])
+    delta = item.get("delta")
+    return (
+        _event_time(item),
+        item.get("hash"),
+        item.get("coin"),
+        json.dumps(delta, sort_keys=True) if delta is not None else None,
+    )
+
+
+def _segment_name(time_ms: int) -> str:
+    return datetime.fromtimestamp(time_ms / 1000, tz=timezone.utc).strftime("%Y-%m")
+
+
+def _kind_dir(address: str, kind: str) -> Path:
+    target = _wallet_dir(address) / kind
+    legacy = target.parent / f"{kind}{SEGMENT_SUFFIX}"
+    if legacy.exists():
+        _migrate_legacy(address, kind, legacy)
     return target
 
 
+def _migrate_legacy(address: str, kind: str, legacy: Path) -> None:
+    """Split a flat ``<kind>.jsonl`` into monthly segments."""
+    # Renaming first makes exactly one process migrate the file.
+    claimed = legacy.with_name(f"{legacy.name}.migrating.{os.getpid()}")
+    try:
+        legacy.rename(claimed)
+    except FileNotFoundError:
+        return
+    records: List[Tuple[int, str]] = []
+    with claimed.open("r", encoding="utf-8") as fh:
+        for line in fh:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                ts = _event_time(json.loads(line))
+            except json.JSONDecodeError:
+                continue
+            records.append((ts or 0, line))
+    _append_records(_wallet_dir(address) / kind, records, dedup=False)
+    claimed.unlink()
+    logger.info("Migrated %s cached %s events of %s to segments", len(records), kind, address)
+
+
+@contextmanager
+def _locked(target: Path, exclusive: bool = False):
+    target.mkdir(parents=True, exist_ok=True)
+    with (target / LOCK_FILE).open("a") as fh:
+        fcntl.flock(fh, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+        try:
+            yield
+        finally:
+            fcntl.flock(fh, fcntl.LOCK_UN)
+
+
+def _index_entries(index_path: Path) -> List[Tuple[int, int, int]]:
+    """All entries of an index in append order (a torn last entry is ignored)."""
+    try:
+        data = index_path.read_bytes()
+    except FileNotFoundError:
+        return []
+    return list(INDEX_ENTRY.iter_unpack(data[: len(data) - len(data) % INDEX_ENTRY.size]))
+
+
+def _advance_high_water(segment: Path, time_ms: int) -> int:
+    """Raise the high-water mark of ``segment`` to ``time_ms``; returns the mark."""
+    fd = os.open(segment.with_suffix(HIGH_WATER_SUFFIX), os.O_RDWR | os.O_CREAT, 0o644)
+    try:
+        # Appenders share the directory lock; the mark only ever grows.
+        fcntl.flock(fd, fcntl.LOCK_EX)
+        data = os.pread(fd, HIGH_WATER.size, 0)
+        if len(data) == HIGH_WATER.size:
+            time_ms = max(time_ms, HIGH_WATER.unpack(data)[0])
+        os.pwrite(fd, HIGH_WATER.pack(time_ms), 0)
+        return time_ms
+    finally:
+        os.close(fd)
+
+
+def _high_water(segment: Path) -> Optional[int]:
+    """Newest ``time_ms`` indexed in ``segment``, or None when it is empty."""
+    try:
+        data = segment.with_suffix(HIGH_WATER_SUFFIX).read_bytes()
+    except FileNotFoundError:
+        data = b""
+    if len(data) == HIGH_WATER.size:
+        return HIGH_WATER.unpack(data)[0]
+    # Segments written before the mark existed: derive it from the index once.
+    entries = _index_entries(segment.with_suffix(INDEX_SUFFIX))
+    if not entries:
+        return None
+    return _advance_high_water(segment, max(time_ms for time_ms, _, _ in entries))
+
+
+def _stored_keys(segment: Path, times: set) -> set:
+    """Keys of the lines of ``segment`` whose ``time_ms`` is one of ``times``."""
+    entries = [entry for entry in _index_entries(segment.with_suffix(INDEX_SUFFIX)) if entry[0] in times]
+    keys = set()
+    if not entries:
+        return keys
+    with segment.open("rb") as fh:
+        for time_ms, offset, length in entries:
+            item = _decode(os.pread(fh.fileno(), length, offset), time_ms)
+            if item is not None:
+                keys.add(event_key(item))
+    return keys
+
+
+def _fresh_items(segment: Path, items: List[Tuple[int, str]]) -> List[Tuple[int, str]]:
+    """``items`` without the events already stored in ``segment`` or repeated in the batch."""
+    high_water = _high_water(segment)
+    keyed = []
+    for time_ms, raw in items:
+        try:
+            key = event_key(json.loads(raw))
+        except json.JSONDecodeError:
+            key = None
+        keyed.append((time_ms, raw, key))
+    seen = set()
+    if high_water is not None:
+        times = {time_ms for time_ms, _, key in keyed if key is not None and time_ms <= high_water}
+        if times:
+            seen = _stored_keys(segment, times)
+    fresh = []
+    for time_ms, raw, key in keyed:
+        if key is not None:
+            if key in seen:
+                continue
+            seen.add(key)
+        fresh.append((time_ms, raw))
+    return fresh
+
+
+def _append_records(target: Path, records: Iterable[Tuple[int, str]], dedup: bool = True) -> None:
+    by_segment: Dict[str, List[Tuple[int, str]]] = {}
+    for time_ms, raw in records:
+        if "\n" in raw or "\r" in raw:
+            raw = " ".join(raw.splitlines())
+        by_segment.setdefault(_segment_name(time_ms), []).append((time_ms, raw))
+    if not by_segment:
+        return
+    with _locked(target):
+        for name, items in by_segment.items():
+            _append_segment(target, name, items, dedup)
+
+
+def _append_segment(target: Path, name: str, items: List[Tuple[int, str]], dedup: bool) -> None:
+    segment = target / f"{name}{SEGMENT_SUFFIX}"
+    if dedup:
+        items = _fresh_items(segment, items)
+        if not items:
+            return
+    lines = [(time_ms, (raw + "\n").encode("utf-8")) for time_ms, raw in items]
+    block = b"".join(line for _, line in lines)
+    with segment.open("ab", buffering=0) as fh:
+        fh.write(block)
+        # O_APPEND places the write at the end even with other writers;
+        # our own file position is right after it.
+        offset = fh.tell() - len(block)
+    index = bytearray()
+    for time_ms, line in lines:
+        index += INDEX_ENTRY.pack(time_ms, offset, len(line) - 1)
+        offset += len(line)
+    with (target / f"{name}{INDEX_SUFFIX}").open("ab", buffering=0) as fh:
+        fh.write(index)
+    _advance_high_water(segment, max(time_ms for time_ms, _ in items))
+
+
 def append_events(address: str, kind: str, events: list[Dict[str, Any]]) -> None:
-    """Append raw events to `<cache>/<wallet>/<kind>.jsonl`."""
+    """Append raw events to the ``<kind>`` segments of the wallet."""
     if not events:
         return
-    path = _wallet_dir(address) / f"{kind}.jsonl"
-    with path.open("a", encoding="utf-8") as fh:
-        for item in events:
-            fh.write(json.dumps(item, ensure_ascii=False))
-            fh.write("\n")
+    append_raw_events(
+        address, kind, [(_event_time(item) or 0, json.dumps(item, ensure_ascii=False)) for item in events]
+    )
+
+
+def append_raw_events(address: str, kind: str, records: Iterable[Tuple[int, str]]) -> None:
+    """Append already serialized events as ``(time_ms, json)`` records.
+
+    Used with the source text of streamed API items so they are not encoded
+    twice; line breaks in pretty-printed input are folded to keep one event
+    per line.
+    """
+    _append_records(_kind_dir(address, kind), records)
+
+
+@contextmanager
+def metadata_batch() -> Iterator[MetadataBatch]:
+    """Buffer :func:`update_metadata` calls made in the block (including
+    coroutines and ``asyncio.to_thread`` calls started from it) and write each
+    wallet's ``meta.json`` once on exit. Nested blocks share the outer batch.
+    """
+    active = _metadata_batch.get()
+    if active is not None:
+        yield active
+        return
+    batch = MetadataBatch()
+    token = _metadata_batch.set(batch)
+    try:
+        yield batch
+    finally:
+        _metadata_batch.reset(token)
+        batch.flush()
 
 
 def update_metadata(address: str, **fields: Any) -> None:
     if not fields:
         return
+    batch = _metadata_batch.get()
+    if batch is not None:
+        batch.add(address, fields)
+        return
+    _write_metadata(address, fields)
+
+
+def _write_metadata(address: str, fields: Dict[str, Any]) -> None:
     meta_path = _wallet_dir(address) / "meta.json"
     data: Dict[str, Any] = {}
-    if meta_path.exists():
-        try:
-            data = json.loads(meta_path.read_text(encoding="utf-8"))
-        except json.JSONDecodeError:
-            data = {}
+    try:
+        data = json.loads(meta_path.read_text(encoding="utf-8"))
+    except (FileNotFoundError, json.JSONDecodeError):
+        data = {}
     data.update(fields)
-    meta_path.write_text(json.dumps(data, ensure_ascii=False, indent=2), encoding="utf-8")
+    # A unique temp name per writer; readers only ever see a complete file.
+    tmp = meta_path.with_name(f"meta.json.{os.getpid()}.{threading.get_ident()}.tmp")
+    tmp.write_text(json.dumps(data, ensure_ascii=False, indent=2), encoding="utf-8")
+    os.replace(tmp, meta_path)
 
 
 def write_json(address: str, filename: str, payload: Any) -> None:
@@ -44,37 +342,232 @@ def write_json(address: str, filename: str, payload: Any) -> None:
     path.write_text(json.dumps(payload, ensure_ascii=False, indent=2), encoding="utf-8")
 
 
+def _segments(address: str, kind: str, start_time: Optional[int], end_time: Optional[int]) -> List[Path]:
+    """Segment files overlapping the range, newest month first."""
+    target = _kind_dir(address, kind)
+    if not target.exists():
+        return []
+    first = _segment_name(start_time) if start_time is not None else None
+    last = _segment_name(end_time) if end_time is not None else None
+    names = sorted(
+        (path.stem for path in target.glob(f"*{SEGMENT_SUFFIX}")),
+        reverse=True,
+    )
+    return [
+        target / f"{name}{SEGMENT_SUFFIX}"
+        for name in names
+        if (first is None or name >= first) and (last is None or name <= last)
+    ]
+
+
+def _index(segment: Path, start_time: Optional[int], end_time: Optional[int]) -> List[Tuple[int, int, int]]:
+    """Index entries of ``segment`` within the range, newest first."""
+    index_path = segment.with_suffix(INDEX_SUFFIX)
+    if not index_path.exists():
+        return []
+    data = index_path.read_bytes()
+    usable = len(data) - len(data) % INDEX_ENTRY.size  # ignore a torn last entry
+    entries = [
+        entry
+        for entry in INDEX_ENTRY.iter_unpack(data[:usable])
+        if (start_time is None or entry[0] >= start_time) and (end_time is None or entry[0] <= end_time)
+    ]
+    entries.sort(key=lambda entry: entry[0], reverse=True)
+    return entries
+
+
+def _decode(raw: bytes, time_ms: int) -> Optional[Dict[str, Any]]:
+    try:
+        data = json.loads(raw)
+    except (json.JSONDecodeError, UnicodeDecodeError):
+        return None
+    if not isinstance(data, dict):
+        return None
+    data.setdefault("time_ms", time_ms)
+    return data
+
+
+def iter_events(
+    address: str,
+    kind: str,
+    *,
+    start_time: Optional[int] = None,
+    end_time: Optional[int] = None,
+) -> Iterator[Dict[str, Any]]:
+    """Cached events of ``kind`` within the time range, newest first.
+
+    Lazily reads one segment at a time; stop iterating to avoid touching
+    older segments.
+    """
+    for segment in _segments(address, kind, start_time, end_time):
+        entries = _index(segment, start_time, end_time)
+        if not entries:
+            continue
+        with segment.open("rb") as fh:
+            size = os.fstat(fh.fileno()).st_size
+            if size == 0:
+                continue
+            with mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ) as view:
+                for time_ms, offset, length in entries:
+                    if offset + length > size:
+                        continue
+                    item = _decode(view[offset : offset + length], time_ms)
+                    # A segment swapped by compaction between reading the
+                    # index and opening the data no longer matches the index.
+                    if item is not None and (_event_time(item) or 0) == time_ms:
+                        yield item
+
+
+def count_events(
+    address: str,
+    kind: str,
+    *,
+    start_time: Optional[int] = None,
+    end_time: Optional[int] = None,
+) -> int:
+    """Number of cached events in the range, from the indexes alone."""
+    return sum(len(_index(segment, start_time, end_time)) for segment in _segments(address, kind, start_time, end_time))
+
+
 def read_events(
     address: str,
     kind: str,
     *,
     start_time: Optional[int] = None,
     end_time: Optional[int] = None,
+    limit: Optional[int] = None,
+    offset: int = 0,
 ) -> List[Dict[str, Any]]:
-    path = _wallet_dir(address) / f"{kind}.jsonl"
-    if not path.exists():
-        return []
+    """Cached events within the range, newest first; ``limit``/``offset`` page them."""
     events: List[Dict[str, Any]] = []
-    with path.open("r", encoding="utf-8") as fh:
-        for line in fh:
-            line = line.strip()
-            if not line:
-                continue
-            try:
-                data = json.loads(line)
-            except json.JSONDecodeError:
+    for index, item in enumerate(iter_events(address, kind, start_time=start_time, end_time=end_time)):
+        if index < offset:
+            continue
+        if limit is not None and len(events) >= limit:
+            break
+        events.append(item)
+    return events
+
+
+def _read_segment(segment: Path) -> List[Tuple[int, bytes]]:
+    """All indexed ``(time_ms, line)`` of ``segment`` in append order."""
+    entries = _index_entries(segment.with_suffix(INDEX_SUFFIX))
+    if not entries:
+        return []
+    content = segment.read_bytes()
+    return [
+        (time_ms, content[offset : offset + length])
+        for time_ms, offset, length in entries
+        if offset + length <= len(content)
+    ]
+
+
+def _compact_segment(segment: Path, cutoff: Optional[int]) -> Tuple[int, int, Optional[int]]:
+    """Rewrite ``segment`` deduplicated and time-ordered.
+
+    Returns (kept, dropped, oldest kept time_ms).
+    """
+    lines = _read_segment(segment)
+    seen = set()
+    kept: List[Tuple[int, bytes]] = []
+    for time_ms, raw in lines:
+        if cutoff is not None and time_ms < cutoff:
+            continue
+        item = _decode(raw, time_ms)
+        if item is None:
+            continue
+        key = event_key(item)
+        if key in seen:
+            continue
+        seen.add(key)
+        kept.append((time_ms, raw))
+    dropped = len(lines) - len(kept)
+    index_path = segment.with_suffix(INDEX_SUFFIX)
+    high_water_path = segment.with_suffix(HIGH_WATER_SUFFIX)
+    if not kept:
+        segment.unlink(missing_ok=True)
+        index_path.unlink(missing_ok=True)
+        high_water_path.unlink(missing_ok=True)
+        return 0, dropped, None
+    kept.sort(key=lambda pair: pair[0])
+    data = bytearray()
+    index = bytearray()
+    for time_ms, raw in kept:
+        index += INDEX_ENTRY.pack(time_ms, len(data), len(raw))
+        data += raw + b"\n"
+    tmp_data = segment.with_name(segment.name + ".tmp")
+    tmp_index = index_path.with_name(index_path.name + ".tmp")
+    tmp_data.write_bytes(data)
+    tmp_index.write_bytes(index)
+    os.replace(tmp_data, segment)
+    os.replace(tmp_index, index_path)
+    # No appender runs during compaction (exclusive lock).
+    high_water_path.write_bytes(HIGH_WATER.pack(kept[-1][0]))
+    return len(kept), dropped, kept[0][0]
+
+
+def compact(address: str, kind: str, retention_days: Optional[int] = None) -> Dict[str, int]:
+    """Deduplicate and time-order the changed segments of one wallet/kind.
+
+    ``compaction.json`` records per segment the index size and oldest event
+    time left by the last compaction. Segments whose index did not grow since
+    are skipped, unless the retention cutoff has moved past their oldest
+    event.
+    """
+    if retention_days is None:
+        retention_days = get_settings().cache_retention_days
+    cutoff = int(time.time() * 1000) - retention_days * DAY_MS if retention_days > 0 else None
+    target = _kind_dir(address, kind)
+    stats = {"segments": 0, "kept": 0, "dropped": 0}
+    if not target.exists():
+        return stats
+    state_path = target / COMPACTION_STATE_FILE
+    with _locked(target, exclusive=True):
+        try:
+            state = json.loads(state_path.read_text(encoding="utf-8"))
+        except (FileNotFoundError, json.JSONDecodeError):
+            state = {}
+        for segment in sorted(target.glob(f"*{SEGMENT_SUFFIX}")):
+            name = segment.stem
+            index_path = segment.with_suffix(INDEX_SUFFIX)
+            size = index_path.stat().st_size if index_path.exists() else 0
+            done = state.get(name)
+            # Entries of older versions hold the size only; compact those once more.
+            if isinstance(done, list) and done[0] == size and (cutoff is None or done[1] >= cutoff):
                 continue
-            ts = data.get("time_ms") or data.get("time") or data.get("timestamp")
+            kept, dropped, oldest = _compact_segment(segment, cutoff)
+            stats["segments"] += 1
+            stats["kept"] += kept
+            stats["dropped"] += dropped
+            if kept:
+                state[name] = [kept * INDEX_ENTRY.size, oldest]
+            else:
+                state.pop(name, None)
+        for name in [name for name in state if not (target / f"{name}{SEGMENT_SUFFIX}").exists()]:
+            state.pop(name)
+        tmp = state_path.with_name(state_path.name + ".tmp")
+        tmp.write_text(json.dumps(state, sort_keys=True), encoding="utf-8")
+        os.replace(tmp, state_path)
+    return stats
+
+
+def compact_all(retention_days: Optional[int] = None) -> Dict[str, int]:
+    """Compact the cache of every wallet (scheduled periodically)."""
+    totals = {"wallets": 0, "segments": 0, "kept": 0, "dropped": 0}
+    cache_dir = get_settings().cache_dir
+    if not cache_dir.exists():
+        return totals
+    for wallet_dir in sorted(path for path in cache_dir.iterdir() if path.is_dir()):
+        kinds = {path.name for path in wallet_dir.iterdir() if path.is_dir()}
+        kinds |= {path.stem for path in wallet_dir.glob(f"*{SEGMENT_SUFFIX}")}
+        for kind in sorted(kinds):
             try:
-                ts_int = int(ts) if ts is not None else None
+                stats = compact(wallet_dir.name, kind, retention_days)
             except Exception:
-                ts_int = None
-            if ts_int is not None:
-                if start_time is not None and ts_int < start_time:
-                    continue
-                if end_time is not None and ts_int > end_time:
-                    continue
-                data.setdefault("time_ms", ts_int)
-            events.append(data)
-    events.sort(key=lambda item: item.get("time_ms") or item.get("time") or 0, reverse=True)
-    return events
+                logger.exception("Cache compaction failed for %s/%s", wallet_dir.name, kind)
+                continue
+            for key, value in stats.items():
+                totals[key] += value
+        totals["wallets"] += 1
+    logger.info("Local cache compacted", extra={"result": totals})
+    return totals
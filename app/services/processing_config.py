@@ -24,6 +24,11 @@ DEFAULT_PROCESSING_CONFIG: Dict[str, Any] = {
     "score_cooldown_days": 7,
     "ai_cooldown_days": 30,
     "portfolio_refresh_hours": 24,
+    "max_pages_per_sync": 20,
+    "concurrent_fetch": True,
+    "backfill_window_days": 14,
+    "backfill_concurrency": 4,
+    "backfill_max_windows": 48,
 }
 
 DEFAULT_TEMPLATES: List[Dict[str, Any]] = [
@@ -134,6 +139,10 @@ def validate_processing_config(config: Dict[str, Any]) -> None:
         "score_cooldown_days",
         "ai_cooldown_days",
         "portfolio_refresh_hours",
+        "max_pages_per_sync",
+        "backfill_window_days",
+        "backfill_concurrency",
+        "backfill_max_windows",
     ):
         value = merged.get(key)
         if not isinstance(value, int) or value <= 0:
@@ -145,6 +154,8 @@ def validate_processing_config(config: Dict[str, Any]) -> None:
     trigger = merged.get("rescore_trigger_pct")
     if not isinstance(trigger, (int, float)) or trigger < 0:
         raise ValueError("rescore_trigger_pct must be >= 0")
+    if not isinstance(merged.get("concurrent_fetch"), bool):
+        raise ValueError("concurrent_fetch must be a boolean")
     scope_type = merged.get("scope_type")
     if scope_type not in {"all", "today", "recent", "tag"}:
         raise ValueError("scope_type invalid")
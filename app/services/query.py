@@ -1,11 +1,11 @@
 from datetime import datetime
 from decimal import Decimal
-from typing import Dict, List, Optional
+from typing import Dict, Iterable, List, Optional, Tuple
 
 from sqlalchemy import and_, desc, func, select
 
 from app.core.database import session_scope
-from app.models import FetchCursor, Fill, LedgerEvent, OrderHistory, PositionSnapshot
+from app.models import CurrentPosition, FetchCoverage, FetchCursor, Fill, LedgerEvent, OrderHistory, PositionSnapshot
 from app.services import local_cache
 
 # Export model references for routing
@@ -28,6 +28,47 @@ def get_cursors(user: str) -> Dict[str, int]:
         return {r.cursor_type: r.last_time_ms for r in rows}
 
 
+# Streams start at ``startTime=1`` (cursor 0 + 1), so coverage is expected
+# from here; anything before a stream's first interval is a gap as well.
+COVERAGE_ORIGIN_MS = 1
+
+
+def get_coverage(user: str) -> Dict[str, List[List[int]]]:
+    """Fetched time ranges per stream as sorted ``[start_ms, end_ms]`` pairs."""
+    with session_scope() as session:
+        rows = session.execute(
+            select(FetchCoverage)
+            .where(FetchCoverage.user == user)
+            .order_by(FetchCoverage.stream, FetchCoverage.start_ms)
+        ).scalars().all()
+        coverage: Dict[str, List[List[int]]] = {}
+        for row in rows:
+            coverage.setdefault(row.stream, []).append([row.start_ms, row.end_ms])
+        return coverage
+
+
+def find_gaps(intervals: List[List[int]], origin: int = COVERAGE_ORIGIN_MS) -> List[Tuple[int, int]]:
+    """Missing ranges between ``origin`` and the end of the last interval.
+
+    Time after the last interval is the sync frontier, not a gap.
+    """
+    gaps: List[Tuple[int, int]] = []
+    expected = origin
+    for start_ms, end_ms in sorted(intervals):
+        if start_ms > expected:
+            gaps.append((expected, start_ms - 1))
+        expected = max(expected, end_ms + 1)
+    return gaps
+
+
+def get_coverage_gaps(user: str) -> Dict[str, List[List[int]]]:
+    return {
+        stream: [list(gap) for gap in find_gaps(intervals)]
+        for stream, intervals in get_coverage(user).items()
+        if find_gaps(intervals)
+    }
+
+
 def latest_records(user: str, limit: int = 20) -> Dict[str, List[dict]]:
     """Return latest ledger, fills, positions, orders as dicts (limited)."""
     limit = min(max(limit, 1), 100)
@@ -77,8 +118,7 @@ def latest_records(user: str, limit: int = 20) -> Dict[str, List[dict]]:
     def with_cache(records: List, model, kind: str):
         if records:
             return [model_to_dict(o) for o in records]
-        cached = local_cache.read_events(user, kind)
-        return cached[:limit]
+        return local_cache.read_events(user, kind, limit=limit)
 
     return {
         "ledger": with_cache(ledger, LedgerEventModel, "ledger"),
@@ -88,7 +128,50 @@ def latest_records(user: str, limit: int = 20) -> Dict[str, List[dict]]:
     }
 
 
-def _fill_summary_from_rows(rows: List[dict]) -> dict:
+def _model_to_dict(obj) -> dict:
+    data = obj.__dict__.copy()
+    data.pop("_sa_instance_state", None)
+    for key, value in list(data.items()):
+        if isinstance(value, Decimal):
+            data[key] = str(value)
+        elif isinstance(value, datetime):
+            data[key] = value.isoformat()
+    return data
+
+
+def get_current_positions(user: str) -> List[dict]:
+    """Open positions as of the last sync (one row per coin)."""
+    with session_scope() as session:
+        rows = session.execute(
+            select(CurrentPosition).where(CurrentPosition.user == user).order_by(CurrentPosition.coin)
+        ).scalars().all()
+        return [_model_to_dict(row) for row in rows]
+
+
+def positions_at(user: str, time_ms: int) -> List[dict]:
+    """Open positions at ``time_ms`` rebuilt from the change history.
+
+    Snapshot rows are only written on material changes, so the state at a
+    given time is the latest row per coin at or before it; coins whose latest
+    row is a close (``szi = 0``) are left out.
+    """
+    with session_scope() as session:
+        latest = (
+            select(PositionSnapshot.coin, func.max(PositionSnapshot.time_ms).label("time_ms"))
+            .where(PositionSnapshot.user == user, PositionSnapshot.time_ms <= time_ms)
+            .group_by(PositionSnapshot.coin)
+            .subquery()
+        )
+        rows = session.execute(
+            select(PositionSnapshot)
+            .join(latest, and_(PositionSnapshot.coin == latest.c.coin, PositionSnapshot.time_ms == latest.c.time_ms))
+            .where(PositionSnapshot.user == user, PositionSnapshot.szi != 0)
+            .order_by(PositionSnapshot.coin)
+        ).scalars().all()
+        return [_model_to_dict(row) for row in rows]
+
+
+def _fill_summary_from_rows(rows: Iterable[dict]) -> dict:
     total_pnl = Decimal(0)
     wins = 0
     losses = 0
@@ -161,11 +244,14 @@ def paged_events(model, user: str, start_time: int = None, end_time: int = None,
     if total == 0:
         cache_kind = CACHE_KIND_MAP.get(model)
         if cache_kind:
-            cached = local_cache.read_events(user, cache_kind, start_time=start_time, end_time=end_time)
-            total = len(cached)
-            items = cached[offset : offset + limit]
+            total = local_cache.count_events(user, cache_kind, start_time=start_time, end_time=end_time)
+            items = local_cache.read_events(
+                user, cache_kind, start_time=start_time, end_time=end_time, limit=limit, offset=offset
+            )
             if model is FillModel:
-                summary = _fill_summary_from_rows(cached)
+                summary = _fill_summary_from_rows(
+                    local_cache.iter_events(user, cache_kind, start_time=start_time, end_time=end_time)
+                )
 
     if model is FillModel and summary is None:
         summary = _fill_summary_from_rows(items)
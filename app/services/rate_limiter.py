@@ -0,0 +1,218 @@
+"""Admission control for Hyperliquid info requests.
+
+``RateLimiter`` bounds requests per minute with a token bucket;
+``AdaptiveConcurrency`` bounds requests in flight and adapts to throttling.
+
+The bucket lives in Redis so every API process and RQ worker, on every node,
+draws from one shared ``request_rate_per_min`` budget. When Redis is not
+reachable each process falls back to a local bucket with the same rate (the
+effective ceiling is then per process) and retries Redis after a cooldown.
+
+The rate is read from the processing config on a short TTL, so changes made
+through ``/processing/config`` take effect within seconds without restarts.
+"""
+import asyncio
+import logging
+import threading
+import time
+from typing import Optional, Tuple
+
+from redis import Redis
+from redis.exceptions import RedisError
+
+from app.core.config import get_settings
+from app.services import processing_config
+
+logger = logging.getLogger(__name__)
+
+BUCKET_KEY = "hyperliquid:rate:bucket"
+RATE_CACHE_SECONDS = 5.0
+REDIS_RETRY_SECONDS = 30.0
+
+# Reserve ``requested`` tokens and return how long the caller must wait (ms).
+# The balance may go negative: each caller reserves its slot up front, so
+# waiters are spaced out evenly instead of retrying in a thundering herd.
+# Time comes from the Redis server so clock skew between nodes is irrelevant.
+_RESERVE_SCRIPT = """
+local rate = tonumber(ARGV[1])
+local capacity = tonumber(ARGV[2])
+local requested = tonumber(ARGV[3])
+local t = redis.call('TIME')
+local now = tonumber(t[1]) * 1000 + tonumber(t[2]) / 1000
+local data = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+local tokens = tonumber(data[1]) or capacity
+local ts = tonumber(data[2]) or now
+tokens = math.min(capacity, tokens + math.max(0, now - ts) * rate) - requested
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'ts', tostring(now))
+redis.call('PEXPIRE', KEYS[1], math.ceil((capacity - tokens) / rate) + 1000)
+if tokens >= 0 then
+  return '0'
+end
+return tostring(-tokens / rate)
+"""
+
+
+class _LocalBucket:
+    """In-process token bucket with the same reservation semantics as the script."""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._tokens: Optional[float] = None
+        self._ts = time.monotonic() * 1000
+
+    def reserve(self, rate_per_ms: float, capacity: float, requested: float) -> float:
+        with self._lock:
+            now = time.monotonic() * 1000
+            tokens = capacity if self._tokens is None else self._tokens
+            tokens = min(capacity, tokens + max(0.0, now - self._ts) * rate_per_ms) - requested
+            self._tokens = tokens
+            self._ts = now
+            return 0.0 if tokens >= 0 else -tokens / rate_per_ms
+
+
+class RateLimiter:
+    def __init__(self, key: str = BUCKET_KEY) -> None:
+        self.key = key
+        self._local = _LocalBucket()
+        self._redis: Optional[Redis] = None
+        self._script = None
+        self._redis_down_until = 0.0
+        self._rate_cache: Tuple[float, int] = (0.0, 0)
+        self._lock = threading.Lock()
+
+    def _rate_per_min(self) -> int:
+        fetched_at, rate = self._rate_cache
+        if time.monotonic() - fetched_at < RATE_CACHE_SECONDS and rate:
+            return rate
+        try:
+            rate = int(processing_config.get_processing_config().get("request_rate_per_min") or 0)
+        except Exception:
+            logger.debug("Failed to load request_rate_per_min", exc_info=True)
+            rate = rate or processing_config.DEFAULT_PROCESSING_CONFIG["request_rate_per_min"]
+        self._rate_cache = (time.monotonic(), rate)
+        return rate
+
+    def _get_script(self):
+        with self._lock:
+            if self._script is None:
+                settings = get_settings()
+                self._redis = Redis.from_url(settings.redis_url, socket_timeout=0.5, socket_connect_timeout=0.5)
+                self._script = self._redis.register_script(_RESERVE_SCRIPT)
+            return self._script
+
+    def reserve(self, tokens: float = 1.0) -> float:
+        """Reserve ``tokens`` and return the number of seconds to wait before using them."""
+        settings = get_settings()
+        rate = self._rate_per_min()
+        if not settings.hyperliquid_rate_limit_enabled or rate <= 0:
+            return 0.0
+        rate_per_ms = rate / 60_000
+        capacity = max(1.0, rate / 60 * settings.hyperliquid_rate_burst_seconds)
+        if time.monotonic() >= self._redis_down_until:
+            try:
+                wait_ms = float(self._get_script()(keys=[self.key], args=[rate_per_ms, capacity, tokens]))
+                return wait_ms / 1000
+            except RedisError as exc:
+                logger.warning("Rate limiter Redis unavailable, using in-process bucket: %s", exc)
+                self._redis_down_until = time.monotonic() + REDIS_RETRY_SECONDS
+        return self._local.reserve(rate_per_ms, capacity, tokens) / 1000
+
+    def acquire(self, tokens: float = 1.0) -> None:
+        wait = self.reserve(tokens)
+        if wait > 0:
+            time.sleep(wait)
+
+    async def acquire_async(self, tokens: float = 1.0) -> None:
+        # The Redis round trip (and its connect timeout) would block the loop.
+        wait = await asyncio.to_thread(self.reserve, tokens)
+        if wait > 0:
+            await asyncio.sleep(wait)
+
+
+_limiter: Optional[RateLimiter] = None
+
+
+def get_rate_limiter() -> RateLimiter:
+    global _limiter
+    if _limiter is None:
+        _limiter = RateLimiter()
+    return _limiter
+
+
+class AdaptiveConcurrency:
+    """AIMD limit on in-flight Hyperliquid requests within this process.
+
+    Every healthy response grows the limit by ``1 / limit`` (about one slot
+    per window of successful requests); a throttled or failed attempt
+    halves it, at most once per ``cooldown`` seconds so a burst of
+    concurrent failures from the same episode counts as one signal.
+    """
+
+    def __init__(
+        self,
+        max_limit: int,
+        min_limit: int = 1,
+        decrease_factor: float = 0.5,
+        cooldown: float = 1.0,
+    ) -> None:
+        self.min_limit = min_limit
+        self.max_limit = max(min_limit, max_limit)
+        self.decrease_factor = decrease_factor
+        self.cooldown = cooldown
+        self.limit = float(self.max_limit)
+        self.in_flight = 0
+        self._last_decrease = 0.0
+        self._cond = threading.Condition()
+
+    def _capacity(self) -> int:
+        return max(self.min_limit, int(self.limit))
+
+    def try_acquire(self) -> bool:
+        with self._cond:
+            if self.in_flight >= self._capacity():
+                return False
+            self.in_flight += 1
+            return True
+
+    def acquire(self) -> None:
+        with self._cond:
+            while self.in_flight >= self._capacity():
+                self._cond.wait(0.5)
+            self.in_flight += 1
+
+    async def acquire_async(self) -> None:
+        while not self.try_acquire():
+            await asyncio.sleep(0.05)
+
+    def release(self) -> None:
+        with self._cond:
+            self.in_flight = max(0, self.in_flight - 1)
+            self._cond.notify()
+
+    def on_success(self) -> None:
+        with self._cond:
+            self.limit = min(float(self.max_limit), self.limit + 1 / self.limit)
+            self._cond.notify_all()
+
+    def on_throttle(self) -> None:
+        with self._cond:
+            now = time.monotonic()
+            if now - self._last_decrease < self.cooldown:
+                return
+            self._last_decrease = now
+            self.limit = max(float(self.min_limit), self.limit * self.decrease_factor)
+            logger.info("Hyperliquid concurrency reduced to %.2f", self.limit)
+
+    def snapshot(self) -> dict:
+        with self._cond:
+            return {"limit": round(self.limit, 2), "in_flight": self.in_flight, "max_limit": self.max_limit}
+
+
+_concurrency: Optional[AdaptiveConcurrency] = None
+
+
+def get_concurrency_limiter() -> AdaptiveConcurrency:
+    global _concurrency
+    if _concurrency is None:
+        _concurrency = AdaptiveConcurrency(max_limit=get_settings().hyperliquid_max_concurrency)
+    return _concurrency
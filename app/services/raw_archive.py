@@ -0,0 +1,155 @@
+"""Compressed append-only archive of raw API items.
+
+Normalized tables keep only the columns we query; the exact JSON of every
+fill, ledger/funding update, order and position change is appended here
+instead, to ``<raw_archive_dir>/<wallet>/<kind>.hlra``. A file is a sequence
+of blocks, each one write of::
+
+    header  magic "HLRA", codec, item count, min time_ms, max time_ms, payload length
+    payload compressed lines of ``<time_ms>\t<item JSON>``
+
+Blocks are written with a single ``write`` on a file opened for appending, so
+concurrent writers never interleave within a block. Lookups read the headers,
+decompress only blocks whose time range overlaps the query and drop items
+archived twice (a page that is re-read after an interrupted sync).
+
+``zlib`` is always available; ``RAW_ARCHIVE_CODEC=zstd`` uses the optional
+``zstandard`` package and falls back to zlib when it is not installed.
+Blocks record their codec, so files may mix both.
+"""
+from __future__ import annotations
+
+import json
+import logging
+import struct
+import zlib
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from app.core.config import get_settings
+
+logger = logging.getLogger(__name__)
+
+MAGIC = b"HLRA"
+HEADER = struct.Struct(">4sBIqqI")
+CODEC_ZLIB = 0
+CODEC_ZSTD = 1
+ZLIB_LEVEL = 6
+ZSTD_LEVEL = 9
+
+
+def _zstd():
+    try:
+        import zstandard
+    except ImportError:
+        return None
+    return zstandard
+
+
+def _write_codec() -> int:
+    if get_settings().raw_archive_codec.lower() != "zstd":
+        return CODEC_ZLIB
+    if _zstd() is None:
+        logger.warning("RAW_ARCHIVE_CODEC=zstd but the zstandard package is not installed; using zlib")
+        return CODEC_ZLIB
+    return CODEC_ZSTD
+
+
+def _compress(codec: int, data: bytes) -> bytes:
+    if codec == CODEC_ZSTD:
+        return _zstd().ZstdCompressor(level=ZSTD_LEVEL).compress(data)
+    return zlib.compress(data, ZLIB_LEVEL)
+
+
+def _decompress(codec: int, data: bytes) -> bytes:
+    if codec == CODEC_ZLIB:
+        return zlib.decompress(data)
+    if codec == CODEC_ZSTD:
+        zstandard = _zstd()
+        if zstandard is None:
+            raise RuntimeError("raw archive block is zstd-compressed but zstandard is not installed")
+        return zstandard.ZstdDecompressor().decompress(data)
+    raise ValueError(f"unknown raw archive codec {codec}")
+
+
+def _archive_path(address: str, kind: str, create: bool = False) -> Path:
+    target = get_settings().raw_archive_dir / address.lower()
+    if create:
+        target.mkdir(parents=True, exist_ok=True)
+    return target / f"{kind}.hlra"
+
+
+def append(address: str, kind: str, records: Iterable[Tuple[int, str]]) -> int:
+    """Append ``(time_ms, raw_json)`` records as one block; returns the count written."""
+    lines: List[str] = []
+    min_time: Optional[int] = None
+    max_time: Optional[int] = None
+    for time_ms, raw in records:
+        if "\n" in raw or "\r" in raw:
+            raw = " ".join(raw.splitlines())
+        lines.append(f"{int(time_ms)}\t{raw}")
+        min_time = time_ms if min_time is None else min(min_time, time_ms)
+        max_time = time_ms if max_time is None else max(max_time, time_ms)
+    if not lines:
+        return 0
+    codec = _write_codec()
+    payload = _compress(codec, "\n".join(lines).encode("utf-8"))
+    block = HEADER.pack(MAGIC, codec, len(lines), min_time, max_time, len(payload)) + payload
+    with _archive_path(address, kind, create=True).open("ab", buffering=0) as fh:
+        fh.write(block)
+    return len(lines)
+
+
+def _blocks(path: Path, start_time: Optional[int], end_time: Optional[int]) -> Iterator[bytes]:
+    """Decompressed payloads of the blocks overlapping ``[start_time, end_time]``."""
+    with path.open("rb") as fh:
+        while True:
+            header = fh.read(HEADER.size)
+            if len(header) < HEADER.size:
+                return
+            magic, codec, _, min_time, max_time, length = HEADER.unpack(header)
+            if magic != MAGIC:
+                logger.warning("Corrupt raw archive block in %s; ignoring the rest of the file", path)
+                return
+            if (start_time is not None and max_time < start_time) or (end_time is not None and min_time > end_time):
+                fh.seek(length, 1)
+                continue
+            payload = fh.read(length)
+            if len(payload) < length:
+                # Partially written last block (writer crashed mid-append).
+                return
+            yield _decompress(codec, payload)
+
+
+def lookup(
+    address: str,
+    kind: str,
+    start_time: Optional[int] = None,
+    end_time: Optional[int] = None,
+    **match: Any,
+) -> List[Dict[str, Any]]:
+    """Archived items of ``kind`` within the time range, oldest first.
+
+    Keyword arguments filter on top-level item fields, e.g.
+    ``lookup(addr, "fills", t, t, tid=123)``.
+    """
+    path = _archive_path(address, kind)
+    if not path.exists():
+        return []
+    seen = set()
+    items: List[Tuple[int, Dict[str, Any]]] = []
+    for payload in _blocks(path, start_time, end_time):
+        for line in payload.decode("utf-8").split("\n"):
+            if line in seen:
+                continue
+            seen.add(line)
+            stamp, _, raw = line.partition("\t")
+            time_ms = int(stamp)
+            if (start_time is not None and time_ms < start_time) or (end_time is not None and time_ms > end_time):
+                continue
+            item = json.loads(raw)
+            if any(item.get(key) != value for key, value in match.items()):
+                continue
+            items.append((time_ms, item))
+    items.sort(key=lambda pair: pair[0])
+    return [item for _, item in items]
@@ -6,10 +6,11 @@ from apscheduler.schedulers.background import BackgroundScheduler
 from apscheduler.triggers.cron import CronTrigger
 from apscheduler.triggers.interval import IntervalTrigger
 
+from app.core.config import get_settings
 from app.core.database import session_scope
 from app.models import ScheduleJob
 from app.services import leaderboard as leaderboard_service
-from app.services import processing_config, processing
+from app.services import local_cache, processing_config, processing
 from app.services import task_queue
 
 logger = logging.getLogger(__name__)
@@ -51,6 +52,18 @@ def refresh_jobs() -> None:
         )
     except Exception as exc:
         logger.error("Failed to schedule processing batch job: %s", exc)
+    # 本地缓存去重 / 压缩
+    compaction_hours = get_settings().cache_compaction_interval_hours
+    if compaction_hours > 0:
+        try:
+            _scheduler.add_job(
+                local_cache.compact_all,
+                trigger=IntervalTrigger(hours=compaction_hours),
+                id="cache-compaction",
+                replace_existing=True,
+            )
+        except Exception as exc:
+            logger.error("Failed to schedule cache compaction job: %s", exc)
     with session_scope() as session:
         jobs = session.query(ScheduleJob).filter(ScheduleJob.enabled == 1).all()
     for job in jobs:
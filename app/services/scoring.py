@@ -2,38 +2,31 @@ import json
 import logging
 from decimal import Decimal
 from pathlib import Path
-from typing import Optional, Tuple
+from typing import Any, Dict, List, Optional, Tuple
 
-from sqlalchemy import asc, select
+from sqlalchemy import asc, func, select
 
 from app.core.database import session_scope
-from app.models import Fill, WalletMetric, WalletScore, PortfolioSnapshot
+from app.models import Fill, WalletMetric, WalletMetricState, WalletScore, PortfolioSnapshot
 from app.core.config import get_settings
+from app.services import fill_columns, local_cache, metrics_kernel
 
 SETTINGS = get_settings()
 
 
 def _funding_stats(user: str) -> Tuple[Decimal, Decimal]:
-    path = SETTINGS.cache_dir / user.lower() / "funding.jsonl"
     paid = Decimal(0)
     received = Decimal(0)
-    if not path.exists():
-        return paid, received
-    with path.open("r", encoding="utf-8") as fh:
-        for line in fh:
-            line = line.strip()
-            if not line:
-                continue
-            try:
-                item = json.loads(line)
-                delta = item.get("delta", {})
-                amount = Decimal(str(delta.get("usdc", "0") or "0"))
-                if amount < 0:
-                    paid += -amount
-                else:
-                    received += amount
-            except Exception:
-                continue
+    for item in local_cache.iter_events(user, "funding"):
+        try:
+            delta = item.get("delta", {})
+            amount = Decimal(str(delta.get("usdc", "0") or "0"))
+            if amount < 0:
+                paid += -amount
+            else:
+                received += amount
+        except Exception:
+            continue
     return paid, received
 
 
@@ -53,6 +46,211 @@ def _fee_rates(user: str) -> dict:
         return {}
 
 
+PERIOD_WINDOWS = {
+    "1d": 86_400_000,
+    "7d": 7 * 86_400_000,
+    "30d": 30 * 86_400_000,
+    "90d": 90 * 86_400_000,
+    "1y": 365 * 86_400_000,
+    "all": None,
+}
+AGGREGATE_FIELDS = ("total_pnl", "total_fees", "volume", "equity", "peak", "max_drawdown")
+FillAmounts = Tuple[int, Decimal, Decimal, Decimal, Decimal]
+
+
+def _exact_rows(rows) -> List[FillAmounts]:
+    return [
+        (
+            time_ms,
+            fill_columns.exact("closed_pnl", pnl),
+            fill_columns.exact("fee", fee),
+            fill_columns.exact("px", px),
+            fill_columns.exact("sz", sz),
+        )
+        for time_ms, pnl, fee, px, sz in rows
+    ]
+
+
+def _fill_count(session, user: str) -> Tuple[int, int]:
+    """``(last fill id, fill count)`` of ``user``."""
+    return tuple(
+        session.execute(select(func.coalesce(func.max(Fill.id), 0), func.count()).where(Fill.user == user)).one()
+    )
+
+
+def _fill_amounts(session, user: str) -> Tuple[int, List[FillAmounts]]:
+    """``(last fill id, [(time_ms, closed_pnl, fee, px, sz), ...])`` oldest first.
+
+    Read from the columnar fill store when NumPy is available, otherwise
+    straight from the ``fills`` columns (no ORM objects either way). Amounts
+    are rounded like the store keeps them, so both sources agree exactly.
+    """
+    last_id, count = _fill_count(session, user)
+    if fill_columns.available():
+        columns = fill_columns.load(user, expected=count)
+        # Fills inserted after the count above are left to the next increment.
+        if columns is not None and len(columns) == count:
+            amounts = [
+                [Decimal(value).scaleb(-fill_columns.COLUMNS[name][1]) for value in getattr(columns, name).tolist()]
+                for name in ("closed_pnl", "fee", "px", "sz")
+            ]
+            return last_id, list(zip(columns.time_ms.tolist(), *amounts))
+    rows = session.execute(
+        select(Fill.time_ms, Fill.closed_pnl, Fill.fee, Fill.px, Fill.sz)
+        .where(Fill.user == user, Fill.id <= last_id)
+        .order_by(asc(Fill.time_ms), asc(Fill.id))
+    ).all()
+    return last_id, _exact_rows(rows)
+
+
+def _new_aggregates(now_ms: int) -> Dict[str, Any]:
+    aggregates: Dict[str, Any] = {field: Decimal(0) for field in AGGREGATE_FIELDS}
+    aggregates.update(trades=0, wins=0, losses=0, last_fill_id=0, last_time_ms=0)
+    aggregates["periods"] = {
+        key: {"start_ms": None if window is None else now_ms - window, "pnl": Decimal(0), "volume": Decimal(0), "trades": 0}
+        for key, window in PERIOD_WINDOWS.items()
+    }
+    return aggregates
+
+
+def _fold(aggregates: Dict[str, Any], fills: List[FillAmounts]) -> None:
+    """Advance the totals, the equity/peak/drawdown walk and the period sums over ``fills`` (time order)."""
+    for time_ms, pnl, fee, px, sz in fills:
+        notional = abs(px * sz)
+
+        aggregates["total_pnl"] += pnl
+        aggregates["total_fees"] += fee
+        aggregates["volume"] += notional
+        aggregates["trades"] += 1
+        if pnl > 0:
+            aggregates["wins"] += 1
+        elif pnl < 0:
+            aggregates["losses"] += 1
+
+        aggregates["equity"] += pnl
+        aggregates["peak"] = max(aggregates["peak"], aggregates["equity"])
+        drawdown = aggregates["peak"] - aggregates["equity"]
+        if drawdown > aggregates["max_drawdown"]:
+            aggregates["max_drawdown"] = drawdown
+        for stats in aggregates["periods"].values():
+            if stats["start_ms"] is None or time_ms >= stats["start_ms"]:
+                stats["pnl"] += pnl
+                stats["volume"] += notional
+                stats["trades"] += 1
+        aggregates["last_time_ms"] = max(aggregates["last_time_ms"], time_ms)
+
+
+def _slide_periods(session, user: str, aggregates: Dict[str, Any], now_ms: int) -> None:
+    """Move the period windows to ``now_ms``, subtracting fills that left them."""
+    for key, window in PERIOD_WINDOWS.items():
+        stats = aggregates["periods"][key]
+        if window is None or now_ms - window <= stats["start_ms"]:
+            continue
+        rows = session.execute(
+            select(Fill.time_ms, Fill.closed_pnl, Fill.fee, Fill.px, Fill.sz).where(
+                Fill.user == user,
+                Fill.time_ms >= stats["start_ms"],
+                Fill.time_ms < now_ms - window,
+                Fill.id <= aggregates["last_fill_id"],
+            )
+        ).all()
+        for _, pnl, _, px, sz in _exact_rows(rows):
+            stats["pnl"] -= pnl
+            stats["volume"] -= abs(px * sz)
+            stats["trades"] -= 1
+        stats["start_ms"] = now_ms - window
+
+
+def _load_state(session, user: str) -> Optional[Dict[str, Any]]:
+    state = session.execute(select(WalletMetricState).where(WalletMetricState.user == user)).scalar_one_or_none()
+    if state is None:
+        return None
+    stored = json.loads(state.aggregates)
+    aggregates: Dict[str, Any] = {field: Decimal(stored[field]) for field in AGGREGATE_FIELDS}
+    aggregates.update(
+        trades=state.trades,
+        wins=state.wins,
+        losses=state.losses,
+        last_fill_id=state.last_fill_id,
+        last_time_ms=state.last_time_ms,
+    )
+    aggregates["periods"] = {
+        key: {
+            "start_ms": stored["periods"][key]["start_ms"],
+            "pnl": Decimal(stored["periods"][key]["pnl"]),
+            "volume": Decimal(stored["periods"][key]["volume"]),
+            "trades": stored["periods"][key]["trades"],
+        }
+        for key in PERIOD_WINDOWS
+    }
+    return aggregates
+
+
+def _save_state(session, user: str, aggregates: Dict[str, Any], now_ms: int) -> None:
+    payload = {field: str(aggregates[field]) for field in AGGREGATE_FIELDS}
+    payload["periods"] = {
+        key: {"start_ms": stats["start_ms"], "pnl": str(stats["pnl"]), "volume": str(stats["volume"]), "trades": stats["trades"]}
+        for key, stats in aggregates["periods"].items()
+    }
+    state = session.execute(select(WalletMetricState).where(WalletMetricState.user == user)).scalar_one_or_none()
+    if state is None:
+        state = WalletMetricState(user=user)
+        session.add(state)
+    state.last_fill_id = aggregates["last_fill_id"]
+    state.last_time_ms = aggregates["last_time_ms"]
+    state.computed_ms = now_ms
+    state.trades = aggregates["trades"]
+    state.wins = aggregates["wins"]
+    state.losses = aggregates["losses"]
+    state.aggregates = json.dumps(payload)
+
+
+def _aggregates(session, user: str, now_ms: int, full: bool) -> Dict[str, Any]:
+    """Fill aggregates as of ``now_ms``, advanced from the stored checkpoint.
+
+    Only fills inserted since the checkpoint (``id > last_fill_id``) and fills
+    that slid out of a period window are read. Fills older than the
+    checkpoint (a backfill) would change the equity walk before it, so they
+    trigger a full recompute, as does ``full=True``.
+    """
+    aggregates = None if full else _load_state(session, user)
+    if aggregates is not None:
+        rows = session.execute(
+            select(Fill.id, Fill.time_ms, Fill.closed_pnl, Fill.fee, Fill.px, Fill.sz)
+            .where(Fill.user == user, Fill.id > aggregates["last_fill_id"])
+            .order_by(asc(Fill.time_ms), asc(Fill.id))
+        ).all()
+        if rows and rows[0].time_ms < aggregates["last_time_ms"]:
+            logger.info("Fills older than the metrics checkpoint of %s; recomputing", user)
+            aggregates = None
+        else:
+            _slide_periods(session, user, aggregates, now_ms)
+            _fold(aggregates, _exact_rows(tuple(row)[1:] for row in rows))
+            if rows:
+                aggregates["last_fill_id"] = max(row.id for row in rows)
+    if aggregates is None:
+        aggregates = _full_aggregates(session, user, now_ms)
+    _save_state(session, user, aggregates, now_ms)
+    return aggregates
+
+
+def _full_aggregates(session, user: str, now_ms: int) -> Dict[str, Any]:
+    """Aggregates over every fill: the NumPy kernel on the columnar store when
+    enabled (``SCORING_VECTORIZED``), otherwise the Decimal loop."""
+    if get_settings().scoring_vectorized and metrics_kernel.available():
+        last_id, count = _fill_count(session, user)
+        columns = fill_columns.load(user, expected=count)
+        if columns is not None and len(columns) == count:
+            aggregates = metrics_kernel.fill_aggregates(columns, now_ms, PERIOD_WINDOWS)
+            aggregates["last_fill_id"] = last_id
+            return aggregates
+    aggregates = _new_aggregates(now_ms)
+    last_id, fills = _fill_amounts(session, user)
+    _fold(aggregates, fills)
+    aggregates["last_fill_id"] = last_id
+    return aggregates
+
+
 def _portfolio_snapshot(session, user: str, period: str) -> Optional[PortfolioSnapshot]:
     return session.execute(
         select(PortfolioSnapshot).where(PortfolioSnapshot.user == user, PortfolioSnapshot.period == period)
@@ -74,79 +272,34 @@ def _normalize(value: float, indicator: dict) -> float:
     return norm * 100
 
 
-def compute_metrics(user: str) -> Tuple[WalletMetric, WalletScore]:
-    """Compute metrics and score based on configurable dimensions."""
+def compute_metrics(user: str, full: bool = False) -> Tuple[WalletMetric, WalletScore]:
+    """Compute metrics and score based on configurable dimensions.
+
+    Fill aggregates are advanced incrementally from ``WalletMetricState``;
+    ``full=True`` recomputes them from every fill (audits).
+    """
     config = scoring_config.get_scoring_config()
     with session_scope() as session:
-        fills = (
-            session.execute(select(Fill).where(Fill.user == user).order_by(asc(Fill.time_ms)))
-            .scalars()
-            .all()
-        )
-        trades = len(fills)
         import time
         now_ms = int(time.time() * 1000)
+        aggregates = _aggregates(session, user, now_ms, full)
+        trades = aggregates["trades"]
 
         # 无成交时直接跳过写入，避免空钱包占榜单
         if trades == 0:
             raise ValueError("insufficient_data")
 
-        period_windows = {
-            "1d": 86_400_000,
-            "7d": 7 * 86_400_000,
-            "30d": 30 * 86_400_000,
-            "90d": 90 * 86_400_000,
-            "1y": 365 * 86_400_000,
-            "all": None,
-        }
-        period_stats = {
-            key: {
-                "pnl": Decimal(0),
-                "volume": Decimal(0),
-                "trades": 0,
-            }
-            for key in period_windows
-        }
-
-        total_pnl = Decimal(0)
-        total_fees = Decimal(0)
-        volume = Decimal(0)
-        wins = 0
-        losses = 0
-        equity = Decimal(0)
-        peak = Decimal(0)
-        max_drawdown = Decimal(0)
-
-        for f in fills:
-            pnl = Decimal(f.closed_pnl or 0)
-            fee = Decimal(f.fee or 0)
-            px = Decimal(f.px or 0)
-            sz = Decimal(f.sz or 0)
-            notional = abs(px * sz)
-
-            total_pnl += pnl
-            total_fees += fee
-            volume += notional
-            if pnl > 0:
-                wins += 1
-            elif pnl < 0:
-                losses += 1
-
-            equity += pnl
-            peak = max(peak, equity)
-            drawdown = peak - equity
-            if drawdown > max_drawdown:
-                max_drawdown = drawdown
-            for key, window in period_windows.items():
-                if window is None or (now_ms - (f.time_ms or now_ms)) <= window:
-                    stats = period_stats[key]
-                    stats["pnl"] += pnl
-                    stats["volume"] += notional
-                    stats["trades"] += 1
+        total_pnl = aggregates["total_pnl"]
+        total_fees = aggregates["total_fees"]
+        volume = aggregates["volume"]
+        wins = aggregates["wins"]
+        losses = aggregates["losses"]
+        max_drawdown = aggregates["max_drawdown"]
+        period_stats = aggregates["periods"]
 
         win_rate = Decimal(wins) / Decimal(trades) if trades else Decimal(0)
         avg_pnl = total_pnl / Decimal(trades) if trades else Decimal(0)
-        as_of = fills[-1].time_ms if fills else now_ms
+        as_of = aggregates["last_time_ms"] or now_ms
 
         details = {
             "total_pnl": float(total_pnl),
@@ -6,10 +6,11 @@ from rq.job import Job
 from redis import Redis
 
 from app.core.config import get_settings
-from app.services import etl, scoring, ai as ai_service
+from app.services import etl, hyperliquid_client, local_cache, scoring, ai as ai_service
 from app.services import tasks_service
 from app.services import notifications as notification_service
-from app.services import processing
+from app.services import processing, processing_config
+from app.services.wallet_lease import InFlightFailure, LeaseWaitTimeout, get_single_flight
 
 logger = logging.getLogger(__name__)
 
@@ -24,6 +25,8 @@ def get_queue() -> Queue:
 
 
 def enqueue_wallet_sync(address: str, end_time: int | None = None, scheduled_by: str = "manual", force: bool = False) -> str:
+    if get_single_flight().in_flight(address):
+        raise ValueError(f"sync already in flight for wallet {address}")
     log_id = processing.prepare_stage(
         address, "sync", payload={"end_time": end_time}, scheduled_by=scheduled_by, force=force
     )
@@ -33,6 +36,13 @@ def enqueue_wallet_sync(address: str, end_time: int | None = None, scheduled_by:
     return job.id
 
 
+def enqueue_wallet_repair(address: str) -> str:
+    q = get_queue()
+    job: Job = q.enqueue(run_wallet_repair, address)
+    logger.info("Enqueued wallet coverage repair", extra={"address": address, "job_id": job.id})
+    return job.id
+
+
 def enqueue_wallet_score(address: str, scheduled_by: str = "pipeline", force: bool = False) -> Optional[str]:
     try:
         log_id = processing.prepare_stage(address, "score", scheduled_by=scheduled_by, force=force)
@@ -59,7 +69,30 @@ def enqueue_wallet_ai(address: str, scheduled_by: str = "pipeline", force: bool
 
 
 def run_wallet_sync(address: str, end_time: int | None = None, log_id: int | None = None, scheduled_by: str = "system") -> Dict[str, Any]:
-    """Full data sync followed by automatic score enqueue."""
+    """Full data sync followed by automatic score enqueue.
+
+    Runs under the wallet's single-flight lease: if another process is
+    already syncing this address (same ``end_time``), wait for it and reuse
+    its result instead of fetching the wallet a second time.
+    """
+    try:
+        result, ran = get_single_flight().run(
+            address,
+            lambda: _run_wallet_sync(address, end_time, log_id, scheduled_by),
+            params={"end_time": end_time},
+        )
+    except (InFlightFailure, LeaseWaitTimeout) as exc:
+        if log_id is not None:
+            processing.mark_stage_failure(log_id, str(exc))
+        raise
+    if not ran:
+        logger.info("Reused in-flight wallet sync", extra={"address": address})
+        if log_id is not None:
+            processing.mark_stage_success(log_id, result)
+    return result
+
+
+def _run_wallet_sync(address: str, end_time: int | None, log_id: int | None, scheduled_by: str) -> Dict[str, Any]:
     if log_id is None:
         log_id = processing.prepare_stage(
             address, "sync", payload={"end_time": end_time}, scheduled_by=scheduled_by, force=True
@@ -67,21 +100,17 @@ def run_wallet_sync(address: str, end_time: int | None = None, log_id: int | Non
     processing.mark_stage_running(log_id)
     task_id = tasks_service.log_task_start("wallet_sync", {"address": address, "end_time": end_time, "scheduled_by": scheduled_by})
     try:
-        ledger = etl.sync_ledger(address, end_time=end_time)
-        fills = etl.sync_fills(address, end_time=end_time)
-        funding = etl.sync_funding(address, end_time=end_time)
-        etl.sync_user_fees(address)
-        positions = etl.sync_positions(address)
-        orders = etl.sync_orders(address)
-        portfolio_points = etl.sync_portfolio_series(address)
-        result = {
-            "fills": fills,
-            "ledger": ledger,
-            "funding": funding,
-            "positions": positions,
-            "orders": orders,
-            "portfolio_points": portfolio_points,
-        }
+        # Stages that ask for the same info body (e.g. portfolio for positions
+        # and the portfolio series) share one response within this run, and
+        # meta.json is written once at the end instead of per stage.
+        with hyperliquid_client.request_memo() as memo, local_cache.metadata_batch():
+            if processing_config.get_processing_config().get("concurrent_fetch", True):
+                result = etl.sync_wallet_concurrent(address, end_time=end_time)
+            else:
+                result = _sync_wallet_sequential(address, end_time=end_time)
+        logger.info(
+            "Wallet sync request memo", extra={"address": address, "memo_hits": memo.hits, "memo_misses": memo.misses}
+        )
         processing.mark_stage_success(log_id, result)
         tasks_service.log_task_end(task_id, "completed", result=result)
         enqueue_wallet_score(address, scheduled_by="pipeline")
@@ -93,6 +122,40 @@ def run_wallet_sync(address: str, end_time: int | None = None, log_id: int | Non
         raise
 
 
+def run_wallet_repair(address: str) -> Dict[str, Any]:
+    """Refetch only the missing intervals of the wallet's coverage map.
+
+    Shares the wallet's single-flight lease with syncs, so a repair waits for
+    a running sync (and vice versa) instead of fetching concurrently.
+    """
+    task_id = tasks_service.log_task_start("wallet_repair", {"address": address})
+    try:
+        result, _ = get_single_flight().run(address, lambda: etl.repair_gaps(address), params={"repair": True})
+        tasks_service.log_task_end(task_id, "completed", result=result)
+        return result
+    except Exception as exc:
+        tasks_service.log_task_end(task_id, "failed", error=str(exc))
+        raise
+
+
+def _sync_wallet_sequential(address: str, end_time: int | None = None) -> Dict[str, Any]:
+    ledger = etl.sync_ledger(address, end_time=end_time)
+    fills = etl.sync_fills(address, end_time=end_time)
+    funding = etl.sync_funding(address, end_time=end_time)
+    etl.sync_user_fees(address)
+    positions = etl.sync_positions(address)
+    orders = etl.sync_orders(address)
+    portfolio_points = etl.sync_portfolio_series(address)
+    return {
+        "fills": fills,
+        "ledger": ledger,
+        "funding": funding,
+        "positions": positions,
+        "orders": orders,
+        "portfolio_points": portfolio_points,
+    }
+
+
 def run_wallet_score(address: str, log_id: int | None = None, scheduled_by: str = "system") -> Dict[str, Any]:
     if log_id is None:
         log_id = processing.prepare_stage(address, "score", scheduled_by=scheduled_by, force=True)
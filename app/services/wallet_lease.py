@@ -0,0 +1,272 @@
+"""Per-wallet single-flight for syncs.
+
+Before a wallet is fetched the caller takes a lease
+``hyperliquid:sync:lease:<address>`` (Redis ``SET NX PX`` with a random
+token). Callers that find the lease held do not fetch the wallet again: they
+wait until it is released and reuse the result the holder published under
+``hyperliquid:sync:result:<token>``. Release is a compare-and-delete, so a
+holder whose lease already expired never removes a successor's lease.
+While the holder runs, a heartbeat thread extends the lease (a token-checked
+``PEXPIRE``) every third of its TTL, so long syncs such as a windowed
+backfill keep it; the TTL only matters once the holder has died.
+
+Like the rate limiter, the leases live in Redis so API processes and RQ
+workers on every node coalesce with each other. When Redis is unreachable the
+same protocol runs against an in-process table (coalescing then only covers
+callers within this process) and Redis is retried after a cooldown.
+"""
+import json
+import logging
+import threading
+import time
+import uuid
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from redis import Redis
+from redis.exceptions import RedisError
+
+from app.core.config import get_settings
+
+logger = logging.getLogger(__name__)
+
+LEASE_PREFIX = "hyperliquid:sync:lease:"
+RESULT_PREFIX = "hyperliquid:sync:result:"
+RESULT_TTL_MS = 60_000
+POLL_SECONDS = 0.25
+REDIS_RETRY_SECONDS = 30.0
+
+# Publish the holder's outcome, then drop the lease only if it is still ours.
+_RELEASE_SCRIPT = """
+redis.call('SET', KEYS[2], ARGV[2], 'PX', ARGV[3])
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+  return redis.call('DEL', KEYS[1])
+end
+return 0
+"""
+
+
+# Extend the lease only while it is still ours.
+_EXTEND_SCRIPT = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+  return redis.call('PEXPIRE', KEYS[1], ARGV[2])
+end
+return 0
+"""
+
+
+class LeaseWaitTimeout(ValueError):
+    """Another caller held the lease for longer than we were willing to wait."""
+
+
+class InFlightFailure(RuntimeError):
+    """The concurrent call whose result we waited for failed."""
+
+
+class _RedisLeases:
+    def __init__(self, redis: Redis) -> None:
+        self._redis = redis
+        self._release = redis.register_script(_RELEASE_SCRIPT)
+        self._extend = redis.register_script(_EXTEND_SCRIPT)
+
+    def acquire(self, key: str, token: str, ttl_ms: int) -> bool:
+        return bool(self._redis.set(key, token, nx=True, px=ttl_ms))
+
+    def holder(self, key: str) -> Optional[str]:
+        value = self._redis.get(key)
+        return value.decode() if isinstance(value, bytes) else value
+
+    def extend(self, key: str, token: str, ttl_ms: int) -> bool:
+        return bool(self._extend(keys=[key], args=[token, ttl_ms]))
+
+    def release(self, key: str, token: str, result_key: str, payload: str) -> None:
+        self._release(keys=[key, result_key], args=[token, payload, RESULT_TTL_MS])
+
+    def result(self, result_key: str) -> Optional[str]:
+        value = self._redis.get(result_key)
+        return value.decode() if isinstance(value, bytes) else value
+
+
+class _LocalLeases:
+    """In-process stand-in for :class:`_RedisLeases` with the same semantics."""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._leases: Dict[str, Tuple[str, float]] = {}
+        self._results: Dict[str, Tuple[str, float]] = {}
+
+    @staticmethod
+    def _live(table: Dict[str, Tuple[str, float]], key: str) -> Optional[str]:
+        entry = table.get(key)
+        if entry is None:
+            return None
+        if entry[1] <= time.monotonic():
+            table.pop(key, None)
+            return None
+        return entry[0]
+
+    def acquire(self, key: str, token: str, ttl_ms: int) -> bool:
+        with self._lock:
+            if self._live(self._leases, key) is not None:
+                return False
+            self._leases[key] = (token, time.monotonic() + ttl_ms / 1000)
+            return True
+
+    def holder(self, key: str) -> Optional[str]:
+        with self._lock:
+            return self._live(self._leases, key)
+
+    def extend(self, key: str, token: str, ttl_ms: int) -> bool:
+        with self._lock:
+            if self._live(self._leases, key) != token:
+                return False
+            self._leases[key] = (token, time.monotonic() + ttl_ms / 1000)
+            return True
+
+    def release(self, key: str, token: str, result_key: str, payload: str) -> None:
+        with self._lock:
+            now = time.monotonic()
+            self._results = {k: v for k, v in self._results.items() if v[1] > now}
+            self._results[result_key] = (payload, now + RESULT_TTL_MS / 1000)
+            if self._live(self._leases, key) == token:
+                self._leases.pop(key, None)
+
+    def result(self, result_key: str) -> Optional[str]:
+        with self._lock:
+            return self._live(self._results, result_key)
+
+
+class SingleFlight:
+    def __init__(self, lease_prefix: str = LEASE_PREFIX, result_prefix: str = RESULT_PREFIX) -> None:
+        self.lease_prefix = lease_prefix
+        self.result_prefix = result_prefix
+        self._local = _LocalLeases()
+        self._redis: Optional[_RedisLeases] = None
+        self._redis_down_until = 0.0
+        self._lock = threading.Lock()
+
+    def _backend(self):
+        if time.monotonic() < self._redis_down_until:
+            return self._local
+        with self._lock:
+            if self._redis is None:
+                settings = get_settings()
+                client = Redis.from_url(settings.redis_url, socket_timeout=0.5, socket_connect_timeout=0.5)
+                self._redis = _RedisLeases(client)
+            return self._redis
+
+    def _redis_failed(self, exc: RedisError) -> None:
+        logger.warning("Sync lease Redis unavailable, using in-process leases: %s", exc)
+        self._redis_down_until = time.monotonic() + REDIS_RETRY_SECONDS
+
+    def in_flight(self, name: str) -> bool:
+        """Whether some caller currently holds the lease for ``name``."""
+        backend = self._backend()
+        try:
+            return backend.holder(self.lease_prefix + name) is not None
+        except RedisError as exc:
+            self._redis_failed(exc)
+            return self._local.holder(self.lease_prefix + name) is not None
+
+    def run(
+        self,
+        name: str,
+        fn: Callable[[], Any],
+        params: Any = None,
+        wait_timeout: Optional[float] = None,
+    ) -> Tuple[Any, bool]:
+        """Run ``fn`` unless an identical call for ``name`` is already in flight.
+
+        Returns ``(result, ran)``; ``ran`` is False when the result was taken
+        from the concurrent holder. ``params`` must match for a result to be
+        reused, otherwise the caller waits for the lease and runs ``fn``
+        itself. The holder's failure is re-raised to its waiters as
+        :class:`InFlightFailure`. ``fn``'s result must be JSON serializable.
+        ``wait_timeout`` (default ``wallet_sync_wait_sec``) bounds the wait;
+        :class:`LeaseWaitTimeout` is raised when it is exceeded.
+        """
+        settings = get_settings()
+        if wait_timeout is None:
+            wait_timeout = settings.wallet_sync_wait_sec
+        key = self.lease_prefix + name
+        deadline = time.monotonic() + wait_timeout
+        while True:
+            backend = self._backend()
+            token = uuid.uuid4().hex
+            try:
+                acquired = backend.acquire(key, token, int(settings.wallet_sync_lease_sec * 1000))
+                holder = None if acquired else backend.holder(key)
+            except RedisError as exc:
+                self._redis_failed(exc)
+                continue
+            if acquired:
+                return self._run_as_holder(backend, key, token, fn, params, settings.wallet_sync_lease_sec), True
+            if holder is None:
+                continue
+            outcome = self._wait_for(backend, key, holder, deadline)
+            if outcome is None:
+                if time.monotonic() >= deadline:
+                    raise LeaseWaitTimeout(f"sync already in flight for {name}")
+                continue
+            if outcome.get("params") != params:
+                continue
+            if outcome.get("error") is not None:
+                raise InFlightFailure(outcome["error"])
+            return outcome.get("result"), False
+
+    def _heartbeat(self, backend, key: str, token: str, ttl_sec: float, stop: threading.Event) -> None:
+        """Keep extending the lease until ``stop`` is set or the lease is lost."""
+        while not stop.wait(ttl_sec / 3):
+            try:
+                if not backend.extend(key, token, int(ttl_sec * 1000)):
+                    logger.warning("Sync lease %s lost while running; another caller may take over", key)
+                    return
+            except RedisError as exc:
+                # Keep trying: the lease survives until its TTL runs out.
+                logger.warning("Failed to extend sync lease %s: %s", key, exc)
+
+    def _run_as_holder(
+        self, backend, key: str, token: str, fn: Callable[[], Any], params: Any, ttl_sec: float
+    ) -> Any:
+        outcome: Dict[str, Any] = {"params": params, "result": None, "error": None}
+        stop = threading.Event()
+        heartbeat = threading.Thread(
+            target=self._heartbeat, args=(backend, key, token, ttl_sec, stop), name=f"lease-heartbeat:{key}", daemon=True
+        )
+        heartbeat.start()
+        try:
+            outcome["result"] = fn()
+            return outcome["result"]
+        except Exception as exc:
+            outcome["error"] = str(exc) or type(exc).__name__
+            raise
+        finally:
+            stop.set()
+            heartbeat.join()
+            try:
+                backend.release(key, token, self.result_prefix + token, json.dumps(outcome, default=str))
+            except RedisError as exc:
+                # The lease expires on its own; waiters then take it over.
+                self._redis_failed(exc)
+
+    def _wait_for(self, backend, key: str, holder: str, deadline: float) -> Optional[Dict[str, Any]]:
+        """Wait for ``holder`` to release ``key``; returns its outcome if it published one."""
+        while time.monotonic() < deadline:
+            try:
+                if backend.holder(key) != holder:
+                    payload = backend.result(self.result_prefix + holder)
+                    return json.loads(payload) if payload else None
+            except RedisError as exc:
+                self._redis_failed(exc)
+                return None
+            time.sleep(POLL_SECONDS)
+        return None
+
+
+_single_flight: Optional[SingleFlight] = None
+
+
+def get_single_flight() -> SingleFlight:
+    global _single_flight
+    if _single_flight is None:
+        _single_flight = SingleFlight()
+    return _single_flight
@@ -0,0 +1,142 @@
+"""Offline ingestion benchmark.
+
+Runs the ETL for N synthetic (or recorded) wallets against
+``hyperliquid_replay.ReplayTransport`` using a throwaway SQLite database and
+cache directory, then reports wallets/sec and rows/sec::
+
+    python -m app.tools.ingestion_bench --wallets 20 --fills 5000 --latency-ms 40
+    python -m app.tools.ingestion_bench --recorded ./recordings --addresses 0xabc... 0xdef...
+
+Settings are read at import time, so the database/cache paths are redirected
+via environment variables before any ``app`` module is imported.
+"""
+import argparse
+import hashlib
+import os
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List
+
+
+def _parse_args(argv: List[str]) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Benchmark Hyperliquid ingestion against a replay transport")
+    parser.add_argument("--wallets", type=int, default=10, help="number of synthetic wallets")
+    parser.add_argument("--fills", type=int, default=2000, help="fills per synthetic wallet")
+    parser.add_argument("--addresses", nargs="*", help="explicit addresses (required with --recorded)")
+    parser.add_argument("--recorded", help="directory written by RecordingTransport")
+    parser.add_argument("--latency-ms", type=float, default=0.0)
+    parser.add_argument("--jitter-ms", type=float, default=0.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--error-status", type=int, default=503)
+    parser.add_argument("--mode", choices=["concurrent", "sequential"], default="concurrent")
+    parser.add_argument("--workers", type=int, default=1, help="wallets synced in parallel threads")
+    parser.add_argument("--rate-limit", action="store_true", help="keep request_rate_per_min enforcement on")
+    parser.add_argument("--data-dir", help="reuse a data directory instead of a temporary one")
+    return parser.parse_args(argv)
+
+
+def _synthetic_addresses(count: int) -> List[str]:
+    return ["0x" + hashlib.sha256(f"bench:{idx}".encode()).hexdigest()[:40] for idx in range(count)]
+
+
+def main(argv: List[str] | None = None) -> Dict[str, Any]:
+    args = _parse_args(sys.argv[1:] if argv is None else argv)
+    data_dir = args.data_dir or tempfile.mkdtemp(prefix="hl-bench-")
+    os.environ["DATA_DIR"] = data_dir
+    os.environ["SQLITE_PATH"] = os.path.join(data_dir, "bench.db")
+    os.environ["CACHE_DIR"] = os.path.join(data_dir, "cache")
+    os.environ["RAW_ARCHIVE_DIR"] = os.path.join(data_dir, "raw_archive")
+    os.environ["FILL_COLUMNS_DIR"] = os.path.join(data_dir, "fill_columns")
+    if not args.rate_limit:
+        os.environ["HYPERLIQUID_RATE_LIMIT_ENABLED"] = "false"
+    os.environ.setdefault("HYPERLIQUID_BACKOFF_BASE_SEC", "0.05")
+
+    from sqlalchemy import func, select
+
+    import app.models  # noqa: F401
+    from app.core.database import Base, engine, session_scope
+    from app.models import Fill, FundingEvent, LedgerEvent, Wallet
+    from app.services import etl, hyperliquid_client, local_cache, task_queue
+    from app.services.bootstrap import ensure_processing_schema
+    from app.services.hyperliquid_replay import RecordedDataset, ReplayTransport, SyntheticDataset
+
+    Base.metadata.create_all(bind=engine)
+    ensure_processing_schema()
+
+    if args.recorded:
+        if not args.addresses:
+            raise SystemExit("--recorded requires --addresses")
+        dataset: Any = RecordedDataset(args.recorded)
+        addresses = args.addresses
+    else:
+        dataset = SyntheticDataset(fills_per_wallet=args.fills)
+        addresses = args.addresses or _synthetic_addresses(args.wallets)
+
+    transport = ReplayTransport(
+        dataset,
+        latency_ms=args.latency_ms,
+        jitter_ms=args.jitter_ms,
+        error_rate=args.error_rate,
+        error_status=args.error_status,
+        seed=0,
+    )
+    hyperliquid_client.install_transport(transport)
+
+    with session_scope() as session:
+        existing = set(session.execute(select(Wallet.address)).scalars())
+        for address in addresses:
+            if address not in existing:
+                session.add(Wallet(address=address, status="imported", tags="[]", source="bench"))
+
+    def sync_one(address: str) -> Dict[str, int]:
+        with hyperliquid_client.request_memo(), local_cache.metadata_batch():
+            if args.mode == "concurrent":
+                return etl.sync_wallet_concurrent(address)
+            return task_queue._sync_wallet_sequential(address)
+
+    failures = 0
+    totals: Dict[str, int] = {}
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=max(1, args.workers)) as pool:
+        for address, future in [(addr, pool.submit(sync_one, addr)) for addr in addresses]:
+            try:
+                result = future.result()
+            except Exception as exc:
+                failures += 1
+                print(f"sync failed for {address}: {exc}", file=sys.stderr)
+                continue
+            for key, value in result.items():
+                totals[key] = totals.get(key, 0) + (value or 0)
+    elapsed = time.perf_counter() - started
+
+    with session_scope() as session:
+        stored = {
+            model.__tablename__: session.execute(select(func.count()).select_from(model)).scalar_one()
+            for model in (Fill, LedgerEvent, FundingEvent)
+        }
+    rows = sum(totals.values())
+    report = {
+        "wallets": len(addresses),
+        "failed": failures,
+        "mode": args.mode,
+        "workers": args.workers,
+        "seconds": round(elapsed, 3),
+        "wallets_per_sec": round(len(addresses) / elapsed, 2) if elapsed else None,
+        "rows_written": rows,
+        "rows_per_sec": round(rows / elapsed, 1) if elapsed else None,
+        "rows_by_kind": totals,
+        "stored": stored,
+        "requests": dict(transport.requests),
+        "endpoint_latency": hyperliquid_client.endpoint_latency_stats(),
+        "request_memo": hyperliquid_client.request_memo_stats(),
+        "data_dir": data_dir,
+    }
+    for key, value in report.items():
+        print(f"{key:>18}: {value}")
+    return report
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,34 @@
+"""RQ worker entrypoint: ``python -m app.worker``.
+
+Jobs run inside the worker process (``SimpleWorker``) instead of a fresh fork
+per job, so the pooled Hyperliquid client from
+``hyperliquid_client.get_shared_http_client`` keeps its keep-alive
+connections across jobs. The pool is closed when the worker shuts down.
+"""
+import logging
+
+from rq import SimpleWorker
+
+from app.core.config import get_settings
+from app.core.logging import setup_logging
+from app.services import hyperliquid_client
+from app.services.bootstrap import migrate
+from app.services.task_queue import get_queue
+
+logger = logging.getLogger(__name__)
+
+
+def main() -> None:
+    setup_logging(get_settings().log_level)
+    migrate()
+    queue = get_queue()
+    worker = SimpleWorker([queue], connection=queue.connection)
+    try:
+        worker.work()
+    finally:
+        logger.info("Hyperliquid endpoint latency: %s", hyperliquid_client.endpoint_latency_stats())
+        hyperliquid_client.close_shared_clients()
+
+
+if __name__ == "__main__":
+    main()
@@ -401,6 +401,11 @@ export interface ProcessingConfig {
   score_cooldown_days: number;
   ai_cooldown_days: number;
   portfolio_refresh_hours: number;
+  max_pages_per_sync: number;
+  concurrent_fetch: boolean;
+  backfill_window_days: number;
+  backfill_concurrency: number;
+  backfill_max_windows: number;
 }
 
 export interface ProcessingTemplate {